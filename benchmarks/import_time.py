@@ -0,0 +1,81 @@
+"""Measure how long it takes to import invest_reports modules.
+
+Each import is timed in a fresh interpreter, as a report job would pay it,
+and the heavy dependencies that the import pulled in are listed. With
+lazy imports, none should be.
+
+Usage:
+    python benchmarks/import_time.py [--repeat N] [module ...]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+DEFAULT_MODULES = [
+    'invest_reports',
+    'invest_reports.utils',
+    'invest_reports.sdr_ndr_utils',
+    'invest_reports.tile_pyramid',
+    'invest_reports.jinja_report_generators.sdr_report_generator',
+    'invest_reports.jinja_report_generators.ndr_report_generator',
+    'invest_reports.jinja_report_generators.cv_report_generator',
+]
+
+HEAVY_MODULES = [
+    'altair', 'geometamaker', 'geopandas', 'matplotlib', 'natcap.invest',
+    'numpy', 'osgeo', 'pandas', 'PIL', 'pygeoprocessing', 'yaml',
+]
+
+_TIMING_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'heavy': [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def time_import(module, repeat):
+    """Import a module in ``repeat`` fresh interpreters.
+
+    Returns:
+        A (list of seconds per import, list of heavy modules loaded) tuple.
+    """
+    times = []
+    heavy = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-c',
+             _TIMING_SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+            capture_output=True, text=True, check=True)
+        measurement = json.loads(result.stdout.strip().splitlines()[-1])
+        times.append(measurement['seconds'])
+        heavy = measurement['heavy']
+    return (times, heavy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('modules', nargs='*', default=DEFAULT_MODULES)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"module":<62} {"median":>8} {"min":>8}  heavy imports')
+    for module in args.modules:
+        try:
+            (times, heavy) = time_import(module, args.repeat)
+        except subprocess.CalledProcessError as err:
+            error = err.stderr.strip().splitlines()[-1]
+            print(f'{module:<62} failed: {error}')
+            continue
+        print(f'{module:<62} {statistics.median(times) * 1000:>6.0f}ms '
+              f'{min(times) * 1000:>6.0f}ms  {", ".join(heavy) or "-"}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+"""Benchmark report generation on synthetic workspaces of several scales.
+
+Each report is generated in a fresh interpreter, with a fresh cache
+directory, and every stage of the pipeline (raster reads, plotting, image
+encoding, tables, chart specs, template rendering...) is timed and its
+peak Python memory measured. Results are appended, with the current git
+commit, to a JSON lines file, so that commits can be compared.
+
+Usage:
+    python benchmarks/report_pipeline.py run [--models ...] [--scales ...]
+    python benchmarks/report_pipeline.py compare BASE_COMMIT HEAD_COMMIT
+
+Synthetic workspaces are kept in ``--data-dir`` and reused by later runs.
+The largest scales need tens of GB of disk and take a long time to
+generate.
+"""
+import argparse
+import collections
+import datetime
+import functools
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SCALES = {
+    'small': {'raster_size': 1000, 'n_watersheds': 10,
+              'n_shore_points': 1000},
+    'medium': {'raster_size': 5000, 'n_watersheds': 1000,
+               'n_shore_points': 10000},
+    'large': {'raster_size': 20000, 'n_watersheds': 10000,
+              'n_shore_points': 100000},
+    'xlarge': {'raster_size': 50000, 'n_watersheds': 100000,
+               'n_shore_points': 1000000},
+}
+
+MODELS = ['sdr', 'coastal_vulnerability']
+
+_CV_MODULE = 'invest_reports.jinja_report_generators.cv_report_generator'
+
+# Stages of the pipeline: (stage, module, attribute). Each attribute is
+# wrapped to record the time and memory spent in it. Stages may be nested,
+# e.g. raster reads within figures.
+STAGES = [
+    ('raster read', 'invest_reports.utils', 'read_masked_array'),
+    ('figure', 'invest_reports.utils', 'plot_and_save_rasters'),
+    ('figure encoding', 'invest_reports.utils', 'encode_figure'),
+    ('tile pyramid', 'invest_reports.tile_pyramid', 'build_tile_pyramid'),
+    ('watershed table', 'invest_reports.sdr_ndr_utils',
+     'generate_results_table_from_vector'),
+    ('output stats table', 'invest_reports.utils',
+     'raster_workspace_summary'),
+    ('input stats table', 'invest_reports.utils', 'raster_inputs_summary'),
+    ('vector read', _CV_MODULE, 'load_exposure'),
+    ('csv read', _CV_MODULE, 'load_intermediate_exposure'),
+    ('chart build', _CV_MODULE, 'chart_exposure_map'),
+    ('chart build', _CV_MODULE, 'chart_habitat_map'),
+    ('chart build', _CV_MODULE, 'chart_exposure_histogram'),
+    ('chart build', _CV_MODULE, 'chart_rank_vars'),
+    ('chart build', _CV_MODULE, 'chart_facetted_histograms'),
+    ('chart build', _CV_MODULE, 'chart_wave_energy_map'),
+    ('vega spec', 'altair', 'TopLevelMixin.to_dict'),
+    ('template render', 'invest_reports.report_writer', 'write_report'),
+]
+
+
+class StageProfiler:
+    """Records the time and peak memory of each call to a stage.
+
+    Memory is measured with ``tracemalloc``, so it includes numpy arrays
+    but not memory allocated by GDAL itself. Calls from threads other than
+    the main thread are timed only.
+    """
+
+    def __init__(self):
+        self.stats = collections.defaultdict(
+            lambda: {'calls': 0, 'seconds': 0, 'peak_bytes': 0})
+        self._stack = []  # [stage, memory at start, peak so far]
+        self._originals = []
+
+    def _enter(self, stage):
+        (current, peak) = tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1][2] = max(self._stack[-1][2], peak)
+        tracemalloc.reset_peak()
+        self._stack.append([stage, current, current])
+
+    def _exit(self):
+        (_, peak) = tracemalloc.get_traced_memory()
+        (stage, start, stage_peak) = self._stack.pop()
+        stage_peak = max(stage_peak, peak)
+        if self._stack:
+            self._stack[-1][2] = max(self._stack[-1][2], stage_peak)
+        tracemalloc.reset_peak()
+        return stage_peak - start
+
+    def wrap(self, stage, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            main_thread = threading.current_thread() is threading.main_thread()
+            # Count recursive calls of a stage (e.g. to_dict of layered
+            # charts) only once.
+            track = main_thread and stage not in (
+                frame[0] for frame in self._stack)
+            if track:
+                self._enter(stage)
+            start_time = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if track or not main_thread:
+                    stats = self.stats[stage]
+                    stats['calls'] += 1
+                    stats['seconds'] += time.perf_counter() - start_time
+                if track:
+                    stats['peak_bytes'] = max(
+                        stats['peak_bytes'], self._exit())
+        return wrapper
+
+    def install(self, stages):
+        """Wrap each stage's function, skipping stages that are missing.
+
+        Stages may be missing from older commits, which can then still be
+        measured, without those stages.
+        """
+        for (stage, module_name, attribute) in stages:
+            (*owner_path, name) = attribute.split('.')
+            try:
+                owner = importlib.import_module(module_name)
+                for part in owner_path:
+                    owner = getattr(owner, part)
+                original = getattr(owner, name)
+            except (ImportError, AttributeError):
+                continue
+            self._originals.append((owner, name, original))
+            setattr(owner, name, self.wrap(stage, original))
+
+    def uninstall(self):
+        """Restore the functions wrapped by ``install``."""
+        for (owner, name, original) in reversed(self._originals):
+            setattr(owner, name, original)
+        self._originals = []
+
+
+def _max_rss_bytes():
+    try:
+        from invest_reports.instrumentation import max_rss_bytes
+    except ImportError:  # commits from before the stages were instrumented
+        pass
+    else:
+        # Includes any peaks from before the peak was reset to measure
+        # each stage, which getrusage does not.
+        return max_rss_bytes()
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes; macOS, bytes.
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def _generate_report(model, file_registry, args_dict, target_path):
+    if model == 'sdr':
+        from natcap.invest.sdr.sdr import MODEL_SPEC
+        from invest_reports.jinja_report_generators import (
+            sdr_report_generator as report_module)
+    else:
+        from natcap.invest.coastal_vulnerability import MODEL_SPEC
+        from invest_reports.jinja_report_generators import (
+            cv_report_generator as report_module)
+    report_module.report(file_registry, args_dict, MODEL_SPEC, target_path)
+
+
+def measure(model, workspace_dir, cache_dir, runs):
+    """Generate a report ``runs`` times, measuring every stage.
+
+    Runs after the first reuse the caches of the first, as when a report
+    is regenerated.
+
+    Returns:
+        A list of dicts of measurements, one per run.
+    """
+    from invest_reports import cache
+
+    with open(os.path.join(
+            workspace_dir, 'benchmark_workspace.json')) as index_file:
+        index = json.load(index_file)
+    cache.set_cache_dir(cache_dir)
+    target_path = os.path.join(workspace_dir, f'{model}.html')
+
+    measurements = []
+    for run in range(runs):
+        profiler = StageProfiler()
+        profiler.install(STAGES)
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        try:
+            _generate_report(
+                model, index['file_registry'], index['args_dict'],
+                target_path)
+        finally:
+            profiler.uninstall()
+        wall_seconds = time.perf_counter() - start_time
+        (_, traced_peak) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        measurements.append({
+            'run': 'cold' if run == 0 else 'warm',
+            'wall_seconds': wall_seconds,
+            'traced_peak_bytes': traced_peak,
+            'max_rss_bytes': _max_rss_bytes(),
+            'report_bytes': os.path.getsize(target_path),
+            'stages': dict(profiler.stats),
+        })
+    return measurements
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCHMARKS_DIR,
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    sys.path.insert(0, BENCHMARKS_DIR)
+    import synthetic
+
+    commit = _git_commit()
+    for scale_name in args.scales:
+        scale = SCALES[scale_name]
+        for model in args.models:
+            workspace_dir = os.path.join(
+                args.data_dir, f'{model}_{scale_name}')
+            print(f'Preparing {workspace_dir}', flush=True)
+            synthetic.make_workspace(model, workspace_dir, scale)
+
+            # Measure in a fresh interpreter, so that imports, caches and
+            # peak memory are those of a single report job.
+            with tempfile.TemporaryDirectory() as cache_dir:
+                result = subprocess.run(
+                    [sys.executable, __file__, '_measure', model,
+                     workspace_dir, cache_dir, str(args.runs)],
+                    capture_output=True, text=True)
+            if result.returncode != 0:
+                print(f'{model} {scale_name} failed:\n{result.stderr}')
+                continue
+            measurements = json.loads(result.stdout.strip().splitlines()[-1])
+            with open(args.results, 'a') as results_file:
+                for measurement in measurements:
+                    record = {
+                        'commit': commit,
+                        'timestamp': datetime.datetime.now().isoformat(
+                            timespec='seconds'),
+                        'model': model,
+                        'scale': scale_name,
+                        **scale,
+                        **measurement,
+                    }
+                    results_file.write(json.dumps(record) + '\n')
+                    print(f'{model:<22} {scale_name:<7} {record["run"]:<5}'
+                          f'{record["wall_seconds"]:>9.1f}s '
+                          f'{record["traced_peak_bytes"] / 2**20:>8.0f}MB '
+                          'traced peak', flush=True)
+
+
+def compare(args):
+    """Print the ratio of each stage's time, head commit over base."""
+    records = collections.defaultdict(dict)
+    with open(args.results) as results_file:
+        for line in results_file:
+            record = json.loads(line)
+            if record['commit'] in (args.base, args.head):
+                # The most recent measurement of each commit is used.
+                key = (record['model'], record['scale'], record['run'])
+                records[key][record['commit']] = record
+
+    print(f'{"model / scale / run / stage":<58}{args.base:>10}'
+          f'{args.head:>10}{"ratio":>8}')
+    for (key, by_commit) in sorted(records.items()):
+        if args.base not in by_commit or args.head not in by_commit:
+            continue
+        (base, head) = (by_commit[args.base], by_commit[args.head])
+        rows = [('total', base['wall_seconds'], head['wall_seconds'])]
+        for stage in sorted(set(base['stages']) | set(head['stages'])):
+            rows.append((
+                stage,
+                base['stages'].get(stage, {}).get('seconds', 0),
+                head['stages'].get(stage, {}).get('seconds', 0)))
+        for (stage, base_seconds, head_seconds) in rows:
+            ratio = head_seconds / base_seconds if base_seconds else None
+            flag = ' !' if ratio and ratio > args.threshold else ''
+            ratio_text = f'{ratio:.2f}' if ratio else '-'
+            print(f'{" / ".join(key + (stage,)):<58}{base_seconds:>9.2f}s'
+                  f'{head_seconds:>9.2f}s{ratio_text:>8}{flag}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser(
+        'run', help='generate reports and record measurements')
+    run_parser.add_argument(
+        '--models', nargs='+', choices=MODELS, default=MODELS)
+    run_parser.add_argument(
+        '--scales', nargs='+', choices=list(SCALES), default=['small'])
+    run_parser.add_argument(
+        '--runs', type=int, default=2,
+        help='reports per workspace; runs after the first are warm')
+    run_parser.add_argument(
+        '--data-dir', default=os.path.join(BENCHMARKS_DIR, 'data'))
+    run_parser.add_argument(
+        '--results', default=os.path.join(BENCHMARKS_DIR, 'results.jsonl'))
+
+    compare_parser = subparsers.add_parser(
+        'compare', help='compare the measurements of two commits')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('head')
+    compare_parser.add_argument(
+        '--results', default=os.path.join(BENCHMARKS_DIR, 'results.jsonl'))
+    compare_parser.add_argument(
+        '--threshold', type=float, default=1.1,
+        help='flag stages whose time grew by more than this ratio')
+
+    measure_parser = subparsers.add_parser('_measure')
+    measure_parser.add_argument('model')
+    measure_parser.add_argument('workspace_dir')
+    measure_parser.add_argument('cache_dir')
+    measure_parser.add_argument('runs', type=int)
+
+    args = parser.parse_args()
+    if args.command == 'run':
+        run(args)
+    elif args.command == 'compare':
+        compare(args)
+    else:
+        print(json.dumps(measure(
+            args.model, args.workspace_dir, args.cache_dir, args.runs)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,310 @@
+"""Generate synthetic model workspaces for benchmarking reports.
+
+Workspaces mimic the outputs of the InVEST SDR and Coastal Vulnerability
+models closely enough for their reports to be generated, at any scale.
+Rasters are written a strip at a time, so a 50,000 x 50,000 pixel raster
+needs no more memory than a small one (but does need tens of GB of disk).
+"""
+import json
+import math
+import os
+
+import geometamaker
+import geopandas
+import numpy
+import pandas
+import shapely
+from osgeo import gdal
+from osgeo import osr
+
+EPSG = 32731  # WGS84/UTM zone 31S
+PIXEL_SIZE = 30  # meters
+ORIGIN = (500000, 9000000)
+GTIFF_OPTIONS = [
+    'TILED=YES', 'BIGTIFF=YES', 'COMPRESS=LZW',
+    'BLOCKXSIZE=256', 'BLOCKYSIZE=256']
+STRIP_ROWS = 256
+
+# Functions of normalized pixel coordinates (u, v in [0, 1)), by kind of
+# raster: (GDAL type, nodata, function). Pixels outside a circle are nodata,
+# like the area outside a watershed.
+RASTER_KINDS = {
+    'elevation': (
+        gdal.GDT_Float32, -1,
+        lambda u, v: 1000 * (1 - v) + 50 * numpy.sin(20 * u)
+        * numpy.cos(20 * v)),
+    'smooth': (
+        gdal.GDT_Float32, -1,
+        lambda u, v: 1 + numpy.sin(7 * u) * numpy.cos(5 * v) ** 2),
+    'skewed': (
+        gdal.GDT_Float32, -1,
+        lambda u, v: 10 ** (3 * numpy.sin(9 * u + 2 * v) ** 2
+                            * numpy.cos(4 * v) ** 2 - 1)),
+    'classes': (
+        gdal.GDT_Int32, -1,
+        lambda u, v: ((numpy.floor(u * 12) + numpy.floor(v * 9) * 3) % 8
+                      + 1)),
+    'mask': (
+        gdal.GDT_Byte, 255,
+        lambda u, v: (numpy.sin(5 * u) + numpy.cos(6 * v)) > 0),
+    'streams': (
+        gdal.GDT_Byte, 255,
+        lambda u, v: numpy.abs(numpy.sin(
+            30 * u + 3 * numpy.sin(10 * v))) < 0.03),
+}
+
+SDR_INPUTS = {
+    'dem_path': ('dem.tif', 'elevation'),
+    'erodibility_path': ('erodibility.tif', 'smooth'),
+    'erosivity_path': ('erosivity.tif', 'smooth'),
+    'lulc_path': ('lulc.tif', 'classes'),
+}
+SDR_OUTPUTS = {
+    'avoided_erosion': ('avoided_erosion.tif', 'skewed'),
+    'avoided_export': ('avoided_export.tif', 'skewed'),
+    'sed_deposition': ('sed_deposition.tif', 'skewed'),
+    'sed_export': ('sed_export.tif', 'skewed'),
+    'rkls': ('rkls.tif', 'skewed'),
+    'usle': ('usle.tif', 'skewed'),
+}
+SDR_INTERMEDIATES = {
+    'pit_filled_dem': ('pit_filled_dem.tif', 'elevation'),
+    'what_drains_to_stream': ('what_drains_to_stream.tif', 'mask'),
+    'stream': ('stream.tif', 'streams'),
+}
+SDR_RESULTS_COLUMNS = [
+    'usle_tot', 'sed_export', 'sed_dep', 'avoid_exp', 'avoid_eros']
+
+CV_RANK_VARS = ['R_hab', 'R_wind', 'R_wave', 'R_surge', 'R_relief']
+CV_HABITATS = ['kelp', 'seagrass', 'reef']
+
+
+def write_raster(target_path, size, kind):
+    """Write a square raster of a given kind, a strip at a time.
+
+    Args:
+        target_path (str): path to the GeoTIFF to write.
+        size (int): width and height of the raster, in pixels.
+        kind (str): one of ``RASTER_KINDS``.
+
+    Returns:
+        ``None``
+    """
+    (datatype, nodata, func) = RASTER_KINDS[kind]
+    raster = gdal.GetDriverByName('GTiff').Create(
+        target_path, size, size, 1, datatype, options=GTIFF_OPTIONS)
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(EPSG)
+    raster.SetProjection(srs.ExportToWkt())
+    raster.SetGeoTransform(
+        (ORIGIN[0], PIXEL_SIZE, 0, ORIGIN[1], 0, -PIXEL_SIZE))
+    band = raster.GetRasterBand(1)
+    band.SetNoDataValue(nodata)
+    u = (numpy.arange(size) / size)[numpy.newaxis, :]
+    for yoff in range(0, size, STRIP_ROWS):
+        v = (numpy.arange(yoff, min(yoff + STRIP_ROWS, size))
+             / size)[:, numpy.newaxis]
+        values = numpy.broadcast_to(func(u, v), (v.size, size))
+        outside = (u - 0.5) ** 2 + (v - 0.5) ** 2 > 0.48 ** 2
+        band.WriteArray(numpy.where(outside, nodata, values), 0, yoff)
+    band = None
+    raster = None
+
+
+def write_watersheds(target_path, raster_size, n_features,
+                     vertices_per_feature=200):
+    """Write a grid of watershed polygons with SDR results fields.
+
+    Args:
+        target_path (str): path to the vector to write. The format is
+            determined by the extension, e.g. ``.shp`` or ``.gpkg``.
+        raster_size (int): width and height of the rasters, in pixels. The
+            grid covers the same extent.
+        n_features (int): number of watersheds.
+        vertices_per_feature (int): approximate number of vertices in each
+            polygon, since real watershed boundaries are detailed.
+
+    Returns:
+        ``None``
+    """
+    n_cols = math.ceil(math.sqrt(n_features))
+    cell_size = raster_size * PIXEL_SIZE / n_cols
+    index = numpy.arange(n_features)
+    xmin = ORIGIN[0] + (index % n_cols) * cell_size
+    ymax = ORIGIN[1] - (index // n_cols) * cell_size
+    geometries = shapely.segmentize(
+        shapely.box(xmin, ymax - cell_size, xmin + cell_size, ymax),
+        4 * cell_size / vertices_per_feature)
+    rng = numpy.random.default_rng(0)
+    fields = {'ws_id': index}
+    for column in SDR_RESULTS_COLUMNS:
+        fields[column] = rng.lognormal(3, 2, n_features)
+    geopandas.GeoDataFrame(
+        fields, geometry=geometries, crs=EPSG).to_file(target_path)
+
+
+def make_sdr_workspace(workspace_dir, raster_size, n_watersheds):
+    """Write a synthetic SDR workspace.
+
+    Args:
+        workspace_dir (str): directory in which to write the workspace.
+        raster_size (int): width and height of every raster, in pixels.
+        n_watersheds (int): number of features in the watershed results.
+
+    Returns:
+        A (file_registry, args_dict) tuple, as from a run of SDR.
+    """
+    intermediate_dir = os.path.join(workspace_dir, 'intermediate_outputs')
+    input_dir = os.path.join(workspace_dir, 'inputs')
+    for directory in (intermediate_dir, input_dir):
+        os.makedirs(directory, exist_ok=True)
+
+    args_dict = {
+        'workspace_dir': workspace_dir,
+        'results_suffix': '',
+        'flow_dir_algorithm': 'MFD',
+    }
+    for (key, (filename, kind)) in SDR_INPUTS.items():
+        args_dict[key] = os.path.join(input_dir, filename)
+        write_raster(args_dict[key], raster_size, kind)
+
+    file_registry = {}
+    for (outputs, directory) in ((SDR_OUTPUTS, workspace_dir),
+                                 (SDR_INTERMEDIATES, intermediate_dir)):
+        for (key, (filename, kind)) in outputs.items():
+            file_registry[key] = os.path.join(directory, filename)
+            write_raster(file_registry[key], raster_size, kind)
+            # InVEST describes its outputs in metadata sidecars.
+            geometamaker.describe(
+                file_registry[key], compute_stats=True).write()
+
+    file_registry['watershed_results_sdr'] = os.path.join(
+        workspace_dir, 'watershed_results_sdr.shp')
+    write_watersheds(
+        file_registry['watershed_results_sdr'], raster_size, n_watersheds)
+    return (file_registry, args_dict)
+
+
+def make_cv_workspace(workspace_dir, n_points):
+    """Write a synthetic Coastal Vulnerability workspace.
+
+    Shore points are spaced along a wavy coastline, with land to the
+    south.
+
+    Args:
+        workspace_dir (str): directory in which to write the workspace.
+        n_points (int): number of shore points.
+
+    Returns:
+        A (file_registry, args_dict) tuple, as from a run of the model.
+    """
+    intermediate_dir = os.path.join(workspace_dir, 'intermediate')
+    os.makedirs(intermediate_dir, exist_ok=True)
+    rng = numpy.random.default_rng(0)
+    spacing = 250  # meters
+    length = n_points * spacing
+    x = ORIGIN[0] + numpy.arange(n_points) * spacing
+    y = ORIGIN[1] + 0.05 * length * numpy.sin(
+        numpy.linspace(0, 12 * numpy.pi, n_points))
+    points = shapely.points(x, y)
+    shore_id = numpy.arange(n_points)
+
+    landmass = shapely.Polygon(
+        [(x[0], y.min() - 0.1 * length)]
+        + list(zip(x, y - spacing))
+        + [(x[-1], y.min() - 0.1 * length)])
+
+    ranks = {var: rng.integers(1, 6, n_points).astype(float)
+             for var in CV_RANK_VARS}
+    exposure = numpy.exp(
+        numpy.mean(numpy.log(list(ranks.values())), axis=0))
+    exposure[rng.random(n_points) < 0.01] = numpy.nan
+
+    file_registry = {
+        'coastal_exposure': os.path.join(
+            workspace_dir, 'coastal_exposure.gpkg'),
+        'clipped_projected_landmass': os.path.join(
+            intermediate_dir, 'clipped_projected_landmass.gpkg'),
+        'habitat_protection': os.path.join(
+            intermediate_dir, 'habitat_protection.csv'),
+        'intermediate_exposure_csv': os.path.join(
+            intermediate_dir, 'intermediate_exposure.csv'),
+        'wave_energies': os.path.join(intermediate_dir, 'wave_energies.gpkg'),
+    }
+    geopandas.GeoDataFrame({
+        'shore_id': shore_id,
+        'exposure': exposure,
+        'habitat_role': rng.uniform(0, 2, n_points),
+        'population': rng.lognormal(5, 2, n_points),
+        **ranks,
+    }, geometry=points, crs=EPSG).to_file(file_registry['coastal_exposure'])
+    geopandas.GeoDataFrame(
+        geometry=[landmass], crs=EPSG).to_file(
+            file_registry['clipped_projected_landmass'])
+    pandas.DataFrame({
+        'shore_id': shore_id,
+        **{habitat: rng.choice([1, 2, 5], n_points)
+           for habitat in CV_HABITATS},
+        'R_hab': ranks['R_hab'],
+    }).to_csv(file_registry['habitat_protection'], index=False)
+    pandas.DataFrame({
+        'shore_id': shore_id,
+        'relief': rng.uniform(0, 100, n_points),
+        'wind': rng.uniform(0, 20, n_points),
+        'wave': rng.lognormal(2, 1, n_points),
+        'surge': rng.uniform(0, 50000, n_points),
+    }).to_csv(file_registry['intermediate_exposure_csv'], index=False)
+    geopandas.GeoDataFrame({
+        'shore_id': shore_id,
+        'max_E_type': rng.choice(['local', 'ocean'], n_points),
+    }, geometry=points, crs=EPSG).to_file(file_registry['wave_energies'])
+
+    args_dict = {
+        'workspace_dir': workspace_dir,
+        'results_suffix': '',
+        'habitat_table_path': os.path.join(workspace_dir, 'habitats.csv'),
+    }
+    pandas.DataFrame({
+        'id': CV_HABITATS,
+        'path': [f'{habitat}.gpkg' for habitat in CV_HABITATS],
+        'rank': [1, 2, 3],
+        'protection distance (m)': [500, 200, 1000],
+    }).to_csv(args_dict['habitat_table_path'], index=False)
+    return (file_registry, args_dict)
+
+
+def make_workspace(model, workspace_dir, scale):
+    """Write a synthetic workspace, unless it was already written.
+
+    Args:
+        model (str): 'sdr' or 'coastal_vulnerability'.
+        workspace_dir (str): directory in which to write the workspace.
+        scale (dict): sizes of the workspace's data: ``raster_size`` and
+            ``n_watersheds`` for SDR, ``n_shore_points`` for Coastal
+            Vulnerability.
+
+    Returns:
+        A (file_registry, args_dict) tuple.
+    """
+    index_path = os.path.join(workspace_dir, 'benchmark_workspace.json')
+    if os.path.exists(index_path):
+        with open(index_path) as index_file:
+            index = json.load(index_file)
+        if index['model'] == model and index['scale'] == scale:
+            return (index['file_registry'], index['args_dict'])
+
+    os.makedirs(workspace_dir, exist_ok=True)
+    if model == 'sdr':
+        (file_registry, args_dict) = make_sdr_workspace(
+            workspace_dir, scale['raster_size'], scale['n_watersheds'])
+    elif model == 'coastal_vulnerability':
+        (file_registry, args_dict) = make_cv_workspace(
+            workspace_dir, scale['n_shore_points'])
+    else:
+        raise ValueError(f'No synthetic workspace for model {model}')
+
+    with open(index_path, 'w') as index_file:
+        json.dump({'model': model, 'scale': scale,
+                   'file_registry': file_registry, 'args_dict': args_dict},
+                  index_file, indent=2)
+    return (file_registry, args_dict)
@@ -1,7 +1,11 @@
 import jinja2
 
+from invest_reports import cache
+
 jinja_env = jinja2.Environment(
     loader=jinja2.PackageLoader('invest_reports', 'jinja_templates'),
     autoescape=jinja2.select_autoescape(),
-    undefined=jinja2.StrictUndefined
+    undefined=jinja2.StrictUndefined,
+    # Templates are compiled once per user, rather than once per process.
+    bytecode_cache=cache.TemplateBytecodeCache(),
 )
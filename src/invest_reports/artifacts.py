@@ -0,0 +1,107 @@
+# A per-report registry of artifacts derived from model files (metadata,
+# raster info, arrays, stats), so that each is loaded at most once per report
+# no matter how many helpers ask for it.
+
+import concurrent.futures
+import contextlib
+import threading
+import weakref
+
+_active_registry = None
+
+
+class ArtifactRegistry:
+    """Memoized artifacts, keyed by kind (e.g. ``'raster_info'``) and key.
+
+    Loading is thread-safe: if several threads ask for the same artifact
+    at once, it is loaded once and the others wait for it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._futures = {}
+        self._weak_values = weakref.WeakValueDictionary()
+
+    def get(self, kind, key, load_func):
+        """Get an artifact, loading it if this registry does not have it.
+
+        Args:
+            kind (str): the kind of artifact.
+            key (hashable): identifies the artifact among those of its kind.
+            load_func (callable): called with no arguments to load the
+                artifact. Exceptions are raised to every caller and are
+                not memoized.
+
+        Returns:
+            The artifact.
+        """
+        with self._lock:
+            future = self._futures.get((kind, key))
+            is_loader = future is None
+            if is_loader:
+                future = concurrent.futures.Future()
+                self._futures[(kind, key)] = future
+        if is_loader:
+            try:
+                future.set_result(load_func())
+            except BaseException as err:
+                with self._lock:
+                    del self._futures[(kind, key)]
+                future.set_exception(err)
+        return future.result()
+
+    def get_weak(self, kind, key, load_func):
+        """Like ``get``, but only memoize the artifact while it is in use.
+
+        Use this for large artifacts, such as arrays, that should be shared
+        while something else holds them but freed as soon as nothing does.
+        The artifact must support weak references.
+        """
+        with self._lock:
+            value = self._weak_values.get((kind, key))
+        if value is None:
+            value = load_func()
+            with self._lock:
+                self._weak_values[(kind, key)] = value
+        return value
+
+
+@contextlib.contextmanager
+def report_scope():
+    """Memoize artifacts for the duration of a ``with`` block.
+
+    Helpers that load artifacts through ``memoize`` or ``memoize_weak``
+    share them within the block. Scopes may be nested; the innermost one
+    is used.
+
+    Yields:
+        The active ``ArtifactRegistry``.
+    """
+    global _active_registry
+    previous_registry = _active_registry
+    _active_registry = ArtifactRegistry()
+    try:
+        yield _active_registry
+    finally:
+        _active_registry = previous_registry
+
+
+def memoize(kind, key, load_func):
+    """Load an artifact through the active registry, if there is one.
+
+    Args:
+        kind, key, load_func: see ``ArtifactRegistry.get``.
+
+    Returns:
+        The artifact.
+    """
+    if _active_registry is None:
+        return load_func()
+    return _active_registry.get(kind, key, load_func)
+
+
+def memoize_weak(kind, key, load_func):
+    """Like ``memoize``, but see ``ArtifactRegistry.get_weak``."""
+    if _active_registry is None:
+        return load_func()
+    return _active_registry.get_weak(kind, key, load_func)
@@ -0,0 +1,233 @@
+# Persistent, size-bounded caches for report artifacts.
+# Cached files live in a per-user directory, never in a model workspace,
+# so that read-only or shared workspaces are left untouched.
+
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+
+import jinja2
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_DIR_ENV_VAR = 'INVEST_REPORTS_CACHE_DIR'
+
+_cache_dir = None
+
+
+def _default_cache_dir():
+    if sys.platform == 'win32':
+        base_dir = os.environ.get(
+            'LOCALAPPDATA', os.path.expanduser('~\\AppData\\Local'))
+    elif sys.platform == 'darwin':
+        base_dir = os.path.expanduser('~/Library/Caches')
+    else:
+        base_dir = os.environ.get(
+            'XDG_CACHE_HOME', os.path.expanduser('~/.cache'))
+    return os.path.join(base_dir, 'invest-reports')
+
+
+def get_cache_dir():
+    """Get the root directory of the report caches.
+
+    The directory is, in order of precedence: the directory passed to
+    ``set_cache_dir``; the value of the ``INVEST_REPORTS_CACHE_DIR``
+    environment variable; or a per-user cache directory appropriate to
+    the platform (e.g., ``~/.cache/invest-reports`` on Linux).
+
+    Returns:
+        A path to a directory (which may not exist yet).
+    """
+    if _cache_dir is not None:
+        return _cache_dir
+    return os.environ.get(CACHE_DIR_ENV_VAR) or _default_cache_dir()
+
+
+def set_cache_dir(cache_dir):
+    """Set the root directory of the report caches for this process.
+
+    Args:
+        cache_dir (str): path to a directory. Pass ``None`` to restore
+            the default.
+
+    Returns:
+        ``None``
+    """
+    global _cache_dir
+    _cache_dir = cache_dir
+
+
+def file_identity(filepath, hash_contents=False):
+    """Describe a file by its absolute path, size, and modification time.
+
+    Args:
+        filepath (str): path to a file.
+        hash_contents (bool): if True, describe the file by its size and a
+            hash of its contents instead. This reads the whole file, but
+            identifies copies of the same file in different places (or
+            with different modification times) as the same.
+
+    Returns:
+        A (path, size, mtime_ns) tuple, or a (size, sha256) tuple if
+            ``hash_contents`` is True. Any change to the file's contents
+            made through normal means changes at least one of these.
+    """
+    stat = os.stat(filepath)
+    if hash_contents:
+        digest = hashlib.sha256()
+        with open(filepath, 'rb') as file:
+            for chunk in iter(lambda: file.read(2**20), b''):
+                digest.update(chunk)
+        return (stat.st_size, digest.hexdigest())
+    return (os.path.abspath(filepath), stat.st_size, stat.st_mtime_ns)
+
+
+def make_key(*parts):
+    """Make a cache key from any number of ``repr``-able parts.
+
+    Returns:
+        A hex digest string that is safe to use as a filename.
+    """
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()
+
+
+class FileCache:
+    """A directory of cached files, evicted least-recently-used first.
+
+    Every ``get`` of an entry refreshes its modification time, and every
+    ``put`` evicts the stalest entries until the total size of the
+    directory is no more than ``max_bytes``. Errors reading or writing the
+    cache are logged and otherwise ignored, since a cache miss is always
+    recoverable.
+    """
+
+    def __init__(self, name, suffix, max_bytes):
+        """Initialize a FileCache.
+
+        Args:
+            name (str): name of the cache's subdirectory within the
+                directory returned by ``get_cache_dir``.
+            suffix (str): file extension of cached entries, e.g. ``.npy``.
+            max_bytes (int): maximum total size of the cached entries.
+        """
+        self.name = name
+        self.suffix = suffix
+        self.max_bytes = max_bytes
+
+    @property
+    def cache_dir(self):
+        return os.path.join(get_cache_dir(), self.name)
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f'{key}{self.suffix}')
+
+    def get(self, key):
+        """Get the path to a cached entry, if it exists.
+
+        Args:
+            key (str): a key from ``make_key``.
+
+        Returns:
+            The path to the cached file, or ``None`` on a cache miss.
+        """
+        path = self._entry_path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, write_func):
+        """Add an entry to the cache.
+
+        Args:
+            key (str): a key from ``make_key``.
+            write_func (callable): called with a binary file object opened
+                for writing; writes the entry's contents.
+
+        Returns:
+            ``None``
+        """
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first so that concurrent reports
+            # never read a partially-written entry.
+            fd, temp_path = tempfile.mkstemp(
+                prefix='.', suffix=self.suffix, dir=self.cache_dir)
+            try:
+                with os.fdopen(fd, 'wb') as file:
+                    write_func(file)
+                os.replace(temp_path, self._entry_path(key))
+            except BaseException:
+                os.remove(temp_path)
+                raise
+        except OSError as err:
+            LOGGER.debug(f'Could not write to cache {self.cache_dir}: {err}')
+            return
+        self.evict()
+
+    def evict(self):
+        """Remove least-recently-used entries until under ``max_bytes``.
+
+        Returns:
+            ``None``
+        """
+        try:
+            # Skip hidden files, which are entries still being written.
+            entries = [entry for entry in os.scandir(self.cache_dir)
+                       if entry.is_file()
+                       and entry.name.endswith(self.suffix)
+                       and not entry.name.startswith('.')]
+            stats = [(entry.stat(), entry.path) for entry in entries]
+        except OSError as err:
+            LOGGER.debug(f'Could not scan cache {self.cache_dir}: {err}')
+            return
+        total_bytes = sum(stat.st_size for (stat, _) in stats)
+        for (stat, path) in sorted(stats, key=lambda x: x[0].st_mtime_ns):
+            if total_bytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total_bytes -= stat.st_size
+
+    def clear(self):
+        """Remove every entry from the cache.
+
+        Returns:
+            ``None``
+        """
+        max_bytes = self.max_bytes
+        self.max_bytes = 0
+        try:
+            self.evict()
+        finally:
+            self.max_bytes = max_bytes
+
+
+class TemplateBytecodeCache(jinja2.FileSystemBytecodeCache):
+    """Compiled Jinja templates, kept in the ``jinja-bytecode`` subdirectory
+    of the directory returned by ``get_cache_dir``.
+
+    Jinja keys each entry by the template's name and a checksum of its
+    source, so edited templates are recompiled. As with ``FileCache``,
+    errors writing the cache are logged and otherwise ignored.
+    """
+
+    def __init__(self):
+        """Initialize a TemplateBytecodeCache."""
+        self.pattern = '__jinja2_%s.cache'
+
+    @property
+    def directory(self):
+        return os.path.join(get_cache_dir(), 'jinja-bytecode')
+
+    def dump_bytecode(self, bucket):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            super().dump_bytecode(bucket)
+        except OSError as err:
+            LOGGER.debug(f'Could not write to cache {self.directory}: {err}')
@@ -0,0 +1,413 @@
+# Command-line tool to generate reports for many model runs at once.
+# Reports are generated by a pool of worker processes, each of which imports
+# the heavy dependencies and compiles the report templates once, then takes
+# jobs until the batch is done. A job that fails, crashes its worker, or
+# runs past its timeout is reported, and does not affect the other jobs.
+
+import argparse
+import collections
+import glob
+import importlib
+import json
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+import time
+import traceback
+
+from invest_reports import utils
+
+LOGGER = logging.getLogger(__name__)
+
+# Modules of the report generators, by InVEST model id.
+REPORT_MODULES = {
+    'sdr': 'invest_reports.jinja_report_generators.sdr_report_generator',
+    'ndr': 'invest_reports.jinja_report_generators.ndr_report_generator',
+    'coastal_vulnerability': (
+        'invest_reports.jinja_report_generators.cv_report_generator'),
+}
+
+# Report generators that take the raster plotting options of
+# ``sdr_ndr_report_generator.report``.
+RASTER_REPORT_MODELS = ('sdr', 'ndr')
+
+# Options taken by every report generator.
+COMMON_REPORT_OPTIONS = ('timing_summary', 'profile')
+
+# Imported by each worker before it takes any jobs, so that no job pays
+# for them.
+WARM_UP_MODULES = [
+    'natcap.invest.datastack', 'natcap.invest.models', 'pygeoprocessing',
+    'geometamaker', 'matplotlib.pyplot', 'pandas', 'geopandas', 'altair',
+] + list(REPORT_MODULES.values())
+
+# A batch is abandoned if this many workers in a row exit before they are
+# ready to take jobs, e.g. because the environment is broken.
+MAX_START_FAILURES = 3
+
+LOGFILE_PATTERN = 'InVEST-*-log-*.txt'
+FILE_REGISTRY_PATTERN = '*file_registry*.json'
+
+JobResult = collections.namedtuple(
+    'JobResult', ['path', 'status', 'seconds', 'report_path', 'error'])
+
+
+def _find_newest(directory, pattern):
+    paths = glob.glob(os.path.join(glob.escape(directory), pattern))
+    if not paths:
+        raise FileNotFoundError(
+            f'No file matching {pattern} found in {directory}')
+    return max(paths, key=os.path.getmtime)
+
+
+def _report_filename(model_id, args_dict):
+    suffix = args_dict.get('results_suffix') or ''
+    if suffix and not suffix.startswith('_'):
+        suffix = f'_{suffix}'
+    return f'{model_id}{suffix}.html'
+
+
+def load_job(path, model_id=None):
+    """Load what is needed to generate the report of a model run.
+
+    Args:
+        path (str): path to a model's workspace, or to the logfile of a
+            model run. If a workspace, its most recent logfile is used.
+        model_id (str): optional id of the model that was run. Defaults to
+            the model recorded in the logfile.
+
+    Returns:
+        A dict with the ``model_id``, ``model_spec``, ``args_dict`` and
+            ``file_registry`` of the run, and the ``target_html_filepath``
+            of its report, which is written to the workspace.
+
+    Raises:
+        FileNotFoundError: if there is no logfile, or no file registry
+            saved in the workspace.
+        ValueError: if no report is available for the model.
+    """
+    from natcap.invest import datastack
+    from natcap.invest import models
+
+    if os.path.isdir(path):
+        workspace_dir = path
+        logfile_path = _find_newest(workspace_dir, LOGFILE_PATTERN)
+    else:
+        workspace_dir = os.path.dirname(os.path.abspath(path))
+        logfile_path = path
+    parameter_set = datastack.extract_parameters_from_logfile(logfile_path)
+    if model_id is None:
+        model_id = parameter_set.model_id
+    if model_id not in REPORT_MODULES:
+        raise ValueError(f'No report is available for model {model_id}')
+
+    with open(_find_newest(workspace_dir, FILE_REGISTRY_PATTERN), 'r',
+              encoding='utf-8') as registry_file:
+        file_registry = json.load(registry_file)
+
+    return {
+        'model_id': model_id,
+        'model_spec': models.model_id_to_spec[model_id],
+        'args_dict': parameter_set.args,
+        'file_registry': file_registry,
+        'target_html_filepath': os.path.join(
+            workspace_dir, _report_filename(model_id, parameter_set.args)),
+    }
+
+
+def run_job(path, model_id=None, report_options=None):
+    """Generate the report of a model run.
+
+    Args:
+        path (str): path to a workspace or logfile, as for ``load_job``.
+        model_id (str): optional model id, as for ``load_job``.
+        report_options (dict): optional keyword arguments to the report
+            generators, e.g. ``image_encoding``. Other models ignore those
+            of the SDR and NDR report generators, except for
+            ``COMMON_REPORT_OPTIONS``.
+
+    Returns:
+        The path to the report.
+    """
+    job = load_job(path, model_id)
+    kwargs = dict(report_options or {})
+    if job['model_id'] not in RASTER_REPORT_MODELS:
+        kwargs = {key: value for (key, value) in kwargs.items()
+                  if key in COMMON_REPORT_OPTIONS}
+    report_module = importlib.import_module(REPORT_MODULES[job['model_id']])
+    report_module.report(
+        job['file_registry'], job['args_dict'], job['model_spec'],
+        job['target_html_filepath'], **kwargs)
+    return job['target_html_filepath']
+
+
+def _warm_up(module_names):
+    for module_name in module_names:
+        try:
+            importlib.import_module(module_name)
+        except ImportError as err:
+            # Jobs that need the module will fail with the same error.
+            LOGGER.warning(f'Could not import {module_name}: {err}')
+
+
+def _worker_main(conn, report_options, job_func, warm_up_modules):
+    """Run jobs sent over ``conn`` until sent ``None``."""
+    _warm_up(warm_up_modules)
+    conn.send(('ready', None))
+    while True:
+        job = conn.recv()
+        if job is None:
+            break
+        (path, model_id) = job
+        try:
+            conn.send(('done', job_func(path, model_id, report_options)))
+        except Exception:
+            conn.send(('failed', traceback.format_exc()))
+
+
+class _Worker:
+    """A worker process, and the job it is running, if any."""
+
+    def __init__(self, report_options, job_func):
+        (self.conn, child_conn) = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(
+            target=_worker_main,
+            args=(child_conn, report_options, job_func, WARM_UP_MODULES),
+            daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.path = None
+        self.start_time = None
+
+    def start(self, path, model_id):
+        self.conn.send((path, model_id))
+        self.path = path
+        self.start_time = time.monotonic()
+
+    def finish(self, status, report_path=None, error=None):
+        result = JobResult(self.path, status,
+                           time.monotonic() - self.start_time,
+                           report_path, error)
+        self.path = None
+        self.start_time = None
+        return result
+
+    def stop(self, kill=False):
+        if not kill and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+            self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.conn.close()
+
+
+def _log_result(result):
+    if result.status == 'ok':
+        LOGGER.info(f'Created {result.report_path} in {result.seconds:.1f}s')
+    else:
+        LOGGER.error(f'Report of {result.path} {result.status} after '
+                     f'{result.seconds:.1f}s:\n{result.error}')
+
+
+def run_batch(paths, model_id=None, n_workers=None, timeout=None,
+              report_options=None, job_func=None):
+    """Generate reports for many model runs with a pool of workers.
+
+    Args:
+        paths (list[str]): paths to workspaces or logfiles, as for
+            ``load_job``.
+        model_id (str): optional model id, as for ``load_job``.
+        n_workers (int): number of worker processes. Defaults to the
+            number of CPUs, or the number of jobs if fewer.
+        timeout (float): optional time limit, in seconds, for each job. A
+            worker that exceeds it is terminated and replaced.
+        report_options (dict): optional keyword arguments to the report
+            generators. See ``run_job``.
+        job_func (callable): the function workers call to run each job,
+            with the same arguments as ``run_job``, which is the default.
+            It must be importable by the workers, which may be spawned
+            rather than forked.
+
+    Returns:
+        A list of ``JobResult``, in the order the jobs finished. Each has a
+            ``status`` of 'ok', 'failed', 'crashed' or 'timeout'.
+
+    Raises:
+        RuntimeError: if ``MAX_START_FAILURES`` worker processes in a row
+            exit before they are ready. A worker that exits while starting
+            or between jobs is otherwise logged and replaced.
+    """
+    if job_func is None:
+        job_func = run_job
+    pending = collections.deque(paths)
+    n_workers = min(n_workers or os.cpu_count() or 1, len(pending))
+    workers = [_Worker(report_options, job_func) for _ in range(n_workers)]
+    start_failures = 0
+    results = []
+    try:
+        while pending or any(worker.path for worker in workers):
+            for worker in workers:
+                if worker.ready and worker.path is None and pending:
+                    worker.start(pending.popleft(), model_id)
+
+            wait_timeout = None
+            if timeout is not None:
+                deadlines = [worker.start_time + timeout
+                             for worker in workers if worker.path]
+                if deadlines:
+                    wait_timeout = max(0, min(deadlines) - time.monotonic())
+            ready = multiprocessing.connection.wait(
+                [worker.conn for worker in workers], wait_timeout)
+
+            for (i, worker) in enumerate(workers):
+                result = None
+                replace = False
+                if worker.conn in ready:
+                    try:
+                        (status, value) = worker.conn.recv()
+                    except EOFError:
+                        worker.process.join(timeout=5)
+                        replace = True
+                        if not worker.ready:
+                            start_failures += 1
+                            LOGGER.error(
+                                'Report worker exited with code '
+                                f'{worker.process.exitcode} while starting '
+                                f'({start_failures} in a row)')
+                            if start_failures >= MAX_START_FAILURES:
+                                raise RuntimeError(
+                                    f'{start_failures} report workers in a '
+                                    'row exited while starting')
+                        elif worker.path is None:
+                            LOGGER.error(
+                                'Idle report worker exited with code '
+                                f'{worker.process.exitcode}')
+                        else:
+                            result = worker.finish(
+                                'crashed', error='Worker exited with code '
+                                f'{worker.process.exitcode}')
+                    else:
+                        if status == 'ready':
+                            worker.ready = True
+                            start_failures = 0
+                        elif status == 'done':
+                            result = worker.finish('ok', report_path=value)
+                        else:
+                            result = worker.finish(status, error=value)
+                elif (timeout is not None and worker.path
+                        and time.monotonic() - worker.start_time > timeout):
+                    result = worker.finish(
+                        'timeout', error=f'Timed out after {timeout}s')
+                    replace = True
+
+                if replace:
+                    worker.stop(kill=True)
+                    workers[i] = _Worker(report_options, job_func)
+                if result is not None:
+                    _log_result(result)
+                    results.append(result)
+    finally:
+        for worker in workers:
+            worker.stop()
+    return results
+
+
+def summarize(results, elapsed):
+    """Summarize the results of a batch.
+
+    Args:
+        results (list[JobResult]): results from ``run_batch``.
+        elapsed (float): wall-clock time of the batch, in seconds.
+
+    Returns:
+        A multi-line string: the number of reports generated, the batch's
+            throughput, and a line for each job that did not succeed.
+    """
+    counts = collections.Counter(result.status for result in results)
+    job_seconds = [result.seconds for result in results]
+    jobs_per_minute = len(results) / elapsed * 60 if elapsed else 0
+    lines = [
+        f'{counts["ok"]} of {len(results)} reports generated in '
+        f'{elapsed:.1f}s ({jobs_per_minute:.1f} jobs/minute)',
+    ]
+    if job_seconds:
+        lines.append(
+            f'Job time: mean {sum(job_seconds) / len(job_seconds):.1f}s, '
+            f'max {max(job_seconds):.1f}s')
+    for status in ('failed', 'crashed', 'timeout'):
+        if counts[status]:
+            lines.append(f'{counts[status]} {status}:')
+            lines.extend(f'  {result.path}' for result in results
+                         if result.status == status)
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description=(
+            'Generate InVEST reports for many model runs, with a pool of '
+            'worker processes. Each report is written to its workspace.'))
+    parser.add_argument(
+        'paths', nargs='+', metavar='PATH',
+        help='a model workspace, or the logfile of a model run')
+    parser.add_argument(
+        '--model', choices=sorted(REPORT_MODULES),
+        help='the model that was run. Defaults to the model in the logfile.')
+    parser.add_argument(
+        '-j', '--workers', type=int,
+        help='number of worker processes (default: number of CPUs)')
+    parser.add_argument(
+        '--timeout', type=float,
+        help='time limit for each report, in seconds')
+    parser.add_argument(
+        '--max-memory', type=int,
+        help=('memory budget for reading and plotting rasters, including '
+              "GDAL's block cache, in bytes"))
+    parser.add_argument(
+        '--image-format', choices=utils.IMAGE_FORMATS, default='png')
+    parser.add_argument(
+        '--quantize', action='store_true',
+        help='store PNG figures with a palette of at most 256 colors')
+    parser.add_argument(
+        '--external-images', action='store_true',
+        help='write figures as image files alongside each report')
+    parser.add_argument(
+        '--tile-viewers', action='store_true',
+        help='add zoomable, full-resolution maps of output rasters')
+    parser.add_argument(
+        '--timing-summary', action='store_true',
+        help='summarize the time taken by each stage in the report footer')
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='profile each report, writing the stats next to it')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    report_options = {
+        'max_memory': args.max_memory,
+        'image_encoding': utils.ImageEncoding(
+            format=args.image_format, quantize=args.quantize),
+        'external_images': args.external_images,
+        'tile_viewers': args.tile_viewers,
+        'timing_summary': args.timing_summary,
+        'profile': args.profile,
+    }
+
+    start_time = time.monotonic()
+    results = run_batch(
+        args.paths, model_id=args.model, n_workers=args.workers,
+        timeout=args.timeout, report_options=report_options)
+    print(summarize(results, time.monotonic() - start_time))
+    return 0 if all(result.status == 'ok' for result in results) else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
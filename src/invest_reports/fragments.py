@@ -0,0 +1,78 @@
+# Cached HTML fragments that depend only on a model's spec. The list of
+# output metadata is the same in every report of a given model and
+# version of InVEST, so it is rendered once and reused across reports.
+
+import hashlib
+import logging
+
+import markupsafe
+
+from invest_reports import cache
+from invest_reports import jinja_env
+from invest_reports.lazy_import import lazy_import
+
+natcap_invest = lazy_import('natcap.invest')
+
+LOGGER = logging.getLogger(__name__)
+
+FRAGMENT_CACHE = cache.FileCache('fragments', '.html', max_bytes=16 * 2**20)
+
+# Fragments already rendered or loaded by this process, keyed like
+# FRAGMENT_CACHE.
+_fragments = {}
+
+
+def _template_checksum(template_name):
+    """Hash a template's source, so that edits invalidate its fragments."""
+    (source, _, _) = jinja_env.loader.get_source(jinja_env, template_name)
+    return hashlib.sha256(source.encode('utf-8')).hexdigest()
+
+
+def _get_fragment(key, render_func):
+    """Get a fragment from memory or disk, rendering it only on a miss.
+
+    Args:
+        key (str): a key from ``cache.make_key``.
+        render_func (callable): called with no arguments; returns the
+            fragment's HTML.
+
+    Returns:
+        ``markupsafe.Markup``
+    """
+    if key in _fragments:
+        return _fragments[key]
+    html = None
+    cached_path = FRAGMENT_CACHE.get(key)
+    if cached_path is not None:
+        try:
+            with open(cached_path, 'r', encoding='utf-8') as file:
+                html = file.read()
+        except OSError as err:
+            LOGGER.debug(
+                f'Could not load cached fragment {cached_path}: {err}')
+    if html is None:
+        html = str(render_func())
+        FRAGMENT_CACHE.put(key, lambda file: file.write(html.encode('utf-8')))
+    _fragments[key] = markupsafe.Markup(html)
+    return _fragments[key]
+
+
+def list_metadata(model_spec, invest_version=None):
+    """Render the ``list_metadata`` macro of ``metadata.html`` for a model.
+
+    Args:
+        model_spec (natcap.invest.spec.ModelSpec): the model's spec.
+        invest_version (str): version of InVEST that ``model_spec`` is
+            from. Defaults to the version of the installed natcap.invest.
+
+    Returns:
+        ``markupsafe.Markup``, the same as calling the macro with
+            ``model_spec.outputs``.
+    """
+    if invest_version is None:
+        invest_version = natcap_invest.__version__
+    key = cache.make_key(
+        'list_metadata', model_spec.model_id, invest_version,
+        _template_checksum('metadata.html'))
+    return _get_fragment(key, lambda: jinja_env.get_template(
+        'metadata.html').module.list_metadata(model_spec.outputs))
@@ -0,0 +1,405 @@
+# Structured timing and memory measurements of the stages of a report:
+# reading rasters, plotting, encoding figures, building tables, serializing
+# chart specs and rendering templates. Each stage is measured as a span,
+# which is logged, passed to any hooks, and recorded with its report. When
+# a report is done, its spans are passed to sinks, the default one of which
+# writes them to a JSON file next to the report.
+
+import contextlib
+import cProfile
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+_STATUS_PATTERN = re.compile(rb'^Vm(RSS|HWM):\s+(\d+) kB', re.MULTILINE)
+
+_active_recorder = None
+_hooks = []
+_sinks = []
+_local = threading.local()
+# Whether to reset the peak memory of the process at the start and end of
+# each span, so that the peak within each span can be measured. See
+# ``report_timing``.
+_reset_peaks = False
+# Whether the peak memory of the process can be reset. Unknown until first
+# tried.
+_can_reset_peak = None
+# The peak memory of the process over its life, including peaks since
+# reset, or ``None`` if not known.
+_lifetime_peak = None
+
+
+def _read_memory_usage():
+    """Get the (current, peak) resident memory of this process, in bytes.
+
+    Either may be ``None`` where the platform does not provide it. On
+    Linux, the peak is since it was last reset by ``_reset_peak_memory``;
+    elsewhere, it is the peak over the life of the process.
+    """
+    try:
+        with open('/proc/self/status', 'rb') as status_file:
+            status = dict(_STATUS_PATTERN.findall(status_file.read()))
+        return (int(status[b'RSS']) * 1024, int(status[b'HWM']) * 1024)
+    except (OSError, KeyError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return (None, None)
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes; macOS, bytes.
+    return (None, max_rss if sys.platform == 'darwin' else max_rss * 1024)
+
+
+def _memory_usage():
+    """Get the (current, peak) resident memory, as ``_read_memory_usage``,
+    keeping track of the peak over the life of the process."""
+    global _lifetime_peak
+    (current, peak) = _read_memory_usage()
+    if peak is not None:
+        _lifetime_peak = max(_lifetime_peak or 0, peak)
+    return (current, peak)
+
+
+def max_rss_bytes():
+    """Get the peak resident memory of this process over its life.
+
+    Unlike ``resource.getrusage``, this includes any peaks from before the
+    peak was reset to measure spans (see ``report_timing``).
+
+    Returns:
+        The peak, in bytes, or ``None`` if the platform does not provide it.
+    """
+    _memory_usage()
+    return _lifetime_peak
+
+
+def _reset_peak_memory():
+    """Reset the peak resident memory of this process, if enabled and
+    possible.
+
+    The peak is that of the whole process, which other tools (e.g.
+    ``/usr/bin/time``, or ``resource.getrusage``) also report, so it is
+    only reset if ``report_timing`` was asked to.
+
+    Returns:
+        ``True`` if the peak was reset.
+    """
+    global _can_reset_peak
+    if not _reset_peaks or _can_reset_peak is False:
+        return False
+    try:
+        # Resets the peak (VmHWM) to the current resident memory.
+        with open('/proc/self/clear_refs', 'w') as clear_refs_file:
+            clear_refs_file.write('5')
+        _can_reset_peak = True
+    except OSError:
+        _can_reset_peak = False
+    return _can_reset_peak
+
+
+class _Frame:
+    """A span in progress, and the peak memory seen within it so far."""
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.start_rss = None
+        self.end_rss = None
+        # The peak of the process at the start of the span.
+        self.start_peak = None
+        # The greatest memory use known within the span so far.
+        self.peak_rss = None
+        self.peak_is_reset = False
+
+    def observe(self, rss):
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, rss)
+
+    def enter(self, parent):
+        (self.start_rss, self.start_peak) = _memory_usage()
+        if parent is not None and parent.peak_is_reset:
+            # The peak since the parent's last reset.
+            parent.observe(self.start_peak)
+        self.peak_is_reset = (
+            self.start_rss is not None and self.start_peak is not None
+            and _reset_peak_memory())
+        self.observe(self.start_rss)
+
+    def exit(self, parent):
+        """Get the peak memory of the span, or ``None`` if not known."""
+        (self.end_rss, peak) = _memory_usage()
+        self.observe(self.end_rss)
+        if self.peak_is_reset:
+            self.observe(peak)
+            _reset_peak_memory()
+        elif (peak is not None and self.start_peak is not None
+                and peak > self.start_peak):
+            # The process reached a new peak within the span. Otherwise,
+            # the memory sampled within the span is all that is known.
+            self.observe(peak)
+        if parent is not None:
+            parent.observe(self.peak_rss)
+        return self.peak_rss
+
+
+def _get_stack():
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+class Recorder:
+    """The spans of one report, in the order they finished."""
+
+    def __init__(self, target_html_filepath):
+        self.target_html_filepath = target_html_filepath
+        self.start_time = time.perf_counter()
+        self.spans = []
+        # The peak memory of the process over its life, when the report
+        # was done.
+        self.max_rss_bytes = None
+
+    def summary(self):
+        """Summarize the spans of each stage.
+
+        A stage's time includes the time of the stages nested in it, e.g.
+        raster reads within plotting.
+
+        Returns:
+            A list of dicts, one per stage in the order the stages first
+                finished, each with the ``stage``, the number of
+                ``calls``, the total ``seconds`` and the greatest
+                ``peak_rss_bytes`` (or ``None`` if not known) of its spans.
+        """
+        stages = {}
+        for span_record in self.spans:
+            stage = stages.setdefault(span_record['stage'], {
+                'stage': span_record['stage'], 'calls': 0, 'seconds': 0,
+                'peak_rss_bytes': None})
+            stage['calls'] += 1
+            stage['seconds'] += span_record['seconds']
+            if span_record['peak_rss_bytes'] is not None:
+                stage['peak_rss_bytes'] = max(
+                    stage['peak_rss_bytes'] or 0,
+                    span_record['peak_rss_bytes'])
+        return list(stages.values())
+
+
+def add_hook(hook):
+    """Call a function with every span, as soon as it finishes.
+
+    Args:
+        hook (callable): called with the dict that records a span. See
+            ``span``. Exceptions raised by a hook are logged and ignored.
+
+    Returns:
+        ``None``
+    """
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    """Stop calling a function added with ``add_hook``."""
+    _hooks.remove(hook)
+
+
+def add_sink(sink):
+    """Call a function with the spans of every report, when it is done.
+
+    Args:
+        sink (callable): called with the report's ``Recorder``, whether or
+            not the report was generated successfully. Exceptions raised
+            by a sink are logged and ignored.
+
+    Returns:
+        ``None``
+    """
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    """Stop calling a function added with ``add_sink``.
+
+    ``write_json`` is a sink by default; remove it to stop writing
+    ``.timings.json`` files next to reports.
+    """
+    _sinks.remove(sink)
+
+
+def _call_each(funcs, arg):
+    for func in list(funcs):
+        try:
+            func(arg)
+        except Exception:
+            LOGGER.exception(f'Instrumentation callback {func!r} failed')
+
+
+@contextlib.contextmanager
+def span(stage, **attrs):
+    """Measure a stage of a report for the duration of a ``with`` block.
+
+    The span is recorded as a dict with the ``stage``; its ``start``, in
+    seconds since the report began (``None`` outside of
+    ``report_timing``); its duration in ``seconds``; the resident memory
+    of the process at its start (``rss_start_bytes``) and end
+    (``rss_end_bytes``), and its peak within the span
+    (``peak_rss_bytes``), any of which may be ``None`` where the platform
+    does not provide it; the ``parent`` span's stage; the ``thread``; the
+    ``error`` that ended it, if any; and ``attrs``. The peak is exact if
+    ``report_timing`` resets the peak for each span; otherwise, it is the
+    peak of the process if that rose within the span, or else the most
+    memory sampled at the start and end of the span and its children.
+    Memory is only measured for spans in the main thread, because the
+    peak memory of the process cannot be attributed to one of several
+    concurrent spans.
+
+    Spans are only measured within ``report_timing``, or if there are
+    hooks, or if this module's logger is enabled for debug messages.
+
+    Args:
+        stage (str): name of the stage, e.g. 'raster read'.
+        attrs: JSON-serializable details of the span, e.g. the path of the
+            file being read.
+    """
+    recorder = _active_recorder
+    if (recorder is None and not _hooks
+            and not LOGGER.isEnabledFor(logging.DEBUG)):
+        yield
+        return
+
+    stack = _get_stack()
+    parent = stack[-1] if stack else None
+    frame = _Frame(stage)
+    measure_memory = threading.current_thread() is threading.main_thread()
+    if measure_memory:
+        frame.enter(parent)
+    stack.append(frame)
+    start_time = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as err:
+        error = type(err).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start_time
+        stack.pop()
+        # Also measures the memory at the end of the span.
+        peak_rss = frame.exit(parent) if measure_memory else None
+        span_record = {
+            'stage': stage,
+            'start': (start_time - recorder.start_time
+                      if recorder is not None else None),
+            'seconds': seconds,
+            'rss_start_bytes': frame.start_rss,
+            'rss_end_bytes': frame.end_rss,
+            'peak_rss_bytes': peak_rss,
+            'parent': parent.stage if parent is not None else None,
+            'thread': threading.current_thread().name,
+            'error': error,
+            'attrs': attrs,
+        }
+        LOGGER.debug(f'{stage} took {seconds:.3f}s {attrs}')
+        if recorder is not None:
+            recorder.spans.append(span_record)
+        _call_each(_hooks, span_record)
+
+
+def traced(stage, **attrs):
+    """Decorate a function to measure each call to it as a ``span``."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage, **attrs):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def report_timing(target_html_filepath, profile=False,
+                  reset_peak_memory=False):
+    """Record the spans of a report for the duration of a ``with`` block.
+
+    The whole block is measured as a 'report' span. When the block exits,
+    a summary of the spans is logged and the ``Recorder`` is passed to
+    each sink.
+
+    Args:
+        target_html_filepath (str): path to the report.
+        profile (bool): if True, also profile the block with ``cProfile``
+            and write the stats next to the report, with the extension
+            ``.prof``, for ``pstats`` or a viewer such as snakeviz.
+        reset_peak_memory (bool): if True, reset the peak memory of the
+            process (Linux only) at the start and end of each span, so
+            that the exact peak within each span is measured. This also
+            resets the peak that other tools report for the process, e.g.
+            ``/usr/bin/time`` and ``resource.getrusage``; use
+            ``max_rss_bytes`` for the peak over the life of the process.
+
+    Yields:
+        The ``Recorder`` of the report's spans.
+    """
+    global _active_recorder, _reset_peaks
+    previous_recorder = _active_recorder
+    previous_reset_peaks = _reset_peaks
+    recorder = Recorder(target_html_filepath)
+    _active_recorder = recorder
+    _reset_peaks = reset_peak_memory
+    profiler = cProfile.Profile() if profile else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        with span('report', path=target_html_filepath):
+            yield recorder
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profile_path = (
+                f'{os.path.splitext(target_html_filepath)[0]}.prof')
+            profiler.dump_stats(profile_path)
+            LOGGER.info(f'Wrote profile of the report to {profile_path}')
+        _active_recorder = previous_recorder
+        _reset_peaks = previous_reset_peaks
+        recorder.max_rss_bytes = max_rss_bytes()
+        LOGGER.info(f'Stages of {target_html_filepath}: ' + ', '.join(
+            f'{stage["stage"]} {stage["seconds"]:.1f}s '
+            f'({stage["calls"]} calls)' for stage in recorder.summary()))
+        _call_each(_sinks, recorder)
+
+
+def write_json(recorder):
+    """Write the spans of a report to a JSON file next to it.
+
+    The file has the report's name with the extension ``.timings.json``.
+    It contains the ``report`` path, the ``max_rss_bytes`` of the process
+    (see ``max_rss_bytes``), the ``summary`` of each stage, and the list
+    of ``spans``. See ``Recorder.summary`` and ``span``.
+
+    Args:
+        recorder (Recorder): the report's spans.
+
+    Returns:
+        ``None``
+    """
+    timings_path = (
+        f'{os.path.splitext(recorder.target_html_filepath)[0]}.timings.json')
+    with open(timings_path, 'w', encoding='utf-8') as timings_file:
+        json.dump({
+            'report': recorder.target_html_filepath,
+            'max_rss_bytes': recorder.max_rss_bytes,
+            'summary': recorder.summary(),
+            'spans': recorder.spans,
+        }, timings_file, indent=1, default=str)
+
+
+add_sink(write_json)
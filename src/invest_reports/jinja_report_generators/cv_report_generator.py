@@ -1,29 +1,26 @@
+import functools
 import logging
 import os
 import time
 
-import altair
-import geopandas
-import pandas
-
-import natcap.invest.spec
+from invest_reports import fragments
+from invest_reports import instrumentation
 from invest_reports import jinja_env
+from invest_reports import report_writer
+from invest_reports import sections
+from invest_reports import tables
+from invest_reports.lazy_import import lazy_import
+
+altair = lazy_import('altair')
+geopandas = lazy_import('geopandas')
+pandas = lazy_import('pandas')
+invest_spec = lazy_import('natcap.invest.spec')
 
 
 LOGGER = logging.getLogger(__name__)
 
 TEMPLATE = jinja_env.get_template('coastal_vulnerability.html')
 
-# vegafusion (`altair.data_transformers.enable("vegafusion")`)
-# can perform transformations before embedding
-# data in the chart's spec in order to conserve space.
-# But vegafusion does not support geodataframe data - and geometries are
-# not something we transform anyway. Plus, vegafusion seems incompatible
-# with `disable_max_rows()` and there is no guarantee that the vegafusion
-# transforms will get under the 5000 row default limit. So disabling
-# the row limit is the only option.
-altair.data_transformers.disable_max_rows()
-
 stroke_width = 0.75
 # When points are low-density, fill is nicer, or a thicker stroke.
 # But when high-density, there's too much overplotting
@@ -137,54 +134,53 @@ def chart_habitat_map(habitat_protection_csv, exposure_geodf, landmass_chart):
     return habitat_map
 
 
-def report(file_registry, args_dict, model_spec, target_html_filepath):
-    """Generate an html summary of Coastal Vulnerability results.
+@instrumentation.traced('vector read')
+def load_exposure(exposure_path):
+    exposure_geo = geopandas.read_file(exposure_path)
+    if 'population' in exposure_geo:
+        # Population is used to scale point size in exposure maps,
+        # but it is an optional input to the model.
+        # If population is missing we still want to plot the point.
+        exposure_geo.population = exposure_geo.population.fillna(-1)
+    return exposure_geo
 
-    Args:
-        file_registry (dict): The ``natcap.invest.FileRegistry.registry``
-            that was returned by ``natcap.invest.coastal_vulnerability.execute``.
-        args_dict (dict): The arguments that were passed to
-            ``natcap.invest.coastal_vulnerability.execute``.
-        model_spec (natcap.invest.spec.ModelSpec):
-            ``natcap.invest.coastal_vulnerability.MODEL_SPEC``
-        target_html_filepath (str): path to an html file generated by this
-            function.
-
-    Returns:
-        None
-    """
-    images_dir = os.path.join(args_dict['workspace_dir'], '_images')
-    if not os.path.exists(images_dir):
-        os.mkdir(images_dir)
 
+def get_rank_vars(exposure_geo):
     rank_vars = ['R_hab', 'R_wind', 'R_wave', 'R_surge', 'R_relief']
-    exposure_geo = geopandas.read_file(file_registry['coastal_exposure'])
     if 'R_geomorph' in exposure_geo:
         rank_vars.append('R_geomorph')
-    tooltip_vars = ['exposure'] + rank_vars
+    return rank_vars
+
+
+@instrumentation.traced('table read')
+def load_intermediate_exposure(intermediate_csv_path, model_spec):
+    csv_spec = model_spec.get_output('intermediate_exposure_csv')
+    intermediate_vars = ['relief', 'wind', 'wave', 'surge']
+    units = [invest_spec.format_unit(csv_spec.get_column(var).units)
+             for var in intermediate_vars]
+    renamed_vars = [f'{var} {u}'
+                    for var, u in zip(intermediate_vars, units)]
+    intermediate_df = pandas.read_csv(intermediate_csv_path)
+    variable_label_lookup = {var: new_var for var, new_var 
+                             in zip(intermediate_vars, renamed_vars)}
+    intermediate_df.rename(
+        columns=variable_label_lookup, inplace=True)
+    return intermediate_df, variable_label_lookup
+
 
-    landmass_geo = geopandas.read_file(
-        file_registry['clipped_projected_landmass'])
-    extent_feature, xy_ratio = get_geojson_bbox(exposure_geo)
-    landmass_chart = chart_landmass(
-        landmass_geo, clip=True, extent_feature=extent_feature)
+def chart_exposure_map(exposure_geo, landmass_chart, model_spec):
+    tooltip_vars = ['exposure'] + get_rank_vars(exposure_geo)
+    _, xy_ratio = get_geojson_bbox(exposure_geo)
     base_points = chart_base_points(exposure_geo)
 
     scale_population = altair.param(value=False)
     if 'population' in exposure_geo:
-        # Population is used to scale point size in exposure maps,
-        # but it is an optional input to the model.
-        # If population is missing we still want to plot the point.
-        exposure_geo.population = exposure_geo.population.fillna(-1)
         tooltip_vars.append('population')
         population_spec = model_spec.get_output(
             'coastal_exposure').get_field('population')
         population_checkbox = altair.binding_checkbox(
-            name=f'scale by population ({natcap.invest.spec.format_unit(population_spec.units)})')
+            name=f'scale by population ({invest_spec.format_unit(population_spec.units)})')
         scale_population = altair.param(value=False, bind=population_checkbox)
-        population_caption = population_spec.about + """
-             '-1' represents no valid population data within the search radius
-            around a point."""
 
     tooltip = altair.Tooltip(tooltip_vars, format='.2f')
 
@@ -238,32 +234,10 @@ def report(file_registry, args_dict, model_spec, target_html_filepath):
         height=map_width / xy_ratio,
         title='coastal exposure'
     ).configure_legend(**legend_config)
-    exposure_map_json = exposure_map.to_json()
-    exposure_map_caption = [model_spec.get_output(
-        'coastal_exposure').get_field('exposure').about]
-    if population_caption:
-        exposure_map_caption.append(population_caption)
-    exposure_map_source_list = [
-        model_spec.get_output('coastal_exposure').path,
-        model_spec.get_output('clipped_projected_landmass').path]
+    return exposure_map
 
-    habitat_map = chart_habitat_map(
-        file_registry['habitat_protection'],
-        exposure_geo,
-        landmass_chart)
-    habitat_map_json = habitat_map.to_json()
-    habitat_map_caption = model_spec.get_output(
-        'coastal_exposure').get_field('habitat_role').about
-    habitat_map_source_list = [
-        model_spec.get_output('coastal_exposure').path,
-        model_spec.get_output('habitat_protection').path]
-
-    habitat_params_df = pandas.read_csv(args_dict['habitat_table_path'])
-    about_habitat_rank = model_spec.get_input(
-        'habitat_table_path').get_column('rank').about
-    habitat_table_caption = f'Rank = {about_habitat_rank}'
-    habitat_table_source_list = [args_dict['habitat_table_path']]
 
+def chart_exposure_histogram(exposure_geo):
     exposure_histogram = altair.Chart(exposure_geo).mark_bar().encode(
         x=altair.X('exposure', title='coastal exposure').bin(step=0.2),
         y='count()',
@@ -275,9 +249,12 @@ def report(file_registry, args_dict, model_spec, target_html_filepath):
         width=map_width,
         height=200
     ).configure_axis(**axis_config)
-    exposure_histogram_json = exposure_histogram.to_json()
+    return exposure_histogram
+
 
-    base_rank_vars_chart = base_points.mark_circle(
+def chart_rank_vars(exposure_geo, landmass_chart):
+    rank_vars = get_rank_vars(exposure_geo)
+    base_rank_vars_chart = chart_base_points(exposure_geo).mark_circle(
         filled=point_fill,
         strokeWidth=stroke_width,
         size=point_size
@@ -299,29 +276,12 @@ def report(file_registry, args_dict, model_spec, target_html_filepath):
         altair.hconcat(*rank_vars_chart_list[:n_cols]),
         altair.hconcat(*rank_vars_chart_list[n_cols:])
     ).configure_axis(**axis_config)
-    rank_vars_figure_json = rank_vars_figure.to_json()
-    rank_vars_figure_caption = \
-        """
-        These variables are the individual components of the coastal exposure index.
-        The exposure index is calculated as the geometric mean of these variables.
-        If a shore point is missing data about one of these variables, then the
-        exposure index will also be missing at that point.
-        """
-    rank_vars_figure_source_list = [model_spec.get_output('coastal_exposure').path]
+    return rank_vars_figure
 
-    csv_spec = model_spec.get_output('intermediate_exposure_csv')
-    intermediate_vars = ['relief', 'wind', 'wave', 'surge']
-    units = [natcap.invest.spec.format_unit(csv_spec.get_column(var).units)
-             for var in intermediate_vars]
-    renamed_vars = [f'{var} {u}'
-                    for var, u in zip(intermediate_vars, units)]
-    intermediate_df = pandas.read_csv(file_registry['intermediate_exposure_csv'])
-    variable_label_lookup = {var: new_var for var, new_var 
-                             in zip(intermediate_vars, renamed_vars)}
-    intermediate_df.rename(
-        columns=variable_label_lookup, inplace=True)
+
+def chart_facetted_histograms(intermediate_df, variable_label_lookup):
     histograms = []
-    for i, var in enumerate(renamed_vars):
+    for i, var in enumerate(variable_label_lookup.values()):
         # remove redundant axis titles
         title = 'Count of Records' if i == 0 else None
         hist = altair.Chart(intermediate_df).mark_bar().encode(
@@ -336,13 +296,12 @@ def report(file_registry, args_dict, model_spec, target_html_filepath):
         histograms.append(hist)
     facetted_histograms = altair.hconcat(
         *histograms).configure_axis(**axis_config)
-    facetted_histograms_json = facetted_histograms.to_json()
-    facetted_histograms_caption = model_spec.get_output(
-        'intermediate_exposure').about
-    facetted_histograms_source_list = [model_spec.get_output(
-        'intermediate_exposure').path]
+    return facetted_histograms
+
 
-    wave_energy_geo = geopandas.read_file(file_registry['wave_energies'])
+def chart_wave_energy_map(wave_energies_path, intermediate_df,
+                          variable_label_lookup, landmass_chart, xy_ratio):
+    wave_energy_geo = geopandas.read_file(wave_energies_path)
     wave_var = variable_label_lookup['wave']
     wave_energy_geo = wave_energy_geo.join(
         intermediate_df[['shore_id', wave_var]].set_index(
@@ -371,7 +330,162 @@ def report(file_registry, args_dict, model_spec, target_html_filepath):
         height=map_width / xy_ratio,
         title='local wind-driven waves vs. open ocean waves'
     ).configure_legend(**legend_config)
-    wave_energy_map_json = wave_energy_map.to_json()
+    return wave_energy_map
+
+
+def report(file_registry, args_dict, model_spec, target_html_filepath,
+           timing_summary=False, profile=False):
+    """Generate an html summary of Coastal Vulnerability results.
+
+    Args:
+        file_registry (dict): The ``natcap.invest.FileRegistry.registry``
+            that was returned by ``natcap.invest.coastal_vulnerability.execute``.
+        args_dict (dict): The arguments that were passed to
+            ``natcap.invest.coastal_vulnerability.execute``.
+        model_spec (natcap.invest.spec.ModelSpec):
+            ``natcap.invest.coastal_vulnerability.MODEL_SPEC``
+        target_html_filepath (str): path to an html file generated by this
+            function.
+        timing_summary (bool): if True, add a summary of the time and
+            memory taken by each stage of the report to its footer. The
+            stages are always written to a ``.timings.json`` file next to
+            the report; see ``instrumentation.write_json``.
+        profile (bool): if True, also profile the report with ``cProfile``,
+            writing the stats to a ``.prof`` file next to the report.
+
+    Returns:
+        None
+    """
+    with instrumentation.report_timing(
+            target_html_filepath, profile) as recorder:
+        _report(file_registry, args_dict, model_spec, target_html_filepath,
+                recorder if timing_summary else None)
+    LOGGER.info(f'Created {target_html_filepath}')
+
+
+def _report(file_registry, args_dict, model_spec, target_html_filepath,
+            timing_summary):
+    """Generate the report; see ``report``.
+
+    ``timing_summary`` is the report's ``instrumentation.Recorder``, if its
+    stages are to be summarized in the footer, or ``None``.
+    """
+    # vegafusion (`altair.data_transformers.enable("vegafusion")`)
+    # can perform transformations before embedding
+    # data in the chart's spec in order to conserve space.
+    # But vegafusion does not support geodataframe data - and geometries are
+    # not something we transform anyway. Plus, vegafusion seems incompatible
+    # with `disable_max_rows()` and there is no guarantee that the vegafusion
+    # transforms will get under the 5000 row default limit. So disabling
+    # the row limit is the only option.
+    altair.data_transformers.disable_max_rows()
+
+    images_dir = os.path.join(args_dict['workspace_dir'], '_images')
+    if not os.path.exists(images_dir):
+        os.mkdir(images_dir)
+
+    exposure_path = file_registry['coastal_exposure']
+    landmass_path = file_registry['clipped_projected_landmass']
+    habitat_protection_path = file_registry['habitat_protection']
+    intermediate_csv_path = file_registry['intermediate_exposure_csv']
+    wave_energies_path = file_registry['wave_energies']
+
+    # Each chart's spec is reused from the section cache if the files it
+    # is made from are unchanged. Data are loaded only for the charts
+    # that are not cached.
+    @functools.cache
+    def exposure_geo():
+        return load_exposure(exposure_path)
+
+    @functools.cache
+    def landmass_chart():
+        extent_feature, _ = get_geojson_bbox(exposure_geo())
+        landmass_geo = geopandas.read_file(landmass_path)
+        return chart_landmass(
+            landmass_geo, clip=True, extent_feature=extent_feature)
+
+    @functools.cache
+    def intermediate_exposure():
+        return load_intermediate_exposure(intermediate_csv_path, model_spec)
+
+    def chart_dict(section, chart_func):
+        with instrumentation.span('chart build', chart=section):
+            chart = chart_func()
+        with instrumentation.span('vega serialization', chart=section):
+            return chart.to_dict()
+
+    def chart_json(section, filepaths, chart_func):
+        return report_writer.Payload.json(sections.cached_json(
+            section, filepaths, None,
+            lambda: chart_dict(section, chart_func)))
+
+    exposure_map_json = chart_json(
+        'cv_exposure_map', [exposure_path, landmass_path],
+        lambda: chart_exposure_map(
+            exposure_geo(), landmass_chart(), model_spec))
+    exposure_map_caption = [model_spec.get_output(
+        'coastal_exposure').get_field('exposure').about]
+    has_population = sections.cached_json(
+        'cv_has_population', [exposure_path], None,
+        lambda: 'population' in exposure_geo())
+    if has_population:
+        population_spec = model_spec.get_output(
+            'coastal_exposure').get_field('population')
+        exposure_map_caption.append(population_spec.about + """
+             '-1' represents no valid population data within the search radius
+            around a point.""")
+    exposure_map_source_list = [
+        model_spec.get_output('coastal_exposure').path,
+        model_spec.get_output('clipped_projected_landmass').path]
+
+    habitat_map_json = chart_json(
+        'cv_habitat_map',
+        [exposure_path, landmass_path, habitat_protection_path],
+        lambda: chart_habitat_map(
+            habitat_protection_path, exposure_geo(), landmass_chart()))
+    habitat_map_caption = model_spec.get_output(
+        'coastal_exposure').get_field('habitat_role').about
+    habitat_map_source_list = [
+        model_spec.get_output('coastal_exposure').path,
+        model_spec.get_output('habitat_protection').path]
+
+    habitat_params_df = pandas.read_csv(args_dict['habitat_table_path'])
+    about_habitat_rank = model_spec.get_input(
+        'habitat_table_path').get_column('rank').about
+    habitat_table_caption = f'Rank = {about_habitat_rank}'
+    habitat_table_source_list = [args_dict['habitat_table_path']]
+
+    exposure_histogram_json = chart_json(
+        'cv_exposure_histogram', [exposure_path],
+        lambda: chart_exposure_histogram(exposure_geo()))
+
+    rank_vars_figure_json = chart_json(
+        'cv_rank_vars_figure', [exposure_path, landmass_path],
+        lambda: chart_rank_vars(exposure_geo(), landmass_chart()))
+    rank_vars_figure_caption = \
+        """
+        These variables are the individual components of the coastal exposure index.
+        The exposure index is calculated as the geometric mean of these variables.
+        If a shore point is missing data about one of these variables, then the
+        exposure index will also be missing at that point.
+        """
+    rank_vars_figure_source_list = [model_spec.get_output('coastal_exposure').path]
+
+    facetted_histograms_json = chart_json(
+        'cv_facetted_histograms', [intermediate_csv_path],
+        lambda: chart_facetted_histograms(*intermediate_exposure()))
+    facetted_histograms_caption = model_spec.get_output(
+        'intermediate_exposure').about
+    facetted_histograms_source_list = [model_spec.get_output(
+        'intermediate_exposure').path]
+
+    wave_energy_map_json = chart_json(
+        'cv_wave_energy_map',
+        [wave_energies_path, intermediate_csv_path, exposure_path,
+         landmass_path],
+        lambda: chart_wave_energy_map(
+            wave_energies_path, *intermediate_exposure(), landmass_chart(),
+            get_geojson_bbox(exposure_geo())[1]))
 
     wave_energy_map_caption = [model_spec.get_output(
         'wave_energies').about]
@@ -394,35 +508,37 @@ def report(file_registry, args_dict, model_spec, target_html_filepath):
     # Generate HTML document.
     model_name = model_spec.model_title
     
-    with open(target_html_filepath, 'w', encoding='utf-8') as target_file:
-        target_file.write(TEMPLATE.render(
-            report_script=__file__,
-            timestamp=time.strftime('%Y-%m-%d %H:%M'),
-            page_title=f'InVEST Results: {model_name}',
-            model_id=model_spec.model_id,
-            model_name=model_name,
-            model_description=model_description,
-            userguide_page=model_spec.userguide,
-            args_dict=args_dict,
-            exposure_map_json=exposure_map_json,
-            exposure_map_caption=exposure_map_caption,
-            exposure_map_source_list=exposure_map_source_list,
-            habitat_map_json=habitat_map_json,
-            habitat_map_caption=habitat_map_caption,
-            habitat_map_source_list=habitat_map_source_list,
-            habitat_params_table=habitat_params_df.to_html(),
-            habitat_table_caption=habitat_table_caption,
-            habitat_table_source_list=habitat_table_source_list,
-            exposure_histogram_json=exposure_histogram_json,
-            facetted_histograms_json=facetted_histograms_json,
-            facetted_histograms_caption=facetted_histograms_caption,
-            facetted_histograms_source_list=facetted_histograms_source_list,
-            rank_vars_figure_json=rank_vars_figure_json,
-            rank_vars_figure_caption=rank_vars_figure_caption,
-            rank_vars_figure_source_list=rank_vars_figure_source_list,
-            wave_energy_map_json=wave_energy_map_json,
-            wave_energy_map_caption=wave_energy_map_caption,
-            wave_energy_map_source_list=wave_energy_map_source_list,
-            model_spec_outputs=model_spec.outputs,
-        ))
-    LOGGER.info(f'Created {target_html_filepath}')
+    report_writer.write_report(
+        TEMPLATE, target_html_filepath,
+        report_script=__file__,
+        timestamp=time.strftime('%Y-%m-%d %H:%M'),
+        page_title=f'InVEST Results: {model_name}',
+        model_id=model_spec.model_id,
+        model_name=model_name,
+        model_description=model_description,
+        userguide_page=model_spec.userguide,
+        args_dict=args_dict,
+        exposure_map_json=exposure_map_json,
+        exposure_map_caption=exposure_map_caption,
+        exposure_map_source_list=exposure_map_source_list,
+        habitat_map_json=habitat_map_json,
+        habitat_map_caption=habitat_map_caption,
+        habitat_map_source_list=habitat_map_source_list,
+        habitat_params_table=report_writer.Payload(
+            lambda: tables.iter_html(habitat_params_df)),
+        habitat_table_caption=habitat_table_caption,
+        habitat_table_source_list=habitat_table_source_list,
+        exposure_histogram_json=exposure_histogram_json,
+        facetted_histograms_json=facetted_histograms_json,
+        facetted_histograms_caption=facetted_histograms_caption,
+        facetted_histograms_source_list=facetted_histograms_source_list,
+        rank_vars_figure_json=rank_vars_figure_json,
+        rank_vars_figure_caption=rank_vars_figure_caption,
+        rank_vars_figure_source_list=rank_vars_figure_source_list,
+        wave_energy_map_json=wave_energy_map_json,
+        wave_energy_map_caption=wave_energy_map_caption,
+        wave_energy_map_source_list=wave_energy_map_source_list,
+        model_spec_outputs=model_spec.outputs,
+        model_spec_outputs_html=fragments.list_metadata(model_spec),
+        timing_summary=timing_summary,
+    )
@@ -65,7 +65,11 @@ def _get_nutrient_dependent_list(args_dict, reference_dict):
     return item_list
 
 
-def report(file_registry, args_dict, model_spec, target_html_filepath):
+def report(file_registry, args_dict, model_spec, target_html_filepath,
+           max_memory=None, max_read_workers=None,
+           max_render_workers=None, image_encoding=None,
+           external_images=False, tile_viewers=False, timing_summary=False,
+           profile=False):
     """Generate an HTML summary of model results.
 
     Args:
@@ -76,6 +80,23 @@ def report(file_registry, args_dict, model_spec, target_html_filepath):
         model_spec (natcap.invest.spec.ModelSpec): the model's ``MODEL_SPEC``.
         target_html_filepath (str): path to an HTML file to be generated by
             this function.
+        max_memory (int): optional cap, in bytes, on the memory used to
+            read and plot rasters, including GDAL's block cache.
+        max_read_workers (int): optional number of threads with which to
+            read each figure's rasters concurrently.
+        max_render_workers (int): optional number of processes with which
+            to draw the subplots of each figure in parallel.
+        image_encoding (``utils.ImageEncoding``): optional encoding of the
+            figures. Defaults to an RGBA PNG.
+        external_images (bool): if True, write figures to image files in
+            the workspace's ``_images`` directory, rather than embedding
+            them in the report.
+        tile_viewers (bool): if True, also add zoomable, full-resolution
+            maps of the output rasters, loaded tile by tile.
+        timing_summary (bool): if True, add a summary of the time and
+            memory taken by each stage of the report to its footer.
+        profile (bool): if True, also profile the report with ``cProfile``,
+            writing the stats to a ``.prof`` file next to the report.
 
     Returns:
         ``None``
@@ -123,4 +144,6 @@ def report(file_registry, args_dict, model_spec, target_html_filepath):
     sdr_ndr_report_generator.report(
         file_registry, args_dict, model_spec, target_html_filepath,
         raster_plot_configs, captions,
-        results_vector_id, results_vector_cols_to_sum)
+        results_vector_id, results_vector_cols_to_sum, max_memory,
+        max_read_workers, max_render_workers, image_encoding,
+        external_images, tile_viewers, timing_summary, profile)
@@ -2,9 +2,15 @@
 # (to be extended to support other similar models, and renamed as appropriate)
 
 import logging
+import os
+import pathlib
+import tempfile
 import time
+import urllib.parse
 
-from invest_reports import jinja_env, sdr_ndr_utils, utils
+from invest_reports import (
+    artifacts, fragments, instrumentation, jinja_env, report_writer,
+    sdr_ndr_utils, sections, tables, tile_pyramid, utils)
 from invest_reports.sdr_ndr_utils import RasterPlotCaptionGroup
 from invest_reports.utils import RasterPlotConfigGroup
 
@@ -13,10 +19,63 @@ LOGGER = logging.getLogger(__name__)
 TEMPLATE = jinja_env.get_template('sdr-ndr-report.html')
 
 
+def _plot_img_src(raster_plot_configs, image_name, images_dir,
+                  target_html_filepath, image_encoding, embed=False,
+                  **plot_kwargs):
+    """Plot rasters for a report, returning the ``src`` of their image.
+
+    The image is reused from ``sections.SECTION_CACHE`` if the rasters and
+    the options they are plotted with are unchanged.
+
+    Args:
+        raster_plot_configs (list[RasterPlotConfig]): the rasters to plot.
+        image_name (str): name of the image file, without an extension.
+        images_dir (str): directory in which to write the image file.
+        target_html_filepath (str): path to the report.
+        image_encoding (``utils.ImageEncoding``): encoding of the image.
+        embed (bool): if True, the image is to be embedded in the report,
+            and ``images_dir`` need only last until the report is written.
+        plot_kwargs: other keyword arguments to
+            ``utils.plot_and_encode_rasters``.
+
+    Returns:
+        The image's URL relative to the report, or, if ``embed`` is True,
+            a ``report_writer.Payload`` of its base64-encoded data.
+    """
+    image_path = os.path.join(
+        images_dir, f'{image_name}.{image_encoding.format}')
+    raster_paths = [config.raster_path for config in raster_plot_configs]
+    # Units and value ranges may be read from the metadata sidecars.
+    sections.cached_file(
+        'raster_figure',
+        raster_paths + [f'{path}.yml' for path in raster_paths],
+        ([(config.datatype, config.transform)
+          for config in raster_plot_configs],
+         sorted(vars(image_encoding).items()),
+         plot_kwargs.get('max_memory'),
+         plot_kwargs.get('max_render_workers')),
+        image_path,
+        lambda path: utils.plot_and_save_rasters(
+            raster_plot_configs, path, image_encoding=image_encoding,
+            **plot_kwargs))
+    if embed:
+        return report_writer.Payload.base64_file(image_path)
+    return _relative_url(image_path, target_html_filepath)
+
+
+def _relative_url(path, target_html_filepath):
+    relative_path = os.path.relpath(
+        path, os.path.dirname(os.path.abspath(target_html_filepath)))
+    return urllib.parse.quote(pathlib.PurePath(relative_path).as_posix())
+
+
 def report(file_registry, args_dict, model_spec, target_html_filepath,
            raster_plot_configs: RasterPlotConfigGroup,
            raster_plot_captions: RasterPlotCaptionGroup,
-           results_vector_id, results_vector_cols_to_sum):
+           results_vector_id, results_vector_cols_to_sum, max_memory=None,
+           max_read_workers=None, max_render_workers=None,
+           image_encoding=None, external_images=False, tile_viewers=False,
+           timing_summary=False, profile=False):
     """Generate an HTML summary of model results.
 
     Args:
@@ -35,29 +94,145 @@ def report(file_registry, args_dict, model_spec, target_html_filepath,
             model (e.g., for NDR, ``watershed_results_ndr``),
         results_vector_cols_to_sum (list[str]): list of column names in the
             results vector to include when calculating totals.
+        max_memory (int): optional cap, in bytes, on the memory used to
+            read and plot rasters, including GDAL's block cache, which is
+            limited to ``utils.GDAL_CACHE_FRACTION`` of it for the
+            duration of the report. Rasters are plotted at a reduced
+            resolution where needed to stay within it.
+        max_read_workers (int): optional number of threads with which to
+            read each figure's rasters concurrently. If ``None``, rasters
+            are read one at a time.
+        max_render_workers (int): optional number of processes with which
+            to draw the subplots of each figure in parallel. If ``None``,
+            each figure is drawn in this process.
+        image_encoding (``utils.ImageEncoding``): optional encoding of the
+            figures, e.g. a palette PNG or WebP, which may be much smaller
+            than the default RGBA PNG.
+        external_images (bool): if True, write figures as image files in
+            an ``_images`` directory in the workspace, and link to them from
+            the report, rather than embedding them in it. The report is
+            then much smaller, but must be kept alongside the images.
+        tile_viewers (bool): if True, also add zoomable maps of the output
+            and intermediate output rasters, at up to full resolution (see
+            ``tile_pyramid.MAX_TILES``). Each is written as a pyramid of
+            image tiles in the workspace's ``_images/tiles`` directory,
+            which the report loads as needed.
+        timing_summary (bool): if True, add a summary of the time and
+            memory taken by each stage of the report to its footer. The
+            stages are always written to a ``.timings.json`` file next to
+            the report; see ``instrumentation.write_json``.
+        profile (bool): if True, also profile the report with ``cProfile``,
+            writing the stats to a ``.prof`` file next to the report.
 
     Returns:
         ``None``
     """
+    with instrumentation.report_timing(
+            target_html_filepath, profile) as recorder, \
+            utils.gdal_cache_budget(max_memory) as plot_memory:
+        _report(file_registry, args_dict, model_spec, target_html_filepath,
+                raster_plot_configs, raster_plot_captions, results_vector_id,
+                results_vector_cols_to_sum, plot_memory, max_read_workers,
+                max_render_workers, image_encoding, external_images,
+                tile_viewers, recorder if timing_summary else None)
+    LOGGER.info(f'Created {target_html_filepath}')
+
 
-    inputs_img_src = utils.plot_and_base64_encode_rasters(
-        raster_plot_configs.inputs)
+def _report(file_registry, args_dict, model_spec, target_html_filepath,
+            raster_plot_configs, raster_plot_captions, results_vector_id,
+            results_vector_cols_to_sum, max_memory, max_read_workers,
+            max_render_workers, image_encoding, external_images,
+            tile_viewers, timing_summary):
+    """Generate the report; see ``report``.
+
+    ``timing_summary`` is the report's ``instrumentation.Recorder``, if its
+    stages are to be summarized in the footer, or ``None``.
+    """
+    if image_encoding is None:
+        image_encoding = utils.ImageEncoding()
+    embedded_images_dir = None
+    if external_images:
+        images_dir = os.path.join(args_dict['workspace_dir'], '_images')
+        os.makedirs(images_dir, exist_ok=True)
+    else:
+        # Figures to embed are plotted to temporary files, which are
+        # encoded straight into the report as it is written.
+        embedded_images_dir = tempfile.TemporaryDirectory()
+        images_dir = embedded_images_dir.name
+    report_name = os.path.splitext(os.path.basename(target_html_filepath))[0]
+    plot_kwargs = {
+        'images_dir': images_dir,
+        'target_html_filepath': target_html_filepath,
+        'image_encoding': image_encoding,
+        'embed': not external_images,
+        'max_memory': max_memory,
+        'max_read_workers': max_read_workers,
+        'max_render_workers': max_render_workers,
+    }
 
-    outputs_img_src = utils.plot_and_base64_encode_rasters(
-        raster_plot_configs.outputs)
+    # Rasters appear in several plots and tables; load what is known
+    # about each of them only once.
+    with artifacts.report_scope():
+        inputs_img_src = _plot_img_src(
+            raster_plot_configs.inputs, f'{report_name}_inputs',
+            **plot_kwargs)
 
-    intermediate_img_src = utils.plot_and_base64_encode_rasters(
-        raster_plot_configs.intermediates)
+        outputs_img_src = _plot_img_src(
+            raster_plot_configs.outputs, f'{report_name}_outputs',
+            **plot_kwargs)
 
-    (ws_vector_table, ws_vector_totals_table) = (
-        sdr_ndr_utils.generate_results_table_from_vector(
-            file_registry[results_vector_id], results_vector_cols_to_sum))
+        intermediate_img_src = _plot_img_src(
+            raster_plot_configs.intermediates,
+            f'{report_name}_intermediates', **plot_kwargs)
 
-    output_raster_stats_table = utils.raster_workspace_summary(
-        file_registry).to_html(na_rep='')
+        tile_viewer_list = []
+        if tile_viewers:
+            for config in (raster_plot_configs.outputs
+                           + raster_plot_configs.intermediates):
+                raster_name = os.path.splitext(
+                    os.path.basename(config.raster_path))[0]
+                tiles_dir = os.path.join(
+                    args_dict['workspace_dir'], '_images', 'tiles',
+                    f'{report_name}_{raster_name}')
+                manifest = tile_pyramid.build_tile_pyramid(
+                    config.raster_path, config.datatype, tiles_dir,
+                    config.transform, image_encoding=image_encoding)
+                tile_viewer_list.append({
+                    'name': os.path.basename(config.raster_path),
+                    'manifest': manifest,
+                    'url': _relative_url(tiles_dir, target_html_filepath),
+                })
 
-    input_raster_stats_table = utils.raster_inputs_summary(
-        args_dict).to_html(na_rep='')
+        # Tables are reused from the section cache when the files they
+        # are made from are unchanged. They are held as strings, rather
+        # than streamed into the report with ``tables.iter_html``: a cached
+        # section is loaded whole, and these tables are small (a row per
+        # raster, or at most ``TABLE_VIRTUALIZATION_THRESHOLD`` rows).
+        results_vector_path = file_registry[results_vector_id]
+        # If the vector is a shapefile, its attributes are in a .dbf file.
+        results_vector_files = [
+            results_vector_path,
+            f'{os.path.splitext(results_vector_path)[0]}.dbf']
+        (ws_vector_table, ws_vector_totals_table) = sections.cached_json(
+            'watershed_results_tables', results_vector_files,
+            results_vector_cols_to_sum,
+            lambda: sdr_ndr_utils.generate_results_table_from_vector(
+                results_vector_path, results_vector_cols_to_sum))
+
+        # Stats of output rasters are read from their metadata sidecars.
+        output_paths = list(utils._walk_file_registry(file_registry))
+        output_raster_stats_table = sections.cached_json(
+            'output_raster_stats_table',
+            output_paths + [f'{path}.yml' for path in output_paths], None,
+            lambda: tables.to_html(utils.raster_workspace_summary(
+                file_registry), na_rep=''))
+
+        input_paths = [value for value in args_dict.values()
+                       if isinstance(value, str) and os.path.isfile(value)]
+        input_raster_stats_table = sections.cached_json(
+            'input_raster_stats_table', input_paths, None,
+            lambda: tables.to_html(utils.raster_inputs_summary(
+                args_dict), na_rep=''))
 
     stats_table_note = (
         '"Valid percent" indicates the percent of pixels that are not '
@@ -71,14 +246,18 @@ def report(file_registry, args_dict, model_spec, target_html_filepath,
         'rasters are available in the output workspace.'
     )
 
-    with open(target_html_filepath, 'w', encoding='utf-8') as target_file:
-        target_file.write(TEMPLATE.render(
+    try:
+        report_writer.write_report(
+            TEMPLATE, target_html_filepath,
             report_script=__file__,
             model_id=model_spec.model_id,
             model_name=model_spec.model_title,
             userguide_page=model_spec.userguide,
             timestamp=time.strftime('%Y-%m-%d %H:%M'),
             args_dict=args_dict,
+            img_mime_type=image_encoding.mime_type,
+            img_external=external_images,
+            tile_viewers=tile_viewer_list,
             inputs_img_src=inputs_img_src,
             inputs_caption=raster_plot_captions.inputs,
             outputs_img_src=outputs_img_src,
@@ -93,6 +272,9 @@ def report(file_registry, args_dict, model_spec, target_html_filepath,
             input_raster_stats_table=input_raster_stats_table,
             stats_table_note=stats_table_note,
             model_spec_outputs=model_spec.outputs,
-        ))
-
-    LOGGER.info(f'Created {target_html_filepath}')
+            model_spec_outputs_html=fragments.list_metadata(model_spec),
+            timing_summary=timing_summary,
+        )
+    finally:
+        if embedded_images_dir is not None:
+            embedded_images_dir.cleanup()
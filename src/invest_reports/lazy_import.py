@@ -0,0 +1,47 @@
+# Deferred imports of heavy dependencies. Between them, GDAL, matplotlib,
+# pandas, geopandas, altair and natcap.invest take seconds to import, which
+# every report process would otherwise pay up front, whether or not the
+# report it renders needs them.
+
+import importlib
+
+
+class LazyModule:
+    """A stand-in for a module that imports it on first attribute access.
+
+    Unlike ``importlib.util.LazyLoader``, this does not import a dotted
+    module's parent packages (e.g. ``osgeo`` for ``osgeo.gdal``) until the
+    module itself is needed. Attributes are looked up on the module every
+    time, so patching the module's attributes (e.g. with ``mock.patch``)
+    works as usual.
+    """
+
+    def __init__(self, name):
+        """Initialize a LazyModule.
+
+        Args:
+            name (str): the module's fully qualified name.
+        """
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return f'<lazily imported module {self._name!r}>'
+
+
+def lazy_import(name):
+    """Get a module that is imported the first time it is used.
+
+    Args:
+        name (str): the module's fully qualified name, e.g.
+            ``'matplotlib.pyplot'``.
+
+    Returns:
+        ``LazyModule``
+    """
+    return LazyModule(name)
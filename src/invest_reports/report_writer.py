@@ -0,0 +1,113 @@
+# Streaming output of rendered reports. ``Template.render`` joins the whole
+# report into one string before it can be written, and reports embed
+# multi-megabyte images and chart specs, so peak memory would be several
+# times the size of the report. Instead, reports are written chunk by
+# chunk as the template generates them, and the largest pieces of content
+# are spliced in from files or generators without passing through Jinja.
+
+import base64
+import itertools
+import json
+import re
+import secrets
+import weakref
+
+from invest_reports import instrumentation
+
+# Payloads render as markers of this form, which the writer replaces with
+# the payload's content. The nonce keeps report content from being
+# mistaken for a marker.
+_MARKER_NONCE = secrets.token_hex(8)
+_MARKER_PATTERN = re.compile(rf'\[\[payload-{_MARKER_NONCE}-(\d+)\]\]')
+
+_payload_ids = itertools.count()
+_payloads = weakref.WeakValueDictionary()
+
+_BASE64_CHUNK_SIZE = 3 * 2**16  # bytes; a multiple of 3 needs no padding
+
+
+class Payload:
+    """A large piece of report content, written directly to the report.
+
+    In a template, a payload renders as a short marker, which
+    ``write_report`` replaces with the payload's content. The content is
+    inserted verbatim, as if marked ``safe``. Payloads may be used any
+    number of times in a template, but only render correctly when written
+    with ``write_report``.
+    """
+
+    def __init__(self, chunks_func):
+        """Initialize a Payload.
+
+        Args:
+            chunks_func (callable): called with no arguments each time the
+                payload is written; returns an iterable of strings.
+        """
+        self.chunks_func = chunks_func
+        self.id = next(_payload_ids)
+        _payloads[self.id] = self
+
+    @classmethod
+    def base64_file(cls, filepath):
+        """Get a payload of the base64-encoded contents of a file.
+
+        Args:
+            filepath (str): path to a file, e.g. an image.
+
+        Returns:
+            ``Payload``
+        """
+        def chunks():
+            with open(filepath, 'rb') as file:
+                for data in iter(lambda: file.read(_BASE64_CHUNK_SIZE), b''):
+                    yield base64.b64encode(data).decode('ascii')
+        return cls(chunks)
+
+    @classmethod
+    def json(cls, obj):
+        """Get a payload of an object encoded as JSON.
+
+        Args:
+            obj: a JSON-serializable object, e.g. a Vega-Lite spec from
+                ``altair.Chart.to_dict``.
+
+        Returns:
+            ``Payload``
+        """
+        return cls(lambda: json.JSONEncoder(sort_keys=True).iterencode(obj))
+
+    def __html__(self):
+        return f'[[payload-{_MARKER_NONCE}-{self.id}]]'
+
+    def __str__(self):
+        return self.__html__()
+
+    def write(self, file):
+        """Write the payload's content to a text file object."""
+        for chunk in self.chunks_func():
+            file.write(chunk)
+
+
+@instrumentation.traced('template render')
+def write_report(template, target_filepath, **context):
+    """Render a template to a file, streaming its output.
+
+    Args:
+        template (``jinja2.Template``): the report template.
+        target_filepath (str): path to the HTML file to write.
+        context: variables to render the template with. Any may be (or
+            contain) a ``Payload``.
+
+    Returns:
+        ``None``
+    """
+    with open(target_filepath, 'w', encoding='utf-8') as target_file:
+        for chunk in template.generate(**context):
+            # Markers are never split across chunks: each comes from a
+            # single value rendered by the template.
+            position = 0
+            for match in _MARKER_PATTERN.finditer(chunk):
+                target_file.write(chunk[position:match.start()])
+                _payloads[int(match.group(1))].write(target_file)
+                position = match.end()
+            target_file.write(chunk[position:])
@@ -2,16 +2,29 @@
 # (to be extended to support other similar models, and renamed as appropriate)
 
 from collections import namedtuple
+import importlib.util
+import json
 import os
+from typing import TYPE_CHECKING
 
-import geopandas
-import pandas
+from invest_reports import instrumentation
+from invest_reports import tables
+from invest_reports import utils
+from invest_reports.lazy_import import lazy_import
+from invest_reports.utils import RasterPlotConfig
 
-from natcap.invest.spec import ModelSpec
+if TYPE_CHECKING:
+    from natcap.invest.spec import ModelSpec
 
-from invest_reports.utils import RasterPlotConfig
+pandas = lazy_import('pandas')
+pyogrio = lazy_import('pyogrio')
 
 TABLE_PAGINATION_THRESHOLD = 10
+# Tables with more rows than this (which are also paginated) are embedded
+# as JSON rather than as HTML rows, and only the rows of the page being
+# viewed are added to the page. Parsing tens of thousands of rows of HTML
+# freezes the browser.
+TABLE_VIRTUALIZATION_THRESHOLD = 1000
 
 RasterPlotCaptionGroup = namedtuple(
     'RasterPlotCaptionGroup', ['inputs', 'outputs', 'intermediates'])
@@ -45,9 +58,53 @@ def build_raster_plot_configs(id_lookup_table, raster_plot_tuples):
     return raster_plot_configs
 
 
-def generate_results_table_from_vector(filepath, cols_to_sum):
-    vector_df = geopandas.read_file(filepath)
-    vector_df = vector_df.drop(columns=['geometry'])
+def _read_attribute_table(filepath, columns=None):
+    """Read the attributes of a vector's features, skipping their geometry.
+
+    Geometries are never read or decoded, which for detailed polygons is
+    most of the work of reading a vector: a shapefile's ``.shp`` is not
+    read at all, and GeoPackage and FlatGeobuf geometry blobs are skipped.
+    Attributes are read in columnar batches through Arrow if ``pyarrow``
+    is installed.
+
+    Args:
+        filepath (str): path to a vector in any format GDAL can read.
+        columns (list[str]): optional names of the only fields to read.
+            If ``None``, all fields are read.
+
+    Returns:
+        ``pandas.DataFrame`` with a column for each field read, in the
+            order of the fields in the vector.
+    """
+    use_arrow = importlib.util.find_spec('pyarrow') is not None
+    return pyogrio.read_dataframe(
+        filepath, columns=columns, read_geometry=False, use_arrow=use_arrow)
+
+
+@instrumentation.traced('vector table')
+def generate_results_table_from_vector(filepath, cols_to_sum, columns=None):
+    """Build HTML tables of the attributes of a model's results vector.
+
+    Args:
+        filepath (str): path to the results vector, e.g. a shapefile,
+            GeoPackage or FlatGeobuf.
+        cols_to_sum (list[str]): names of the fields to total.
+        columns (list[str]): optional names of the fields to show, in
+            order. Defaults to all of them. Fields in ``cols_to_sum`` are
+            totaled whether or not they are shown.
+
+    Returns:
+        A 2-tuple of HTML strings: the table of features, and the table of
+            totals, which is ``None`` if there is only one feature.
+    """
+    utils.set_table_float_format()
+    read_columns = None
+    if columns is not None:
+        read_columns = list(dict.fromkeys([*columns, *cols_to_sum]))
+    vector_df = _read_attribute_table(filepath, read_columns)
+    summed_df = vector_df[cols_to_sum]
+    if columns is not None:
+        vector_df = vector_df[columns]
 
     css_classes = ['datatable']
     (num_rows, _) = vector_df.shape
@@ -57,19 +114,50 @@ def generate_results_table_from_vector(filepath, cols_to_sum):
     html_table_totals = None
     if num_rows > 1:
         totals_df = pandas.DataFrame()
-        totals_df.loc['Totals', cols_to_sum] = vector_df.sum(axis=0)
-        html_table_totals = totals_df.to_html(
-            index=True, index_names=True, na_rep='', classes='full-width')
+        totals_df.loc['Totals', cols_to_sum] = summed_df.sum(axis=0)
+        html_table_totals = tables.to_html(
+            totals_df, index=True, index_names=True, na_rep='',
+            classes='full-width')
 
-    html_table_main = vector_df.to_html(
-        index=False, na_rep='', classes=css_classes)
+    if num_rows > TABLE_VIRTUALIZATION_THRESHOLD:
+        html_table_main = _build_virtual_table(vector_df, css_classes)
+    else:
+        html_table_main = tables.to_html(
+            vector_df, index=False, na_rep='', classes=css_classes)
 
     return (html_table_main, html_table_totals)
 
 
+def _build_virtual_table(dataframe, css_classes):
+    """Build an HTML table whose rows are embedded as JSON.
+
+    The table itself has only a header. It is followed by a script element
+    of type ``application/json`` holding the formatted cells, column by
+    column, from which ``datatable-js.html`` creates the rows of each page
+    as it is viewed.
+
+    Args:
+        dataframe (pandas.DataFrame): the table's data.
+        css_classes (list[str]): CSS classes of the table. The 'virtual'
+            class is added.
+
+    Returns:
+        An HTML string.
+    """
+    html_header = tables.to_html(
+        dataframe.iloc[:0], index=False, classes=[*css_classes, 'virtual'])
+    columns = [tables.format_values(dataframe.iloc[:, i], na_rep='')
+               for i in range(dataframe.shape[1])]
+    # Escaping '<' keeps the data from closing the script element.
+    data_json = json.dumps(
+        {'columns': columns}, separators=(',', ':')).replace('<', '\\u003c')
+    return (f'{html_header}\n<script type="application/json" '
+            f'class="datatable-data">{data_json}</script>')
+
+
 def generate_caption_from_raster_list(
         raster_list: list[tuple[str, str]], args_dict,
-        file_registry, model_spec: ModelSpec):
+        file_registry, model_spec: 'ModelSpec'):
     caption = []
     for (id, input_or_output) in raster_list:
         if input_or_output == 'input':
@@ -0,0 +1,120 @@
+# Persistent cache of report sections: figures, tables and chart specs.
+# Each section is keyed by the identities of the files it is made from and
+# by the parameters it is made with, so when a report is regenerated, only
+# the sections whose inputs have changed are made again.
+
+import functools
+import importlib.metadata
+import json
+import logging
+import os
+import shutil
+
+from invest_reports import cache
+
+LOGGER = logging.getLogger(__name__)
+
+SECTION_CACHE = cache.FileCache('sections', '.section', max_bytes=2**30)
+
+
+@functools.cache
+def _versions():
+    """Versions of the packages that determine the content of sections."""
+    versions = []
+    for package in ('invest-reports', 'natcap.invest'):
+        try:
+            versions.append(importlib.metadata.version(package))
+        except importlib.metadata.PackageNotFoundError:
+            versions.append(None)
+    return tuple(versions)
+
+
+def _file_identity(filepath):
+    try:
+        return cache.file_identity(filepath)
+    except OSError:
+        # A missing file is an input too: creating it changes the key.
+        return (os.path.abspath(filepath), None)
+
+
+def section_key(section, filepaths, params):
+    """Make the cache key of a report section.
+
+    Args:
+        section (str): name of the kind of section, e.g. 'raster_figure'.
+        filepaths (list[str]): paths to the files the section is made from.
+            Files that do not exist are allowed.
+        params: any ``repr``-able description of how the section is made,
+            e.g. plotting options.
+
+    Returns:
+        A key for ``SECTION_CACHE``.
+    """
+    return cache.make_key(
+        section, _versions(),
+        [_file_identity(filepath) for filepath in filepaths], params)
+
+
+def cached_file(section, filepaths, params, target_path, write_func):
+    """Write a section to a file, copying it from the cache if possible.
+
+    Args:
+        section (str): name of the kind of section. See ``section_key``.
+        filepaths (list[str]): paths to the files the section is made from.
+        params: description of how the section is made.
+        target_path (str): path to which to write the section.
+        write_func (callable): called with ``target_path`` on a cache miss;
+            writes the section to it.
+
+    Returns:
+        ``None``
+    """
+    key = section_key(section, filepaths, params)
+    cached_path = SECTION_CACHE.get(key)
+    if cached_path is not None:
+        try:
+            shutil.copyfile(cached_path, target_path)
+            LOGGER.debug(f'Reused cached {section} for {target_path}')
+            return
+        except OSError as err:
+            LOGGER.debug(f'Could not copy cached {section} {cached_path}: '
+                         f'{err}')
+
+    write_func(target_path)
+
+    def copy_target(file):
+        with open(target_path, 'rb') as target_file:
+            shutil.copyfileobj(target_file, file)
+    SECTION_CACHE.put(key, copy_target)
+
+
+def cached_json(section, filepaths, params, compute_func):
+    """Get a section's content from the cache, computing it on a miss.
+
+    Args:
+        section (str): name of the kind of section. See ``section_key``.
+        filepaths (list[str]): paths to the files the section is made from.
+        params: description of how the section is made.
+        compute_func (callable): called with no arguments on a cache miss;
+            returns the section's content, which must be JSON-serializable.
+
+    Returns:
+        The section's content. If it is from the cache, it has been
+            round-tripped through JSON, so tuples become lists.
+    """
+    key = section_key(section, filepaths, params)
+    cached_path = SECTION_CACHE.get(key)
+    if cached_path is not None:
+        try:
+            with open(cached_path, 'r', encoding='utf-8') as file:
+                content = json.load(file)['content']
+            LOGGER.debug(f'Reused cached {section}')
+            return content
+        except (OSError, ValueError, KeyError) as err:
+            LOGGER.debug(f'Could not load cached {section} {cached_path}: '
+                         f'{err}')
+
+    content = compute_func()
+    data = json.dumps({'content': content}).encode('utf-8')
+    SECTION_CACHE.put(key, lambda file: file.write(data))
+    return content
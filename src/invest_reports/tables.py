@@ -0,0 +1,214 @@
+# Fast HTML tables of DataFrames. ``DataFrame.to_html`` passes every cell
+# through several layers of generic formatters, and builds the whole table
+# in memory before returning it, which for the tables of large results
+# vectors takes seconds and several times the table's size in memory. The
+# tables made here are identical to those of ``to_html``, but numbers are
+# formatted a column at a time, and the table is generated a block of rows
+# at a time.
+
+import numbers
+
+from invest_reports.lazy_import import lazy_import
+
+numpy = lazy_import('numpy')
+pandas = lazy_import('pandas')
+
+# Rows formatted, and yielded by ``iter_html``, at a time.
+BLOCK_ROWS = 2000
+
+_ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;'}
+# Escapes applied by pandas' formatters before a cell is HTML-escaped.
+_CONTROL_ESCAPES = str.maketrans({'\t': r'\t', '\n': r'\n', '\r': r'\r'})
+# Types of the values that may be in object columns, other than ``None``.
+_SCALAR_TYPES = (str, numbers.Number)
+
+
+def _escape(text):
+    """Escape the content of a cell as ``to_html`` does."""
+    for (char, escape) in _ESCAPES.items():
+        text = text.replace(char, escape)
+    return text.strip().replace('  ', '&nbsp;&nbsp;')
+
+
+def _is_object_or_string(dtype):
+    return dtype == object or isinstance(dtype, pandas.StringDtype)
+
+
+def _is_supported(dataframe, index):
+    """Whether ``iter_html`` can match ``to_html`` for a DataFrame.
+
+    Supported tables have a flat index and flat, unnamed columns with
+    string or integer labels, and columns of floats, integers, booleans,
+    strings, or objects that are any of these or missing. Floats are only
+    supported if ``display.float_format`` is set.
+    """
+    float_format = pandas.get_option('display.float_format')
+    columns = dataframe.columns
+    if (isinstance(columns, pandas.MultiIndex) or columns.name is not None
+            or not all(isinstance(label, (str, numbers.Integral))
+                       for label in columns)):
+        return False
+    if index:
+        row_index = dataframe.index
+        if isinstance(row_index, pandas.MultiIndex) or not (
+                row_index.name is None or isinstance(row_index.name, str)):
+            return False
+        if _is_object_or_string(row_index.dtype):
+            if not all(isinstance(label, str) for label in row_index):
+                return False
+        elif row_index.dtype.kind not in 'iu':
+            return False
+    for dtype in dataframe.dtypes:
+        if _is_object_or_string(dtype):
+            continue
+        if not isinstance(dtype, numpy.dtype) or dtype.kind not in 'fiub':
+            return False
+        if dtype.kind == 'f' and float_format is None:
+            return False
+    for (_, series) in dataframe.items():
+        if series.dtype == object:
+            for value in series.tolist():
+                if value is None:
+                    continue
+                if not isinstance(value, _SCALAR_TYPES):
+                    return False
+                if isinstance(value, float) and float_format is None:
+                    return False
+    return True
+
+
+def _format_object(value, na_rep, float_format):
+    if isinstance(value, str):
+        return value.translate(_CONTROL_ESCAPES)
+    if value is None:
+        return 'None'
+    if isinstance(value, float):  # includes numpy.float64
+        return na_rep if value != value else float_format(value)
+    if isinstance(value, numpy.floating):
+        return na_rep if numpy.isnan(value) else float_format(value)
+    return str(value)
+
+
+def format_values(series, na_rep='NaN'):
+    """Format the values of a column as ``DataFrame.to_html`` would.
+
+    Floats are formatted with the ``display.float_format`` option, which
+    is mapped over whole columns of floats at once. (For the format set by
+    ``utils.set_table_float_format``, that is quicker than
+    ``numpy.char.mod``.)
+
+    Args:
+        series (pandas.Series): the column.
+        na_rep (str): the string for missing values.
+
+    Returns:
+        A list of strings, not HTML-escaped.
+    """
+    float_format = pandas.get_option('display.float_format') or str
+    dtype = series.dtype
+    if isinstance(dtype, numpy.dtype) and dtype.kind == 'f':
+        values = series.to_numpy()
+        formatted = list(map(float_format, values.tolist()))
+        for i in numpy.flatnonzero(numpy.isnan(values)).tolist():
+            formatted[i] = na_rep
+        return formatted
+    if isinstance(dtype, numpy.dtype) and dtype.kind in 'iub':
+        return series.to_numpy().astype(str).tolist()
+    return [_format_object(value, na_rep, float_format)
+            for value in series.astype(object).tolist()]
+
+
+def _format_cells(series, na_rep):
+    """Format the values of a column as ``<td>`` elements."""
+    if isinstance(series.dtype, numpy.dtype) and series.dtype.kind in 'fiub':
+        # Formatted numbers have nothing to escape.
+        return [f'      <td>{value}</td>'
+                for value in format_values(series, _escape(na_rep))]
+    return [f'      <td>{_escape(value)}</td>'
+            for value in format_values(series, na_rep)]
+
+
+def _format_header(dataframe, classes, index, index_names):
+    table_classes = ['dataframe']
+    if not pandas.get_option('display.html.use_mathjax'):
+        table_classes += ['tex2jax_ignore', 'mathjax_ignore']
+    if isinstance(classes, str):
+        classes = classes.split()
+    table_classes.extend(classes or [])
+    border = pandas.get_option('display.html.border')
+    border_attr = f' border="{border}"' if border is not None else ''
+    justify = pandas.get_option('display.colheader_justify')
+
+    lines = [
+        f'<table{border_attr} class="{" ".join(table_classes)}">',
+        '  <thead>',
+        f'    <tr style="text-align: {justify};">',
+    ]
+    if index:
+        lines.append('      <th></th>')
+    lines.extend(f'      <th>{_escape(str(label))}</th>'
+                 for label in dataframe.columns)
+    lines.append('    </tr>')
+    if index and index_names and dataframe.index.name is not None:
+        lines.append('    <tr>')
+        lines.append(f'      <th>{_escape(dataframe.index.name)}</th>')
+        lines.extend(['      <th></th>'] * dataframe.shape[1])
+        lines.append('    </tr>')
+    lines.extend(['  </thead>', '  <tbody>'])
+    return '\n'.join(lines)
+
+
+def iter_html(dataframe, classes=None, index=True, na_rep='NaN',
+              index_names=True):
+    """Generate an HTML table of a DataFrame, a block of rows at a time.
+
+    The joined output is identical to that of ``DataFrame.to_html`` with
+    the same arguments. Tables that ``to_html`` would format in ways that
+    are not reproduced here, e.g. with a ``MultiIndex``, are made by
+    ``to_html`` and generated in one piece.
+
+    Args:
+        dataframe (pandas.DataFrame): the table's data.
+        classes (str or list[str]): CSS classes of the table, in addition
+            to 'dataframe'.
+        index (bool): whether to show the index as the first column.
+        na_rep (str): the string for missing values.
+        index_names (bool): whether to show the name of the index, if it
+            has one.
+
+    Yields:
+        Strings, which together make up the table.
+    """
+    if not _is_supported(dataframe, index):
+        yield dataframe.to_html(classes=classes, index=index, na_rep=na_rep,
+                                index_names=index_names)
+        return
+
+    yield _format_header(dataframe, classes, index, index_names)
+    for start in range(0, dataframe.shape[0], BLOCK_ROWS):
+        block = dataframe.iloc[start:start + BLOCK_ROWS]
+        columns = [_format_cells(block.iloc[:, i], na_rep)
+                   for i in range(block.shape[1])]
+        if index:
+            columns.insert(0, [
+                f'      <th>{_escape(label.translate(_CONTROL_ESCAPES))}</th>'
+                if isinstance(label, str) else f'      <th>{label}</th>'
+                for label in block.index.tolist()])
+        yield ''.join(
+            '\n    <tr>\n' + '\n'.join(cells) + '\n    </tr>'
+            for cells in zip(*columns))
+    yield '\n  </tbody>\n</table>'
+
+
+def to_html(dataframe, classes=None, index=True, na_rep='NaN',
+            index_names=True):
+    """Make an HTML table of a DataFrame, identical to ``to_html``'s.
+
+    Args:
+        dataframe, classes, index, na_rep, index_names: see ``iter_html``.
+
+    Returns:
+        An HTML string.
+    """
+    return ''.join(
+        iter_html(dataframe, classes, index, na_rep, index_names))
@@ -0,0 +1,210 @@
+# Multi-resolution tile pyramids of rasters, for the zoomable map viewer
+# in ``tile-viewer.html``. Tiles are plain image files referenced by
+# relative URL, so the viewer works offline, without a tile server.
+
+import json
+import logging
+import math
+import os
+
+from invest_reports import instrumentation
+from invest_reports import utils
+from invest_reports.lazy_import import lazy_import
+
+matplotlib = lazy_import('matplotlib')
+numpy = lazy_import('numpy')
+Image = lazy_import('PIL.Image')
+
+LOGGER = logging.getLogger(__name__)
+
+TILE_SIZE = 256  # pixels
+# Levels finer than this budget allows are left out of the pyramid, so that
+# a large raster does not write tens of thousands of tiles to the workspace
+# on every run. Rasters up to about 8000 pixels across still get a full
+# resolution level.
+MAX_TILES = 4096
+
+
+def get_levels(raster_size, tile_size=TILE_SIZE, max_tiles=MAX_TILES):
+    """Choose the levels of a tile pyramid.
+
+    Each level is half the resolution of the next. The coarsest level fits
+    in a single tile; the finest is full resolution, unless that would
+    exceed the tile budget.
+
+    Args:
+        raster_size (tuple[int, int]): (width, height) of the raster.
+        tile_size (int): width and height of a tile, in pixels.
+        max_tiles (int): optional maximum number of tiles in the pyramid.
+            The coarsest level is always included. If ``None``, there is
+            no maximum.
+
+    Returns:
+        A list of dicts, coarsest first, each with the level's ``factor``
+            (the number of raster pixels per level pixel, in each
+            dimension) and its ``n_cols`` and ``n_rows`` of tiles.
+    """
+    (width, height) = raster_size
+    factor = 2 ** max(0, math.ceil(math.log2(
+        max(width, height) / tile_size)))
+    levels = []
+    n_tiles = 0
+    while factor >= 1:
+        level = {
+            'factor': factor,
+            'n_cols': math.ceil(math.ceil(width / factor) / tile_size),
+            'n_rows': math.ceil(math.ceil(height / factor) / tile_size),
+        }
+        n_tiles += level['n_cols'] * level['n_rows']
+        if levels and max_tiles is not None and n_tiles > max_tiles:
+            break
+        levels.append(level)
+        factor //= 2
+    return levels
+
+
+def _halve(array, resample_method):
+    """Halve the resolution of a masked array, for the next coarser level.
+
+    With 'nearest' resampling, every other pixel is kept; otherwise, each
+    2 x 2 block of pixels is averaged, ignoring masked pixels. Odd rows
+    and columns at the end are kept on their own.
+    """
+    if resample_method == 'nearest':
+        return array[::2, ::2]
+    (n_rows, n_cols) = array.shape
+    padded = numpy.ma.masked_all(
+        (n_rows + n_rows % 2, n_cols + n_cols % 2), dtype=numpy.float32)
+    padded[:n_rows, :n_cols] = array
+    return padded.reshape(
+        padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).mean(axis=(1, 3))
+
+
+def _get_norm(raster_path, datatype, transform):
+    """Get a norm that colors every tile of a raster consistently.
+
+    The norm matches the one ``utils.plot_raster_list`` finds for the whole
+    raster, except that divergent rasters are always centered linearly.
+    """
+    if datatype.startswith('binary'):
+        return matplotlib.colors.Normalize(-0.5, 1.5)
+    if datatype == 'nominal':
+        (values, _) = utils.count_categories(raster_path)
+        value_range = (values.min(), values.max()) if len(values) else None
+    else:
+        value_range = utils._get_raster_range(raster_path)
+    (vmin, vmax) = value_range if value_range else (0, 1)
+    if datatype == 'divergent':
+        return matplotlib.colors.CenteredNorm(
+            halfrange=max(abs(vmin), abs(vmax)))
+    if transform == 'log':
+        if vmin <= 0:
+            vmin = 1e-6
+        return matplotlib.colors.LogNorm(vmin, vmax)
+    return matplotlib.colors.Normalize(vmin, vmax)
+
+
+@instrumentation.traced('tile pyramid')
+def build_tile_pyramid(raster_path, datatype, target_dir, transform=None,
+                       tile_size=TILE_SIZE, max_tiles=MAX_TILES,
+                       image_encoding=None):
+    """Write a raster as a pyramid of colorized tiles.
+
+    The raster is read once, a row of tiles of the finest level at a time,
+    decimated on read to that level's resolution. Each coarser level is
+    made from the one below it by halving its resolution, a row of tiles
+    at a time, so memory use is bounded by a row of tiles of each level
+    however large the raster is. Tile ``col``, ``row`` of level ``i``
+    (coarsest first) is written to ``{target_dir}/{i}/{col}_{row}.{format}``,
+    along with a ``manifest.json`` describing the pyramid.
+
+    Args:
+        raster_path (str): path to a raster.
+        datatype (str): the raster's datatype, as for
+            ``utils.RasterPlotConfig``. Determines the colormap and the
+            resampling algorithm.
+        target_dir (str): directory in which to write the tiles.
+        transform (str): 'linear' or 'log'. Defaults to 'linear'.
+        tile_size (int): width and height of a tile, in pixels.
+        max_tiles (int): optional maximum number of tiles. See
+            ``get_levels``.
+        image_encoding (``utils.ImageEncoding``): encoding of the tiles.
+            Defaults to an RGBA PNG.
+
+    Returns:
+        The manifest, a dict with the raster's ``width`` and ``height``,
+            the ``tile_size``, the tiles' ``format``, and the ``levels``
+            from ``get_levels``.
+    """
+    if image_encoding is None:
+        image_encoding = utils.ImageEncoding()
+    raster_info = utils._get_raster_info(raster_path)
+    (width, height) = raster_info['raster_size']
+    cmap = utils._get_colormap(datatype)
+    norm = _get_norm(raster_path, datatype, transform)
+    resample_method = utils._get_resample_alg(datatype)
+    levels = get_levels((width, height), tile_size, max_tiles)
+
+    def write_tile_row(level_index, row, strip):
+        level_dir = os.path.join(target_dir, str(level_index))
+        os.makedirs(level_dir, exist_ok=True)
+        for col in range(levels[level_index]['n_cols']):
+            tile = Image.fromarray(utils._apply_colormap_lut(
+                strip[:, col * tile_size:(col + 1) * tile_size], cmap, norm))
+            tile_path = os.path.join(
+                level_dir, f'{col}_{row}.{image_encoding.format}')
+            with open(tile_path, 'wb') as tile_file:
+                tile_file.write(utils.encode_image(tile, image_encoding))
+
+    # Rows of each level not yet written as tiles, and the number of rows
+    # of tiles written.
+    pending = [[] for _ in levels]
+    n_rows_written = [0] * len(levels)
+
+    def add_rows(level_index, rows, flush=False):
+        pending[level_index].append(rows)
+        while pending[level_index]:
+            strip = numpy.ma.concatenate(pending[level_index])
+            if strip.shape[0] < tile_size and not flush:
+                pending[level_index] = [strip]
+                return
+            pending[level_index] = (
+                [strip[tile_size:]] if strip.shape[0] > tile_size else [])
+            strip = strip[:tile_size]
+            write_tile_row(level_index, n_rows_written[level_index], strip)
+            n_rows_written[level_index] += 1
+            if level_index > 0:
+                # A row of tiles has an even number of rows (for an even
+                # tile size), so the rows halved never straddle two of them.
+                add_rows(level_index - 1, _halve(strip, resample_method))
+
+    finest = levels[-1]
+    factor = finest['factor']
+    for row in range(finest['n_rows']):
+        yoff = row * tile_size * factor
+        window = (0, yoff, width, min(tile_size * factor, height - yoff))
+        buf_size = (math.ceil(width / factor),
+                    math.ceil(window[3] / factor))
+        array = utils._read_band_array(
+            raster_path, window, buf_size,
+            resample_method if factor > 1 else None)
+        add_rows(len(levels) - 1,
+                 utils._mask_nodata(array, raster_info['nodata'][0]))
+    # Write the last, partial, rows of tiles, finest first, since each adds
+    # rows to the level above it.
+    for level_index in reversed(range(len(levels))):
+        if pending[level_index]:
+            add_rows(level_index, pending[level_index].pop(), flush=True)
+
+    manifest = {
+        'width': width,
+        'height': height,
+        'tile_size': tile_size,
+        'format': image_encoding.format,
+        'levels': levels,
+    }
+    with open(os.path.join(target_dir, 'manifest.json'), 'w',
+              encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file)
+    LOGGER.debug(f'Wrote tile pyramid of {raster_path} to {target_dir}')
+    return manifest
@@ -1,19 +1,33 @@
 import base64
 import collections
+import concurrent.futures
+import contextlib
+import gc
+import itertools
+import json
 import logging
 import math
+import multiprocessing
 import os
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
+from multiprocessing import shared_memory
 
-import geometamaker
-import numpy
-import pygeoprocessing
-import matplotlib
-import matplotlib.pyplot as plt
-from matplotlib.colors import ListedColormap
-import pandas
-import yaml
-from osgeo import gdal
+from invest_reports import artifacts
+from invest_reports import cache
+from invest_reports import instrumentation
+from invest_reports.lazy_import import lazy_import
+
+# Imported on first use, so that importing this module is quick.
+geometamaker = lazy_import('geometamaker')
+numpy = lazy_import('numpy')
+pygeoprocessing = lazy_import('pygeoprocessing')
+matplotlib = lazy_import('matplotlib')
+plt = lazy_import('matplotlib.pyplot')
+pandas = lazy_import('pandas')
+yaml = lazy_import('yaml')
+gdal = lazy_import('osgeo.gdal')
+Image = lazy_import('PIL.Image')
 
 
 LOGGER = logging.getLogger(__name__)
@@ -33,12 +47,46 @@ LOGGER = logging.getLogger(__name__)
 #   root font size (default 16px)
 #   savefig with tight bbox layout shrinks the figure after it is sized
 FIGURE_WIDTH = 14.5  # inches; by trial & error
+FIGURE_DPI = 100  # matplotlib's default; used when saving figures
+
+# Rough estimates of peak memory use per pixel of a plotted raster, used to
+# fit rasters within a ``max_memory`` budget. Every raster in a figure stays
+# resident until the figure is saved (a value of up to 4 bytes, plus a
+# 1-byte mask), while matplotlib's float64 working copies exist for only
+# one image at a time, as it is drawn.
+RESIDENT_BYTES_PER_PIXEL = 5
+DRAW_BYTES_PER_PIXEL = 24
+# An RGBA canvas is drawn twice when a figure is saved with a tight bbox.
+CANVAS_BYTES_PER_PIXEL = 8
+# A process that has imported numpy, GDAL and matplotlib, before it
+# draws anything.
+RENDER_WORKER_BYTES = 200 * 2**20
+# The share of a ``max_memory`` budget given to GDAL's block cache, which
+# otherwise defaults to 5% of the machine's memory. See
+# ``gdal_cache_budget``.
+GDAL_CACHE_FRACTION = 0.125
+
+
+def set_table_float_format():
+    """Globally set the float format used in DataFrames and HTML tables.
+
+    G indicates Python "general" format, which limits precision
+    (default: 6 significant digits), drops trailing zeros,
+    and uses scientific notation where appropriate.
+
+    Returns:
+        ``None``
+    """
+    pandas.set_option('display.float_format', '{:G}'.format)
+
 
-# Globally set the float format used in DataFrames and resulting HTML tables.
-# G indicates Python "general" format, which limits precision
-# (default: 6 significant digits), drops trailing zeros,
-# and uses scientific notation where appropriate.
-pandas.set_option('display.float_format', '{:G}'.format)
+# Decimated raster reads are cached outside of the model workspace, keyed by
+# the identity of the raster file and by how it was decimated.
+# Set ``PREVIEW_CACHE.max_bytes`` to change the cap on the cache's size.
+PREVIEW_CACHE = cache.FileCache('previews', '.npy', max_bytes=2**30)
+
+
+IMAGE_FORMATS = ('png', 'webp')
 
 
 class RasterPlotConfig:
@@ -61,30 +109,248 @@ class RasterPlotConfigGroup:
         self.intermediates = intermediates
 
 
-def read_masked_array(filepath, resample_method):
-    info = pygeoprocessing.get_raster_info(filepath)
-    nodata = info['nodata'][0]
-    resampled = False
-    if os.path.getsize(filepath) > 4e6:
-        resampled = True
-        raster = gdal.OpenEx(filepath)
-        band = raster.GetRasterBand(1)
-        if band.GetOverviewCount() == 0:
-            pygeoprocessing.build_overviews(
-                filepath,
-                internal=False,
-                resample_method=resample_method,
-                overwrite=False, levels='auto')
-
-        raster = gdal.OpenEx(filepath)
+class ImageEncoding:
+    """How figures are encoded as images for embedding in a report.
+
+    Args:
+        format (str): one of ``IMAGE_FORMATS`` ('png' or 'webp').
+        quantize (bool): for PNG, whether to store the image with a palette
+            of at most 256 colors, rather than as RGBA. Maps use few colors,
+            so this is usually much smaller; only the antialiased edges of
+            text and lines may shift slightly in color.
+        compress_level (int): for PNG, the zlib compression level, from 0
+            (fastest) to 9 (smallest).
+        lossless (bool): for WebP, whether to encode losslessly.
+        quality (int): for WebP, from 0 to 100. If lossy, the image
+            quality; if lossless, the effort spent making the image smaller.
+    """
+
+    def __init__(self,
+                 format: str = 'png',
+                 quantize: bool = False,
+                 compress_level: int = 6,
+                 lossless: bool = True,
+                 quality: int = 80):
+        if format not in IMAGE_FORMATS:
+            raise ValueError(
+                f'Image format must be one of {IMAGE_FORMATS}, not {format}')
+        self.format = format
+        self.quantize = quantize
+        self.compress_level = compress_level
+        self.lossless = lossless
+        self.quality = quality
+
+    @property
+    def mime_type(self):
+        return f'image/{self.format}'
+
+    @property
+    def pil_kwargs(self):
+        """Keyword arguments for ``PIL.Image.Image.save``."""
+        if self.format == 'webp':
+            return {'lossless': self.lossless, 'quality': self.quality}
+        return {'compress_level': self.compress_level}
+
+
+def read_masked_array(filepath, resample_method, max_size=None,
+                      window=None):
+    """Read the first band of a raster as a masked array.
+
+    The array keeps the raster's own data type, so that integer rasters
+    (e.g. land cover or stream maps) are not inflated to float64. The only
+    exception is float64, which is narrowed to float32: that is plenty of
+    precision for plotting. Nodata pixels, and NaN pixels in float rasters,
+    are masked.
+
+    If ``max_size`` is given and the raster is larger than it in either
+    dimension, the raster is decimated on read: GDAL resamples directly into
+    a buffer of the reduced size, so no overviews are built or written.
+    Decimated arrays of whole rasters are cached in ``PREVIEW_CACHE``.
+    Within a ``artifacts.report_scope``, an array that is still in use is
+    shared with later calls for the same raster and size, rather than read
+    again; the caller must not modify it.
+
+    Args:
+        filepath (str): path to a raster.
+        resample_method (str): the resampling algorithm to use when
+            decimating. One of the values of ``RESAMPLE_ALGS``.
+        max_size (tuple[int, int]): optional (width, height) in pixels. The
+            array returned will fit within this size, preserving the aspect
+            ratio of the raster. If ``None``, read at full resolution.
+        window (tuple[int, int, int, int]): optional (x offset, y offset,
+            width, height) of the part of the raster to read, in pixels.
+            If ``None``, read the whole raster.
+
+    Returns:
+        A 2-tuple of (``numpy.ma.MaskedArray``, ``bool``), where the bool
+            indicates whether the raster was resampled.
+    """
+    raster_info = _get_raster_info(filepath)
+    if window is None:
+        window = (0, 0, *raster_info['raster_size'])
+    window = tuple(window)
+    read_size = window[2:]
+    buf_size = _get_decimated_size(read_size, max_size)
+    resampled = buf_size != read_size
+    if not resampled:
+        resample_method = None
+    masked_array = artifacts.memoize_weak(
+        'masked_array',
+        (os.path.abspath(filepath), window, buf_size, resample_method),
+        lambda: _mask_nodata(
+            _read_band_array(filepath, window, buf_size, resample_method),
+            raster_info['nodata'][0]))
+    return (masked_array, resampled)
+
+
+def _read_band_array(filepath, window, buf_size, resample_method):
+    """Read the first band of a raster, decimating it if resampling.
+
+    Args:
+        filepath (str): path to a raster.
+        window (tuple[int, int, int, int]): (x offset, y offset, width,
+            height) of the part of the raster to read.
+        buf_size (tuple[int, int]): (width, height) of the array to read.
+        resample_method (str): the resampling algorithm to use, or ``None``
+            to read at full resolution.
+
+    Returns:
+        ``numpy.ndarray``
+    """
+    with instrumentation.span('raster read', path=filepath, window=window,
+                              size=buf_size):
+        raster = gdal.OpenEx(filepath, gdal.OF_RASTER)
         band = raster.GetRasterBand(1)
-        n = band.GetOverviewCount()
-        array = band.GetOverview(n - 1).ReadAsArray()
+        if resample_method is None:
+            array = band.ReadAsArray(*window)
+        elif window == (0, 0, raster.RasterXSize, raster.RasterYSize):
+            array = _read_preview(filepath, band, buf_size, resample_method)
+        else:
+            # Windows are read for tiles, which are too many to cache.
+            (buf_xsize, buf_ysize) = buf_size
+            array = band.ReadAsArray(
+                *window, buf_xsize=buf_xsize, buf_ysize=buf_ysize,
+                resample_alg=getattr(
+                    gdal, GDAL_RESAMPLE_ALGS[resample_method]))
         raster = band = None
-    else:
-        array = pygeoprocessing.raster_to_numpy_array(filepath)
-    masked_array = numpy.where(array == nodata, numpy.nan, array)
-    return (masked_array, resampled)
+    return array
+
+
+def _get_raster_info(filepath):
+    """Get ``pygeoprocessing.get_raster_info``, once per report scope."""
+    return artifacts.memoize(
+        'raster_info', os.path.abspath(filepath),
+        lambda: pygeoprocessing.get_raster_info(filepath))
+
+
+def _mask_nodata(array, nodata):
+    """Mask nodata (and NaN) pixels of an array without copying its data.
+
+    Args:
+        array (numpy.ndarray): the array to mask.
+        nodata (number): the nodata value, or ``None`` if there is none.
+
+    Returns:
+        ``numpy.ma.MaskedArray``
+    """
+    if array.dtype == numpy.float64:
+        array = array.astype(numpy.float32)
+    mask = numpy.ma.nomask
+    if nodata is not None:
+        mask = array == nodata
+    if numpy.issubdtype(array.dtype, numpy.floating):
+        mask = mask | numpy.isnan(array)
+    return numpy.ma.MaskedArray(array, mask=mask, copy=False)
+
+
+def iter_masked_arrays(filepath_list, resample_method_list, max_size=None,
+                       max_workers=None):
+    """Read a sequence of rasters, optionally prefetching them in threads.
+
+    GDAL releases the GIL while decoding, so reading in worker threads lets
+    the decoding of several (compressed) rasters overlap with each other and
+    with whatever the caller does with each array as it arrives.
+
+    Args:
+        filepath_list (list[str]): paths to rasters.
+        resample_method_list (list[str]): the resampling algorithm to use
+            for each raster. See ``read_masked_array``.
+        max_size (tuple[int, int]): see ``read_masked_array``.
+        max_workers (int): the number of rasters to read concurrently. At
+            most this many reads will be ahead of the one being yielded.
+            If ``None``, rasters are read one at a time in this thread.
+
+    Yields:
+        The (``numpy.ma.MaskedArray``, ``bool``) tuple returned by
+            ``read_masked_array`` for each raster, in order.
+    """
+    read_args = zip(filepath_list, resample_method_list)
+    if not max_workers:
+        for (filepath, resample_method) in read_args:
+            yield read_masked_array(filepath, resample_method, max_size)
+        return
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        futures = collections.deque(
+            executor.submit(read_masked_array, filepath, method, max_size)
+            for (filepath, method) in itertools.islice(read_args, max_workers))
+        while futures:
+            result = futures.popleft().result()
+            for (filepath, method) in itertools.islice(read_args, 1):
+                futures.append(executor.submit(
+                    read_masked_array, filepath, method, max_size))
+            yield result
+
+
+def _read_preview(filepath, band, buf_size, resample_method):
+    """Read a decimated band, or load it from ``PREVIEW_CACHE``.
+
+    Args:
+        filepath (str): path to the raster ``band`` belongs to.
+        band (gdal.Band): the band to read.
+        buf_size (tuple[int, int]): (width, height) of the array to read.
+        resample_method (str): the resampling algorithm to use.
+
+    Returns:
+        ``numpy.ndarray``
+    """
+    key = cache.make_key(
+        cache.file_identity(filepath), band.GetBand(), buf_size,
+        resample_method)
+    cached_path = PREVIEW_CACHE.get(key)
+    if cached_path is not None:
+        try:
+            return numpy.load(cached_path)
+        except (OSError, ValueError) as err:
+            LOGGER.debug(f'Could not load cached preview {cached_path}: {err}')
+
+    with instrumentation.span('preview build', path=filepath, size=buf_size):
+        (buf_xsize, buf_ysize) = buf_size
+        array = band.ReadAsArray(
+            buf_xsize=buf_xsize, buf_ysize=buf_ysize,
+            resample_alg=getattr(gdal, GDAL_RESAMPLE_ALGS[resample_method]))
+        PREVIEW_CACHE.put(key, lambda file: numpy.save(file, array))
+    return array
+
+
+def _get_decimated_size(raster_size, max_size):
+    """Fit a raster's size within a maximum size, preserving aspect ratio.
+
+    Args:
+        raster_size (tuple[int, int]): (width, height) of the raster.
+        max_size (tuple[int, int]): (width, height) to fit within, or
+            ``None`` to keep the raster's size.
+
+    Returns:
+        A (width, height) tuple. Rasters are never upsampled.
+    """
+    (width, height) = raster_size
+    if max_size is None:
+        return (width, height)
+    scale = min(1, max_size[0] / width, max_size[1] / height)
+    if scale == 1:
+        return (width, height)
+    return (max(1, round(width * scale)), max(1, round(height * scale)))
 
 
 # Mapping 'datatype' to colormaps and resampling algorithms
@@ -96,13 +362,13 @@ COLORMAPS = {
     # background and/or `0` pixels, as in what_drains_to_stream maps, e.g.
     # This `1` color has good (but not especially high) contrast against both
     # black (the `0` color) and white (the figure background).
-    'binary': ListedColormap(["#000000", "#aa44dd"]),
+    'binary': ["#000000", "#aa44dd"],
     # Use `binary_high_contrast` where `1` pixels are likely to be adjacent
     # to `0` pixels and other `1` pixels but _not_ to white background,
     # as in stream network maps, e.g.
     # The `1` color has very high contrast against the `0` color but
     # very low contrast against white (the figure background).
-    'binary_high_contrast': ListedColormap(["#1a1a1a", "#4de4ff"]),
+    'binary_high_contrast': ["#1a1a1a", "#4de4ff"],
 }
 RESAMPLE_ALGS = {
     'continuous': 'bilinear',
@@ -110,6 +376,29 @@ RESAMPLE_ALGS = {
     'nominal': 'nearest',
     'binary': 'nearest',
 }
+# Names of the GDAL RasterIO resampling constants.
+GDAL_RESAMPLE_ALGS = {
+    'nearest': 'GRIORA_NearestNeighbour',
+    'bilinear': 'GRIORA_Bilinear',
+}
+
+
+def _get_colormap(datatype):
+    """Get the colormap for a datatype, as a ``Colormap`` of its own.
+
+    Names in ``COLORMAPS`` are looked up in matplotlib's registry; lists of
+    colors are made into a ``ListedColormap``.
+    """
+    cmap = COLORMAPS[datatype]
+    if isinstance(cmap, str):
+        return matplotlib.colormaps[cmap]
+    return matplotlib.colors.ListedColormap(cmap)
+
+
+def _get_resample_alg(datatype):
+    return (RESAMPLE_ALGS['binary']
+            if datatype.startswith('binary')
+            else RESAMPLE_ALGS[datatype])
 
 
 def _choose_n_rows_n_cols(map_bbox, n_plots):
@@ -127,11 +416,108 @@ def _choose_n_rows_n_cols(map_bbox, n_plots):
     return n_rows, n_cols, xy_ratio
 
 
-def _figure_subplots(map_bbox, n_plots):
-    n_rows, n_cols, xy_ratio = _choose_n_rows_n_cols(map_bbox, n_plots)
+def _get_subplot_pixel_budget(map_bbox, n_plots):
+    """Get the size in pixels of one subplot in a saved figure.
+
+    Reading a raster at any higher resolution than this only adds work,
+    since the extra detail is lost when the figure is rasterized.
+
+    Args:
+        map_bbox (list): bounding box of the map, [xmin, ymin, xmax, ymax].
+        n_plots (int): the number of subplots in the figure.
+
+    Returns:
+        A (width, height) tuple of ints, in pixels.
+    """
+    _, n_cols, xy_ratio = _choose_n_rows_n_cols(map_bbox, n_plots)
+    width = FIGURE_WIDTH / n_cols * FIGURE_DPI
+    height = width / xy_ratio
+    return (math.ceil(width), math.ceil(height))
+
+
+@contextlib.contextmanager
+def gdal_cache_budget(max_memory):
+    """Limit GDAL's block cache to its share of a memory budget.
 
+    Decimated reads of large rasters fill GDAL's block cache, which by
+    default may grow to 5% of the machine's memory: on a large machine,
+    more than the whole budget. For the duration of a ``with`` block, the
+    cache is limited to ``GDAL_CACHE_FRACTION`` of ``max_memory`` (or its
+    current limit, if that is smaller), and the rest of the budget is left
+    for plotting.
+
+    Args:
+        max_memory (int): the memory budget, in bytes, or ``None``, in
+            which case the cache is left alone.
+
+    Yields:
+        The budget left for plotting, in bytes, or ``None`` if
+            ``max_memory`` is ``None``.
+    """
+    if max_memory is None:
+        yield None
+        return
+    previous_cache_max = gdal.GetCacheMax()
+    cache_max = min(previous_cache_max,
+                    int(max_memory * GDAL_CACHE_FRACTION))
+    gdal.SetCacheMax(cache_max)
+    try:
+        yield max_memory - cache_max
+    finally:
+        gdal.SetCacheMax(previous_cache_max)
+
+
+def _apply_memory_budget(max_size, n_resident, figsize, max_memory,
+                         n_drawing=1):
+    """Shrink a raster read size so that plotting fits in a memory budget.
+
+    Args:
+        max_size (tuple[int, int]): (width, height) that rasters would be
+            read at, absent a memory budget.
+        n_resident (int): the number of rasters that will be held in memory
+            at the same time.
+        figsize (tuple[float, float]): (width, height), in inches, of the
+            figure the rasters will be plotted in.
+        max_memory (int): the memory budget, in bytes, for the rasters and
+            the figure. If ``None``, ``max_size`` is returned unchanged.
+        n_drawing (int): the number of rasters that may be drawn at the
+            same time.
+
+    Returns:
+        A (width, height) tuple of ints, in pixels.
+
+    Raises:
+        ValueError if ``max_memory`` is too small to plot the figure at all.
+    """
+    if max_memory is None:
+        return max_size
+    (fig_width, fig_height) = (x * FIGURE_DPI for x in figsize)
+    canvas_bytes = fig_width * fig_height * CANVAS_BYTES_PER_PIXEL
+    bytes_per_pixel = (n_resident * RESIDENT_BYTES_PER_PIXEL
+                       + n_drawing * DRAW_BYTES_PER_PIXEL)
+    max_pixels = (max_memory - canvas_bytes) / bytes_per_pixel
+    if max_pixels < 1:
+        raise ValueError(
+            f'max_memory of {max_memory} bytes is too small to plot '
+            f'{n_resident} raster(s); at least {math.ceil(canvas_bytes)} '
+            'bytes are needed for the figure alone.')
+    (width, height) = max_size
+    scale = min(1, math.sqrt(max_pixels / (width * height)))
+    return (max(1, math.floor(width * scale)),
+            max(1, math.floor(height * scale)))
+
+
+def _get_subplot_figsize(map_bbox, n_plots):
+    _, n_cols, xy_ratio = _choose_n_rows_n_cols(map_bbox, n_plots)
     sub_width = FIGURE_WIDTH / n_cols
     sub_height = (sub_width / xy_ratio) + 1.0  # in; expand vertically for title & subtitle
+    return (sub_width, sub_height)
+
+
+def _figure_subplots(map_bbox, n_plots):
+    n_rows, n_cols, _ = _choose_n_rows_n_cols(map_bbox, n_plots)
+
+    (_, sub_height) = _get_subplot_figsize(map_bbox, n_plots)
     return plt.subplots(
         n_rows, n_cols, figsize=(FIGURE_WIDTH, n_rows*sub_height),
         layout='constrained')
@@ -147,7 +533,167 @@ def plot_choropleth(gdf, field_list):
     return fig
 
 
-def plot_raster_list(tif_list, datatype_list, transform_list=None):
+def _plot_raster_subplot(fig, ax, arr, resampled, tif, dtype, transform):
+    """Plot a raster, with its title, units, and colorbar or legend.
+
+    Args:
+        fig (matplotlib.figure.Figure): the figure ``ax`` belongs to.
+        ax (matplotlib.axes.Axes): the axes to plot in.
+        arr (numpy.ma.MaskedArray): the raster's data, as returned by
+            ``read_masked_array``.
+        resampled (bool): whether ``arr`` was resampled.
+        tif (str): path to the raster.
+        dtype (str): the raster's datatype. See ``plot_raster_list``.
+        transform (str): the transform to apply to the colormap.
+
+    Returns:
+        ``None``
+    """
+    legend = False
+    imshow_kwargs = {}
+    colorbar_kwargs = {}
+    imshow_kwargs['norm'] = transform
+    imshow_kwargs['interpolation'] = 'none'
+    cmap = _get_colormap(dtype)
+    if dtype == 'divergent':
+        if transform == 'log':
+            transform = matplotlib.colors.SymLogNorm(linthresh=0.03)
+        else:
+            transform = matplotlib.colors.CenteredNorm()
+        imshow_kwargs['norm'] = transform
+    if dtype.startswith('binary'):
+        transform = matplotlib.colors.BoundaryNorm([0, 0.5, 1], cmap.N)
+        # @TODO: ¿update imshow_kwargs['norm']?
+        imshow_kwargs['vmin'] = -0.5
+        imshow_kwargs['vmax'] = 1.5
+        colorbar_kwargs['ticks'] = [0, 1]
+    if dtype == 'nominal':
+        # Count classes at full resolution, so that classes that are lost
+        # in a resampled array still get a place (and a color) in the legend.
+        values, counts = count_categories(tif)
+        values = values[numpy.argsort(-counts, kind='stable')].astype(int)  # descending order
+        if len(values):
+            imshow_kwargs['vmin'] = values.min()
+            imshow_kwargs['vmax'] = values.max()
+    mappable = _imshow_with_lut(ax, arr, cmap, imshow_kwargs)
+    if mappable is None:
+        mappable = ax.imshow(arr, cmap=cmap, **imshow_kwargs)
+    if dtype == 'nominal':
+        colors = [mappable.cmap(mappable.norm(value)) for value in values]
+        patches = [matplotlib.patches.Patch(
+            color=colors[i], label=f'{values[i]}') for i in range(len(values))]
+        legend = True
+    ax.set_title(
+        label=f"{os.path.basename(tif)}{' (resampled)' if resampled else ''}",
+        loc='left', y=1.12, pad=0,
+        fontfamily='monospace', fontsize=14, fontweight=700)
+    units = _get_raster_units(tif)
+    if units:
+        ax.text(x=0.0, y=1.0, s=f'Units: {units}', fontsize=12)
+    if legend:
+        leg = ax.legend(handles=patches, bbox_to_anchor=(1.02, 1), loc=2)
+        leg.set_in_layout(False)
+    else:
+        fig.colorbar(mappable, ax=ax, **colorbar_kwargs)
+
+
+def _imshow_with_lut(ax, arr, cmap, imshow_kwargs):
+    """Colormap an array with a lookup table, and show the RGBA image.
+
+    This is equivalent to ``ax.imshow(arr, cmap=cmap, **imshow_kwargs)``,
+    but much cheaper for large arrays: the array is normalized in place in
+    a single float32 (or float64) copy and mapped to colors by indexing a
+    lookup table, rather than through matplotlib's float64 pipeline.
+    Only linear, log and centered norms are supported.
+
+    Args:
+        ax (matplotlib.axes.Axes): the axes to plot in.
+        arr (numpy.ma.MaskedArray): the array to show.
+        cmap (str or matplotlib.colors.Colormap): the colormap.
+        imshow_kwargs (dict): the other arguments ``imshow`` would get:
+            'norm' (a ``Normalize``, 'linear', 'log', or ``None``),
+            'interpolation', and optionally 'vmin' and 'vmax'.
+
+    Returns:
+        A ``matplotlib.cm.ScalarMappable`` for a colorbar or legend, or
+            ``None`` if the norm is not supported, in which case nothing
+            is shown.
+    """
+    norm = imshow_kwargs.get('norm')
+    vmin = imshow_kwargs.get('vmin')
+    vmax = imshow_kwargs.get('vmax')
+    if norm is None or norm == 'linear':
+        norm = matplotlib.colors.Normalize(vmin, vmax)
+    elif norm == 'log':
+        norm = matplotlib.colors.LogNorm(vmin, vmax)
+    elif type(norm) is not matplotlib.colors.CenteredNorm:
+        return None
+    norm.autoscale_None(arr)
+    if norm.vmin is None or (
+            isinstance(norm, matplotlib.colors.LogNorm) and norm.vmin <= 0):
+        return None
+
+    if isinstance(cmap, str):
+        cmap = matplotlib.colormaps[cmap]
+    ax.imshow(_apply_colormap_lut(arr, cmap, norm),
+              interpolation=imshow_kwargs.get('interpolation'))
+    return matplotlib.cm.ScalarMappable(norm=norm, cmap=cmap)
+
+
+def _apply_colormap_lut(arr, cmap, norm):
+    """Map an array to RGBA colors, like ``cmap(norm(arr), bytes=True)``.
+
+    Args:
+        arr (numpy.ma.MaskedArray): the array to map.
+        cmap (matplotlib.colors.Colormap): the colormap.
+        norm (matplotlib.colors.Normalize): a linear or log norm, with its
+            ``vmin`` and ``vmax`` set.
+
+    Returns:
+        ``numpy.ndarray`` uint8 RGBA image of shape ``arr.shape + (4,)``.
+    """
+    # The colormap's colors, followed by its under, over, and bad colors.
+    n_colors = cmap.N
+    lut = numpy.concatenate([
+        cmap(numpy.arange(n_colors)),
+        [cmap.get_under(), cmap.get_over(), cmap.get_bad()]])
+    lut = (lut * 255).astype(numpy.uint8)
+    (under_index, over_index, bad_index) = range(n_colors, n_colors + 3)
+
+    # Like matplotlib, normalize small types in float32, others in float64.
+    work_dtype = numpy.float64
+    if arr.dtype.itemsize <= 2 or arr.dtype == numpy.float32:
+        work_dtype = numpy.float32
+    values = numpy.ma.getdata(arr).astype(work_dtype)
+    bad = numpy.ma.getmaskarray(arr) | numpy.isnan(values)
+    (vmin, vmax) = (norm.vmin, norm.vmax)
+    if isinstance(norm, matplotlib.colors.LogNorm):
+        bad |= values <= 0
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            numpy.log(values, out=values)
+        (vmin, vmax) = (math.log(vmin), math.log(vmax))
+    if vmin == vmax:
+        values.fill(0)
+    else:
+        # Scale to color indices, as Colormap.__call__ does.
+        values -= vmin
+        values *= n_colors / (vmax - vmin)
+    values[bad] = 0
+    under = values < 0
+    over = values > n_colors
+    numpy.clip(values, 0, n_colors - 1, out=values)
+    index = values.astype(
+        numpy.uint16 if n_colors + 3 <= 2**16 else numpy.intp)
+    del values
+    index[under] = under_index
+    index[over] = over_index
+    index[bad] = bad_index
+    return lut[index]
+
+
+@instrumentation.traced('plotting')
+def plot_raster_list(tif_list, datatype_list, transform_list=None,
+                     max_memory=None, max_read_workers=None):
     """Plot a list of rasters.
 
     Args:
@@ -158,81 +704,362 @@ def plot_raster_list(tif_list, datatype_list, transform_list=None):
         transform_list (list): list of strings describing the
             transformation to apply to the colormap.
             Either 'linear' or 'log'.
+        max_memory (int): optional memory budget, in bytes. If given, the
+            resolution at which rasters are read is reduced as needed to
+            keep the memory used for plotting within the budget.
+        max_read_workers (int): optional number of threads with which to
+            read rasters ahead of plotting them. If ``None``, rasters are
+            read one at a time.
 
     Returns:
         ``matplotlib.figure.Figure``
     """
-    raster_info = pygeoprocessing.get_raster_info(tif_list[0])
+    raster_info = _get_raster_info(tif_list[0])
     bbox = raster_info['bounding_box']
     n_plots = len(tif_list)
 
     fig, axes = _figure_subplots(bbox, n_plots)
+    max_size = _apply_memory_budget(
+        _get_subplot_pixel_budget(bbox, n_plots), n_plots,
+        fig.get_size_inches(), max_memory)
 
     if transform_list is None:
         transform_list = ['linear'] * n_plots
-    for ax, tif, dtype, transform in zip(
-            axes.flatten(), tif_list, datatype_list, transform_list):
-        resample_alg = (RESAMPLE_ALGS['binary']
-                        if dtype.startswith('binary')
-                        else RESAMPLE_ALGS[dtype])
-        arr, resampled = read_masked_array(tif, resample_alg)
-        legend = False
-        imshow_kwargs = {}
-        colorbar_kwargs = {}
-        imshow_kwargs['norm'] = transform
-        imshow_kwargs['interpolation'] = 'none'
-        cmap = COLORMAPS[dtype]
-        if dtype == 'divergent':
-            if transform == 'log':
-                transform = matplotlib.colors.SymLogNorm(linthresh=0.03)
-            else:
-                transform = matplotlib.colors.CenteredNorm()
-            imshow_kwargs['norm'] = transform
-        if dtype.startswith('binary'):
-            transform = matplotlib.colors.BoundaryNorm([0, 0.5, 1], cmap.N)
-            # @TODO: ¿update imshow_kwargs['norm']?
-            imshow_kwargs['vmin'] = -0.5
-            imshow_kwargs['vmax'] = 1.5
-            colorbar_kwargs['ticks'] = [0, 1]
-        mappable = ax.imshow(arr, cmap=cmap, **imshow_kwargs)
-        if dtype == 'nominal':
-            # typically a 'nominal' raster would be an int type, but we replaced
-            # nodata with nan, so the array is now a float.
-            values, counts = numpy.unique(arr[~numpy.isnan(arr)], return_counts=True)
-            values = values[numpy.argsort(-counts)].astype(int)  # descending order
-            colors = [mappable.cmap(mappable.norm(value)) for value in values]
-            patches = [matplotlib.patches.Patch(
-                color=colors[i], label=f'{values[i]}') for i in range(len(values))]
-            legend = True
-        ax.set_title(
-            label=f"{os.path.basename(tif)}{' (resampled)' if resampled else ''}",
-            loc='left', y=1.12, pad=0,
-            fontfamily='monospace', fontsize=14, fontweight=700)
-        units = _get_raster_units(tif)
-        if units:
-            ax.text(x=0.0, y=1.0, s=f'Units: {units}', fontsize=12)
-        if legend:
-            leg = ax.legend(handles=patches, bbox_to_anchor=(1.02, 1), loc=2)
-            leg.set_in_layout(False)
-        else:
-            fig.colorbar(mappable, ax=ax, **colorbar_kwargs)
+    resample_alg_list = [_get_resample_alg(dtype) for dtype in datatype_list]
+    arrays = iter_masked_arrays(
+        tif_list, resample_alg_list, max_size, max_read_workers)
+    for ax, tif, dtype, transform, (arr, resampled) in zip(
+            axes.flatten(), tif_list, datatype_list, transform_list, arrays):
+        _plot_raster_subplot(
+            fig, ax, arr, resampled, tif, dtype, transform)
     [ax.set_axis_off() for ax in axes.flatten()]
     return fig
 
 
-def base64_encode(figure):
-    """Encode a Matplotlib-generated figure as a base64 string.
+# Pools of plotting workers, keyed by (number of workers, cache directory).
+_render_pools = {}
+
+
+def _init_render_worker(cache_dir):
+    cache.set_cache_dir(cache_dir)
+
+
+def _get_render_pool(n_workers):
+    # Pools are kept for the life of the process, so that figures after the
+    # first do not pay to start workers. Workers are spawned rather than
+    # forked because reader threads may hold locks at the time of the fork.
+    # Spawned workers do not inherit the cache directory, which they use
+    # to count categories, so they are given it, and a pool is only used
+    # while the directory is the same.
+    key = (n_workers, cache.get_cache_dir())
+    if key not in _render_pools:
+        _render_pools[key] = concurrent.futures.ProcessPoolExecutor(
+            n_workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_render_worker, initargs=(key[1],))
+    return _render_pools[key]
+
+
+def _discard_render_pool(executor):
+    """Stop using a pool, e.g. because one of its workers died.
+
+    A pool whose worker dies is broken for good: everything submitted to it
+    after that raises ``BrokenProcessPool``.
+    """
+    for (key, pool) in list(_render_pools.items()):
+        if pool is executor:
+            del _render_pools[key]
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _get_n_render_workers(max_render_workers, n_plots, max_memory):
+    """Get the number of worker processes to draw subplots with.
+
+    Returns:
+        An int, which is 0 if the memory budget cannot pay for a worker
+            and subplots should be drawn in this process.
+    """
+    n_workers = min(max_render_workers, n_plots)
+    if max_memory is not None:
+        # Leave at least half of the budget for the rasters themselves.
+        n_workers = min(
+            n_workers, int(max_memory / 2 // RENDER_WORKER_BYTES))
+    return n_workers
+
+
+class _SharedMaskedArray:
+    """A copy of a masked array in shared memory.
+
+    ``ref`` is a small, picklable description of the array that
+    ``_attach_shared_array`` can use to view it from another process
+    without copying it.
+    """
+
+    def __init__(self, masked_array):
+        self._blocks = []
+        mask = numpy.ma.getmask(masked_array)
+        self.ref = (
+            self._share(masked_array.data),
+            None if mask is numpy.ma.nomask else self._share(mask))
+
+    def _share(self, array):
+        block = shared_memory.SharedMemory(
+            create=True, size=max(1, array.nbytes))
+        self._blocks.append(block)
+        numpy.ndarray(array.shape, array.dtype, buffer=block.buf)[:] = array
+        return (block.name, array.shape, array.dtype.str)
+
+    def release(self):
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def _attach_shared_array(ref, blocks):
+    (name, shape, dtype) = ref
+    block = shared_memory.SharedMemory(name=name)
+    blocks.append(block)
+    return numpy.ndarray(shape, dtype, buffer=block.buf)
+
+
+def _draw_subplot_tile(arr, resampled, tif, dtype, transform, figsize):
+    """Plot a raster in a figure of its own.
+
+    Args:
+        arr (numpy.ma.MaskedArray): the raster's data.
+        resampled, tif, dtype, transform: see ``_plot_raster_subplot``.
+        figsize (tuple[float, float]): (width, height) of the figure, in
+            inches.
+
+    Returns:
+        The figure, as PNG bytes.
+    """
+    fig, ax = plt.subplots(figsize=figsize, layout='constrained')
+    _plot_raster_subplot(fig, ax, arr, resampled, tif, dtype, transform)
+    ax.set_axis_off()
+    figfile = BytesIO()
+    fig.savefig(figfile, format='png', bbox_inches='tight', dpi=FIGURE_DPI)
+    plt.close(fig)
+    return figfile.getvalue()
+
+
+def _render_subplot_tile(ref, resampled, tif, dtype, transform, figsize):
+    """Plot a raster shared by another process in a figure of its own.
+
+    Args:
+        ref (tuple): the ``ref`` of a ``_SharedMaskedArray``.
+        resampled, tif, dtype, transform, figsize: see
+            ``_draw_subplot_tile``.
+
+    Returns:
+        The figure, as PNG bytes.
+    """
+    blocks = []
+    try:
+        (data_ref, mask_ref) = ref
+        arr = numpy.ma.MaskedArray(
+            _attach_shared_array(data_ref, blocks),
+            mask=(numpy.ma.nomask if mask_ref is None
+                  else _attach_shared_array(mask_ref, blocks)),
+            copy=False)
+        png = _draw_subplot_tile(
+            arr, resampled, tif, dtype, transform, figsize)
+        del arr
+        # Figures are full of reference cycles. Collect them now, so that no
+        # view of the shared memory outlives it.
+        gc.collect()
+        return png
+    finally:
+        for block in blocks:
+            try:
+                block.close()
+            except BufferError:
+                # Only if drawing failed with views of the block still
+                # alive; the block is unmapped when the worker exits.
+                pass
+
+
+def _assemble_tiles(tiles, n_cols):
+    """Arrange RGBA images in a grid, on a white background.
+
+    Each column is as wide as its widest tile, and each row as tall as its
+    tallest tile. Tiles are aligned to the top left of their cells.
+
+    Args:
+        tiles (list[numpy.ndarray]): RGBA images, in row-major order.
+        n_cols (int): the number of columns in the grid.
+
+    Returns:
+        ``numpy.ndarray`` of shape (height, width, 4) and dtype uint8.
+    """
+    n_rows = math.ceil(len(tiles) / n_cols)
+    col_widths = [max(tile.shape[1] for tile in tiles[col::n_cols])
+                  for col in range(min(n_cols, len(tiles)))]
+    row_heights = [max(tile.shape[0]
+                       for tile in tiles[row*n_cols:(row+1)*n_cols])
+                   for row in range(n_rows)]
+    image = numpy.full(
+        (sum(row_heights), sum(col_widths), 4), 255, dtype=numpy.uint8)
+    for i, tile in enumerate(tiles):
+        (row, col) = divmod(i, n_cols)
+        y = sum(row_heights[:row])
+        x = sum(col_widths[:col])
+        image[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+    return image
+
+
+@instrumentation.traced('plotting')
+def render_raster_list_tiles(tif_list, datatype_list, transform_list=None,
+                             max_render_workers=2, max_memory=None,
+                             max_read_workers=None):
+    """Plot a list of rasters, drawing each subplot in a worker process.
+
+    Each subplot is drawn (with its title, units, and colorbar or legend)
+    as a figure of its own, and the resulting tiles are then assembled
+    into a grid laid out like the figure from ``plot_raster_list``. Rasters
+    are read in this process and handed to the workers through shared
+    memory, rather than pickled. Subplots are drawn in this process
+    instead if ``max_memory`` cannot pay for a worker, or if a worker dies
+    (e.g. because it ran out of memory).
+
+    Args:
+        tif_list, datatype_list, transform_list: see ``plot_raster_list``.
+        max_render_workers (int): the maximum number of worker processes.
+        max_memory (int): optional memory budget, in bytes. Counts the
+            worker processes, and then limits the resolution at which
+            rasters are read. See ``plot_raster_list``.
+        max_read_workers (int): optional number of threads with which to
+            read rasters ahead of plotting them.
+
+    Returns:
+        ``numpy.ndarray`` RGBA image of shape (height, width, 4).
+    """
+    raster_info = _get_raster_info(tif_list[0])
+    bbox = raster_info['bounding_box']
+    n_plots = len(tif_list)
+    n_rows, n_cols, _ = _choose_n_rows_n_cols(bbox, n_plots)
+    tile_figsize = _get_subplot_figsize(bbox, n_plots)
+
+    n_workers = _get_n_render_workers(max_render_workers, n_plots, max_memory)
+    if max_memory is not None:
+        max_memory -= n_workers * RENDER_WORKER_BYTES
+    max_size = _apply_memory_budget(
+        _get_subplot_pixel_budget(bbox, n_plots), n_plots,
+        (FIGURE_WIDTH, n_rows * tile_figsize[1]), max_memory,
+        n_drawing=max(1, n_workers))
+
+    if transform_list is None:
+        transform_list = ['linear'] * n_plots
+    resample_alg_list = [_get_resample_alg(dtype) for dtype in datatype_list]
+    arrays = iter_masked_arrays(
+        tif_list, resample_alg_list, max_size, max_read_workers)
+    pool = executor = _get_render_pool(n_workers) if n_workers else None
+    shared_arrays = []
+    try:
+        # (future, args) of each tile drawn by a worker, or (None, PNG
+        # bytes) of each tile drawn here.
+        tasks = []
+        # Submit each raster as soon as it is read, so that reading the
+        # next raster overlaps with drawing this one.
+        for tif, dtype, transform, (arr, resampled) in zip(
+                tif_list, datatype_list, transform_list, arrays):
+            if executor is not None:
+                shared_arrays.append(_SharedMaskedArray(arr))
+                args = (shared_arrays[-1].ref, resampled, tif, dtype,
+                        transform, tile_figsize)
+                try:
+                    tasks.append(
+                        (executor.submit(_render_subplot_tile, *args), args))
+                    continue
+                except BrokenProcessPool:
+                    LOGGER.warning(
+                        'A plotting worker died; plotting in this process')
+                    _discard_render_pool(executor)
+                    executor = None
+            tasks.append((None, _draw_subplot_tile(
+                arr, resampled, tif, dtype, transform, tile_figsize)))
+        tiles = []
+        for (future, result) in tasks:
+            if future is not None:
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    LOGGER.warning(
+                        'A plotting worker died; plotting in this process')
+                    _discard_render_pool(pool)
+                    # The raster is still in shared memory; draw it here.
+                    result = _render_subplot_tile(*result)
+            tiles.append(numpy.asarray(
+                Image.open(BytesIO(result)).convert('RGBA')))
+    finally:
+        for shared_array in shared_arrays:
+            shared_array.release()
+    return _assemble_tiles(tiles, n_cols)
+
+
+def encode_image(image, encoding=None):
+    """Encode an image as bytes in an image file format.
+
+    Args:
+        image (PIL.Image.Image): the image to encode.
+        encoding (ImageEncoding): how to encode the image. Defaults to
+            ``ImageEncoding()``, an RGBA PNG.
+
+    Returns:
+        ``bytes``
+    """
+    if encoding is None:
+        encoding = ImageEncoding()
+    if encoding.quantize and encoding.format == 'png':
+        image = image.convert('RGBA').quantize(
+            colors=256, method=Image.Quantize.FASTOCTREE,
+            dither=Image.Dither.NONE)
+    imagefile = BytesIO()
+    image.save(imagefile, format=encoding.format, **encoding.pil_kwargs)
+    return imagefile.getvalue()
+
+
+@instrumentation.traced('image encoding')
+def encode_figure(figure, encoding=None):
+    """Encode a Matplotlib-generated figure as bytes in an image format.
 
     Args:
         figure (matplotlib.Figure): the figure to encode.
+        encoding (ImageEncoding): how to encode the figure. See
+            ``encode_image``.
 
     Returns:
-        A string representing the figure as a base64-encoded PNG.
+        ``bytes``
     """
+    if encoding is None:
+        encoding = ImageEncoding()
     figfile = BytesIO()
-    figure.savefig(figfile, format='png', bbox_inches='tight')
-    figfile.seek(0)  # rewind to beginning of file
-    return base64.b64encode(figfile.getvalue()).decode('utf-8')
+    if encoding.quantize and encoding.format == 'png':
+        # Matplotlib can't write a palette image, so write the figure
+        # uncompressed (which is quick) and quantize that.
+        figure.savefig(
+            figfile, format='png', bbox_inches='tight', dpi=FIGURE_DPI,
+            pil_kwargs={'compress_level': 0})
+        return encode_image(Image.open(figfile), encoding)
+    figure.savefig(
+        figfile, format=encoding.format, bbox_inches='tight', dpi=FIGURE_DPI,
+        pil_kwargs=encoding.pil_kwargs)
+    return figfile.getvalue()
+
+
+def base64_encode(figure, encoding=None):
+    """Encode a Matplotlib-generated figure as a base64 string.
+
+    Args:
+        figure (matplotlib.Figure): the figure to encode.
+        encoding (ImageEncoding): how to encode the figure. See
+            ``encode_image``.
+
+    Returns:
+        A string representing the figure as a base64-encoded image file.
+    """
+    return base64.b64encode(
+        encode_figure(figure, encoding)).decode('utf-8')
 
 
 def base64_encode_file(filepath):
@@ -249,40 +1076,126 @@ def base64_encode_file(filepath):
     return s
 
 
-def plot_and_base64_encode_rasters(raster_list: list[RasterPlotConfig]) -> str:
-    """Plot and base-64-encode a list of rasters.
+def plot_and_encode_rasters(raster_list: list[RasterPlotConfig],
+                            max_memory: int | None = None,
+                            max_read_workers: int | None = None,
+                            max_render_workers: int | None = None,
+                            image_encoding: ImageEncoding | None = None
+                            ) -> bytes:
+    """Plot a list of rasters and encode the figure as an image file.
 
     Args:
-        raster_dtype_list (list[RasterPlotConfig]): a list of RasterPlotConfig
+        raster_list (list[RasterPlotConfig]): a list of RasterPlotConfig
             objects, each of which contains the path to a raster, the type
             of data in the raster ('continuous', 'divergent', 'nominal',
             'binary', or 'binary_high_contrast'), and the transformation to
             apply to the colormap ('linear' or 'log').
+        max_memory (int): optional memory budget, in bytes, for plotting.
+            See ``plot_raster_list``.
+        max_read_workers (int): optional number of threads with which to
+            read rasters ahead of plotting them.
+        max_render_workers (int): optional number of processes with which
+            to draw subplots in parallel. See ``render_raster_list_tiles``.
+            If ``None``, the whole figure is drawn in this process.
+        image_encoding (ImageEncoding): how to encode the figure. Defaults
+            to an RGBA PNG.
 
     Returns:
-        A string representing a base64-encoded PNG in which each of the
+        The contents of an image file (``bytes``) in which each of the
             provided rasters is plotted as a subplot.
     """
     raster_path_list = [x.raster_path for x in raster_list]
     datatype_list = [x.datatype for x in raster_list]
     transform_list = [x.transform for x in raster_list]
 
+    if max_render_workers:
+        image = render_raster_list_tiles(
+            raster_path_list,
+            datatype_list,
+            transform_list,
+            max_render_workers,
+            max_memory,
+            max_read_workers
+        )
+        with instrumentation.span('image encoding'):
+            return encode_image(Image.fromarray(image), image_encoding)
+
     figure = plot_raster_list(
         raster_path_list,
         datatype_list,
-        transform_list
+        transform_list,
+        max_memory,
+        max_read_workers
     )
+    img_bytes = encode_figure(figure, image_encoding)
+    # pyplot holds a reference to every figure it creates until it is
+    # closed, which would keep each figure's rasters resident.
+    plt.close(figure)
+
+    return img_bytes
+
+
+def plot_and_base64_encode_rasters(raster_list: list[RasterPlotConfig],
+                                   max_memory: int | None = None,
+                                   max_read_workers: int | None = None,
+                                   max_render_workers: int | None = None,
+                                   image_encoding: ImageEncoding | None = None
+                                   ) -> str:
+    """Plot and base-64-encode a list of rasters.
+
+    Args:
+        raster_list, max_memory, max_read_workers, max_render_workers,
+            image_encoding: see ``plot_and_encode_rasters``.
+
+    Returns:
+        A string representing a base64-encoded image in which each of the
+            provided rasters is plotted as a subplot.
+    """
+    return base64.b64encode(plot_and_encode_rasters(
+        raster_list, max_memory, max_read_workers, max_render_workers,
+        image_encoding)).decode('utf-8')
 
-    return base64_encode(figure)
 
+def plot_and_save_rasters(raster_list: list[RasterPlotConfig],
+                          target_filepath: str,
+                          max_memory: int | None = None,
+                          max_read_workers: int | None = None,
+                          max_render_workers: int | None = None,
+                          image_encoding: ImageEncoding | None = None) -> None:
+    """Plot a list of rasters and write the figure to an image file.
 
-def plot_raster_facets(tif_list, datatype, transform=None, subtitle_list=None):
+    Unlike ``plot_and_base64_encode_rasters``, nothing is kept in memory
+    once the file is written.
+
+    Args:
+        raster_list (list[RasterPlotConfig]): see
+            ``plot_and_encode_rasters``.
+        target_filepath (str): path to the image file to write. Its
+            extension should match the format of ``image_encoding``.
+        max_memory, max_read_workers, max_render_workers, image_encoding:
+            see ``plot_and_encode_rasters``.
+
+    Returns:
+        ``None``
+    """
+    img_bytes = plot_and_encode_rasters(
+        raster_list, max_memory, max_read_workers, max_render_workers,
+        image_encoding)
+    with open(target_filepath, 'wb') as target_file:
+        target_file.write(img_bytes)
+
+
+@instrumentation.traced('plotting')
+def plot_raster_facets(tif_list, datatype, transform=None, subtitle_list=None,
+                       max_memory=None, max_read_workers=None):
     """Plot a list of rasters that will all share a fixed colorscale.
 
     When all the rasters have the same shape and represent the same variable,
     it's useful to scale the colorbar to the global min/max values across
     all rasters, so that the colors are visually comparable across the maps.
-    All rasters share a datatype and a transform.
+    All rasters share a datatype and a transform. The global range is found
+    from stored statistics, where possible, before any raster is read for
+    plotting; see ``_get_raster_range``.
 
     Args:
         tif_list (list): list of filepaths to rasters
@@ -291,33 +1204,38 @@ def plot_raster_facets(tif_list, datatype, transform=None, subtitle_list=None):
             'binary_high_contrast').
         transform (str): string describing the transformation to apply
             to the colormap. Either 'linear' or 'log'.
+        max_memory (int): optional memory budget, in bytes. If given, the
+            resolution at which rasters are read is reduced as needed to
+            keep the memory used for plotting within the budget.
+        max_read_workers (int): optional number of threads with which to
+            read rasters concurrently. If ``None``, rasters are read one at
+            a time.
 
     """
-    raster_info = pygeoprocessing.get_raster_info(tif_list[0])
+    raster_info = _get_raster_info(tif_list[0])
     bbox = raster_info['bounding_box']
     n_plots = len(tif_list)
     fig, axes = _figure_subplots(bbox, n_plots)
+    max_size = _apply_memory_budget(
+        _get_subplot_pixel_budget(bbox, n_plots), n_plots,
+        fig.get_size_inches(), max_memory)
 
-    cmap_str = COLORMAPS[datatype]
     if transform is None:
         transform = 'linear'
-    resample_alg = (RESAMPLE_ALGS['binary']
-                    if datatype.startswith('binary')
-                    else RESAMPLE_ALGS[datatype])
-    arr, resampled = read_masked_array(tif_list[0], resample_alg)
-    ndarray = numpy.empty((n_plots, *arr.shape))
-    ndarray[0] = arr
-    for i, tif in enumerate(tif_list):
-        # We already got the first one to initialize the ndarray with correct shape
-        if i == 0:
-            continue
-        arr, resampled = read_masked_array(tif, RESAMPLE_ALGS[datatype])
-        ndarray[i] = arr
-    # Perhaps this could be optimized by reading min/max from tif metadata
-    # instead of storing all arrays in memory
-    vmin = numpy.nanmin(ndarray)
-    vmax = numpy.nanmax(ndarray)
-    cmap = plt.cm.get_cmap(cmap_str)
+    resample_alg = _get_resample_alg(datatype)
+    if subtitle_list is None:
+        subtitle_list = [''] * n_plots
+    # First pass: get the global range without holding any arrays.
+    ranges = [_get_raster_range(tif) for tif in tif_list]
+    ranges = [x for x in ranges if x is not None]
+    if ranges:
+        vmin = min(x[0] for x in ranges)
+        vmax = max(x[1] for x in ranges)
+    else:
+        # No raster has any valid pixels, so the facets are empty; any
+        # range will do for their colorbars.
+        (vmin, vmax) = (0, 1)
+    cmap = _get_colormap(datatype)
     if datatype == 'divergent':
         if transform == 'log':
             normalizer = matplotlib.colors.SymLogNorm(linthresh=0.03, vmin=vmin, vmax=vmax)
@@ -330,7 +1248,13 @@ def plot_raster_facets(tif_list, datatype, transform=None, subtitle_list=None):
         cmap.set_under(cmap.colors[0])  # values below vmin (0s) get this color
     else:
         normalizer = plt.Normalize(vmin=vmin, vmax=vmax)
-    for arr, ax, subtitle in zip(ndarray, axes.flatten(), subtitle_list):
+    # Second pass: read and draw one raster at a time. Each array is read at
+    # the size of its subplot, so the arrays held by the figure add up to
+    # about the size of the figure, however many rasters there are.
+    arrays = iter_masked_arrays(
+        tif_list, [resample_alg] * n_plots, max_size, max_read_workers)
+    for ax, tif, subtitle, (arr, resampled) in zip(
+            axes.flatten(), tif_list, subtitle_list, arrays):
         mappable = ax.imshow(arr, cmap=cmap, norm=normalizer)
         ax.set(
             title=f"{os.path.basename(tif)}{'*' if resampled else ''}\n{subtitle}")
@@ -339,11 +1263,192 @@ def plot_raster_facets(tif_list, datatype, transform=None, subtitle_list=None):
     return fig
 
 
+# Full-resolution class counts of nominal rasters, keyed by file identity.
+CATEGORY_COUNTS_CACHE = cache.FileCache(
+    'category-counts', '.npz', max_bytes=64 * 2**20)
+
+# Above this range of values, integer blocks are counted with numpy.unique
+# rather than with a numpy.bincount array spanning the whole range.
+MAX_BINCOUNT_RANGE = 2**16
+
+
+def count_categories(filepath):
+    """Count the pixels of each value in a nominal (categorical) raster.
+
+    Counts are taken at full resolution. They come from the first of these
+    that is available:
+
+    - the raster attribute table, if it has value and pixel-count columns;
+    - the band's stored default histogram, if its buckets are one unit wide
+      and the band's stored, exact statistics show that it counts every
+      valid pixel;
+    - a scan of the raster, one block at a time. Integer blocks are counted
+      with ``numpy.bincount`` on their native dtype.
+
+    Results are cached in ``CATEGORY_COUNTS_CACHE``.
+
+    Args:
+        filepath (str): path to a raster.
+
+    Returns:
+        A 2-tuple of ``numpy.ndarray``s: the distinct valid values, in
+            ascending order, and the number of pixels of each.
+    """
+    return artifacts.memoize(
+        'category_counts', os.path.abspath(filepath),
+        lambda: _count_categories(filepath))
+
+
+def _count_categories(filepath):
+    key = cache.make_key(cache.file_identity(filepath), 'category-counts')
+    cached_path = CATEGORY_COUNTS_CACHE.get(key)
+    if cached_path is not None:
+        try:
+            with numpy.load(cached_path) as cached:
+                return (cached['values'], cached['counts'])
+        except (OSError, ValueError, KeyError) as err:
+            LOGGER.debug(f'Could not load cached counts {cached_path}: {err}')
+
+    raster = gdal.OpenEx(filepath, gdal.OF_RASTER)
+    band = raster.GetRasterBand(1)
+    nodata = band.GetNoDataValue()
+    counts = (_count_categories_from_rat(band, nodata)
+              or _count_categories_from_histogram(band, nodata))
+    raster = band = None
+    if counts is None:
+        counts = _count_categories_from_blocks(filepath, nodata)
+
+    values = numpy.array(sorted(counts))
+    counts = numpy.array([counts[value] for value in values], dtype=numpy.int64)
+    CATEGORY_COUNTS_CACHE.put(
+        key, lambda file: numpy.savez(file, values=values, counts=counts))
+    return (values, counts)
+
+
+def _count_categories_from_rat(band, nodata):
+    rat = band.GetDefaultRAT()
+    if rat is None:
+        return None
+    usages = [rat.GetUsageOfCol(i) for i in range(rat.GetColumnCount())]
+    if gdal.GFU_MinMax not in usages or gdal.GFU_PixelCount not in usages:
+        return None
+    values = rat.ReadAsArray(usages.index(gdal.GFU_MinMax))
+    counts = rat.ReadAsArray(usages.index(gdal.GFU_PixelCount))
+    return {value.item(): count.item()
+            for (value, count) in zip(values, counts)
+            if count > 0 and value != nodata}
+
+
+def _count_categories_from_histogram(band, nodata):
+    # Don't force computing a histogram: we would have to choose buckets
+    # that fit the data, which is as much work as counting it ourselves.
+    histogram = band.GetDefaultHistogram(force=False)
+    if not histogram:
+        return None
+    (hist_min, hist_max, n_buckets, bucket_counts) = histogram
+    first_value = hist_min + 0.5
+    if (hist_max - hist_min) != n_buckets or first_value != int(first_value):
+        return None
+    # A stored histogram may have been computed approximately (from an
+    # overview), be out of date, or not cover the band's values (e.g. the
+    # default 8-bit histogram of a uint16 band), so it is only trusted if
+    # the band's exact statistics agree with it.
+    metadata = band.GetMetadata()
+    if (metadata.get('STATISTICS_APPROXIMATE') == 'YES'
+            or 'STATISTICS_MINIMUM' not in metadata
+            or 'STATISTICS_MAXIMUM' not in metadata):
+        return None
+    if (float(metadata['STATISTICS_MINIMUM']) < hist_min
+            or float(metadata['STATISTICS_MAXIMUM']) > hist_max):
+        return None
+    if 'STATISTICS_VALID_PERCENT' in metadata:
+        n_pixels = band.XSize * band.YSize
+        n_valid = float(metadata['STATISTICS_VALID_PERCENT']) / 100 * n_pixels
+        # The percent is stored to a few significant digits.
+        if abs(sum(bucket_counts) - n_valid) > 0.001 * n_pixels + 1:
+            return None
+    return {int(first_value) + i: count
+            for (i, count) in enumerate(bucket_counts)
+            if count > 0 and int(first_value) + i != nodata}
+
+
+def _count_categories_from_blocks(filepath, nodata):
+    counts = collections.Counter()
+    for _, block in pygeoprocessing.iterblocks((filepath, 1)):
+        values = _mask_nodata(block, nodata).compressed()
+        if values.size == 0:
+            continue
+        if numpy.issubdtype(values.dtype, numpy.integer):
+            # Python ints, so that the arithmetic can't overflow.
+            offset = int(values.min())
+            if int(values.max()) - offset < MAX_BINCOUNT_RANGE:
+                bins = numpy.bincount(values.astype(numpy.int64) - offset)
+                (nonzero,) = numpy.nonzero(bins)
+                counts.update(dict(zip(
+                    (nonzero + offset).tolist(), bins[nonzero].tolist())))
+                continue
+        (block_values, block_counts) = numpy.unique(
+            values, return_counts=True)
+        counts.update(dict(zip(block_values.tolist(), block_counts.tolist())))
+    return counts
+
+
+def _get_raster_range(filepath):
+    """Get the minimum and maximum valid values of a raster.
+
+    Stored statistics are used where available, checking first the
+    raster's GDAL metadata (including any ``.aux.xml`` sidecar) and then
+    its geometamaker ``.yml`` sidecar. Otherwise, the raster is scanned
+    one block at a time.
+
+    Args:
+        filepath (str): path to a raster.
+
+    Returns:
+        A (min, max) tuple, or ``None`` if the raster has no valid pixels.
+    """
+    return artifacts.memoize(
+        'raster_range', os.path.abspath(filepath),
+        lambda: _load_raster_range(filepath))
+
+
+def _load_raster_range(filepath):
+    raster = gdal.OpenEx(filepath, gdal.OF_RASTER)
+    band = raster.GetRasterBand(1)
+    stats = (band.GetMetadataItem('STATISTICS_MINIMUM'),
+             band.GetMetadataItem('STATISTICS_MAXIMUM'))
+    nodata = band.GetNoDataValue()
+    raster = band = None
+    if None in stats:
+        resource = _get_raster_metadata(filepath)
+        if resource:
+            gdal_metadata = resource.get_band_description(1).gdal_metadata
+            stats = (gdal_metadata.get('STATISTICS_MINIMUM'),
+                     gdal_metadata.get('STATISTICS_MAXIMUM'))
+    if None not in stats:
+        return (float(stats[0]), float(stats[1]))
+
+    vmin = vmax = None
+    for _, block in pygeoprocessing.iterblocks((filepath, 1)):
+        block = _mask_nodata(block, nodata)
+        if block.count() == 0:
+            continue
+        (block_min, block_max) = (block.min(), block.max())
+        vmin = block_min if vmin is None else min(vmin, block_min)
+        vmax = block_max if vmax is None else max(vmax, block_max)
+    if vmin is None:
+        return None
+    return (vmin, vmax)
+
+
 # TODO: this will probably end up in the geometamaker API
 def geometamaker_load(filepath):
     with open(filepath, 'r') as file:
         yaml_string = file.read()
-        yaml_dict = yaml.safe_load(yaml_string)
+        # libyaml's loader is many times faster than the pure-Python one,
+        # but is only available if PyYAML was built with it.
+        yaml_dict = yaml.load(
+            yaml_string, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
         if not yaml_dict or ('metadata_version' not in yaml_dict
                              and 'geometamaker_version' not in yaml_dict):
             message = (f'{filepath} exists but is not compatible with '
@@ -382,17 +1487,19 @@ def _build_stats_table_row(resource, band):
 
 
 def _get_raster_metadata(filepath):
-    if isinstance(filepath, collections.abc.Mapping):
-        for path in filepath.values():
-            _get_raster_metadata(path)
-    else:
-        try:
-            resource = geometamaker_load(f'{filepath}.yml')
-        except (FileNotFoundError, ValueError) as err:
-            LOGGER.debug(err)
-            return None
-        if isinstance(resource, geometamaker.models.RasterResource):
-            return resource
+    return artifacts.memoize(
+        'raster_metadata', os.path.abspath(filepath),
+        lambda: _load_raster_metadata(filepath))
+
+
+def _load_raster_metadata(filepath):
+    try:
+        resource = geometamaker_load(f'{filepath}.yml')
+    except (FileNotFoundError, ValueError) as err:
+        LOGGER.debug(err)
+        return None
+    if isinstance(resource, geometamaker.models.RasterResource):
+        return resource
 
 
 def _get_raster_units(filepath):
@@ -400,37 +1507,117 @@ def _get_raster_units(filepath):
     return resource.get_band_description(1).units if resource else None
 
 
+def _walk_file_registry(file_registry):
+    """Yield every path in a file registry, including nested registries.
+
+    Args:
+        file_registry (dict): a file registry, whose values are paths or
+            (nested) dicts of paths.
+
+    Yields:
+        Each path (str) in the registry, depth-first, in registry order.
+    """
+    for value in file_registry.values():
+        if isinstance(value, collections.abc.Mapping):
+            yield from _walk_file_registry(value)
+        else:
+            yield value
+
+
 # @TODO tests for this function could use the same setup
 # as invest's test_spec.py:TestMetadataFromSpec.
 # @TODO This function's recursion through a file registry is duplicated in
 # invest's metadata-generating function. We may want a FileRegistry.walk method,
 # or similar.
-def raster_workspace_summary(file_registry):
-    raster_summary = {}
+@instrumentation.traced('stats table', table='outputs')
+def raster_workspace_summary(file_registry, max_workers=None):
+    """Tabulate stats of every raster in a file registry.
+
+    Stats are taken from each raster's geometamaker ``.yml`` sidecar.
+    Sidecars are loaded concurrently, since there may be hundreds of them.
 
-    for path in file_registry.values():
-        resource = _get_raster_metadata(path)
-        band = resource.get_band_description(1) if resource else None
-        if band:
-            filename = os.path.basename(path)
-            raster_summary[filename] = _build_stats_table_row(
-                resource, band)
+    Args:
+        file_registry (dict): the ``natcap.invest.FileRegistry.registry``
+            that was returned by the model's ``execute`` method. May
+            contain nested dicts of paths.
+        max_workers (int): optional number of threads with which to load
+            sidecars. Defaults to the ``ThreadPoolExecutor`` default.
 
+    Returns:
+        ``pandas.DataFrame`` with a row for each raster that has metadata.
+    """
+    paths = list(_walk_file_registry(file_registry))
+    with concurrent.futures.ThreadPoolExecutor(max_workers) as executor:
+        resources = executor.map(_get_raster_metadata, paths)
+        raster_summary = {
+            os.path.basename(path): _build_stats_table_row(
+                resource, resource.get_band_description(1))
+            for (path, resource) in zip(paths, resources)
+            if resource and resource.get_band_description(1)}
+
+    set_table_float_format()
     return pandas.DataFrame(raster_summary).T
 
 
-def raster_inputs_summary(args_dict):
+# Stats table rows of input rasters, keyed by file identity. Inputs are
+# often shared by many model runs, so the rows are reused across reports.
+STATS_CACHE = cache.FileCache('raster-stats', '.json', max_bytes=16 * 2**20)
+
+
+def _get_input_stats_row(filepath, hash_contents=False):
+    """Get a stats table row for a file, computing stats only on a miss.
+
+    Args:
+        filepath (str): path to a file.
+        hash_contents (bool): whether to identify the file by a hash of its
+            contents, rather than by its path and modification time. See
+            ``cache.file_identity``.
+
+    Returns:
+        A dict, as from ``_build_stats_table_row``, or ``None`` if the file
+            is not a raster.
+    """
+    return artifacts.memoize(
+        'input_stats_row', (os.path.abspath(filepath), hash_contents),
+        lambda: _load_input_stats_row(filepath, hash_contents))
+
+
+def _load_input_stats_row(filepath, hash_contents):
+    key = cache.make_key(
+        cache.file_identity(filepath, hash_contents), 'stats-table-row')
+    cached_path = STATS_CACHE.get(key)
+    if cached_path is not None:
+        try:
+            with open(cached_path, 'r', encoding='utf-8') as file:
+                return json.load(file)['row']
+        except (OSError, ValueError, KeyError) as err:
+            LOGGER.debug(f'Could not load cached stats {cached_path}: {err}')
+
+    row = None
+    resource = geometamaker.describe(filepath, compute_stats=True)
+    if isinstance(resource, geometamaker.models.RasterResource):
+        row = _build_stats_table_row(
+            resource, resource.get_band_description(1))
+    # Rows of None are cached too, so that non-raster files are not
+    # described again.
+    STATS_CACHE.put(key, lambda file: file.write(
+        json.dumps({'row': row}).encode('utf-8')))
+    return row
+
+
+@instrumentation.traced('stats table', table='inputs')
+def raster_inputs_summary(args_dict, hash_contents=False):
     raster_summary = {}
     for v in args_dict.values():
         if isinstance(v, str) and os.path.isfile(v):
-            resource = geometamaker.describe(v, compute_stats=True)
-            if isinstance(resource, geometamaker.models.RasterResource):
-                filename = os.path.basename(resource.path)
-                band = resource.get_band_description(1)
-                raster_summary[filename] = _build_stats_table_row(
-                    resource, band)
+            row = _get_input_stats_row(v, hash_contents)
+            if row is not None:
+                filename = os.path.basename(v)
+                # Copy the row, which may be shared within the report.
+                raster_summary[filename] = dict(row)
                 # Remove 'Units' column if all units are blank
                 if not any(raster_summary[filename]['Units']):
                     del raster_summary[filename]['Units']
 
+    set_table_float_format()
     return pandas.DataFrame(raster_summary).T
@@ -0,0 +1,90 @@
+import concurrent.futures
+import gc
+import threading
+import unittest
+
+import numpy
+
+from invest_reports import artifacts
+
+
+class ArtifactsTests(unittest.TestCase):
+    """Unit tests for the per-report artifact registry."""
+
+    def test_memoize_outside_scope(self):
+        """Without a report scope, every call loads the artifact."""
+        calls = []
+        for _ in range(2):
+            artifacts.memoize('kind', 'key', lambda: calls.append(1))
+        self.assertEqual(len(calls), 2)
+
+    def test_memoize_in_scope(self):
+        """Within a report scope, each artifact is loaded once."""
+        calls = []
+
+        def load():
+            calls.append(1)
+            return len(calls)
+
+        with artifacts.report_scope():
+            self.assertEqual(artifacts.memoize('kind', 'a', load), 1)
+            self.assertEqual(artifacts.memoize('kind', 'a', load), 1)
+            self.assertEqual(artifacts.memoize('kind', 'b', load), 2)
+            self.assertEqual(artifacts.memoize('other', 'a', load), 3)
+            with artifacts.report_scope():
+                # A nested scope starts empty.
+                self.assertEqual(artifacts.memoize('kind', 'a', load), 4)
+            self.assertEqual(artifacts.memoize('kind', 'a', load), 1)
+        self.assertEqual(artifacts.memoize('kind', 'a', load), 5)
+
+    def test_memoize_does_not_keep_errors(self):
+        """A failed load is raised, and retried on the next call."""
+        def fail():
+            raise ValueError('oops')
+
+        with artifacts.report_scope():
+            with self.assertRaises(ValueError):
+                artifacts.memoize('kind', 'key', fail)
+            self.assertEqual(
+                artifacts.memoize('kind', 'key', lambda: 'ok'), 'ok')
+
+    def test_memoize_concurrent_callers(self):
+        """Threads asking for the same artifact share a single load."""
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def load():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return 'value'
+
+        with artifacts.report_scope():
+            with concurrent.futures.ThreadPoolExecutor(4) as executor:
+                futures = [
+                    executor.submit(artifacts.memoize, 'kind', 'key', load)
+                    for _ in range(4)]
+                started.wait()
+                release.set()
+                results = [future.result() for future in futures]
+        self.assertEqual(results, ['value'] * 4)
+        self.assertEqual(len(calls), 1)
+
+    def test_memoize_weak(self):
+        """Weakly memoized artifacts are shared only while in use."""
+        calls = []
+
+        def load():
+            calls.append(1)
+            return numpy.ma.MaskedArray(numpy.zeros(3))
+
+        with artifacts.report_scope():
+            array = artifacts.memoize_weak('array', 'key', load)
+            self.assertIs(artifacts.memoize_weak('array', 'key', load), array)
+            self.assertEqual(len(calls), 1)
+
+            del array
+            gc.collect()
+            artifacts.memoize_weak('array', 'key', load)
+            self.assertEqual(len(calls), 2)
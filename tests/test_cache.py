@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from invest_reports import cache
+
+
+class FileCacheTests(unittest.TestCase):
+    """Unit tests for the report artifact cache."""
+
+    def setUp(self):
+        """Initialize FileCacheTests tests."""
+        self.workspace_dir = tempfile.mkdtemp()
+        cache.set_cache_dir(self.workspace_dir)
+
+    def tearDown(self):
+        """Clean up remaining files."""
+        cache.set_cache_dir(None)
+        shutil.rmtree(self.workspace_dir)
+
+    def test_get_cache_dir_precedence(self):
+        """set_cache_dir takes precedence over the environment variable."""
+        env_dir = os.path.join(self.workspace_dir, 'from_env')
+        os.environ[cache.CACHE_DIR_ENV_VAR] = env_dir
+        try:
+            self.assertEqual(cache.get_cache_dir(), self.workspace_dir)
+            cache.set_cache_dir(None)
+            self.assertEqual(cache.get_cache_dir(), env_dir)
+        finally:
+            del os.environ[cache.CACHE_DIR_ENV_VAR]
+
+    def test_key_changes_with_file(self):
+        """Cache keys change when a file is modified."""
+        filepath = os.path.join(self.workspace_dir, 'file.txt')
+        with open(filepath, 'w') as file:
+            file.write('a')
+        key = cache.make_key(cache.file_identity(filepath), 'nearest')
+        self.assertEqual(
+            key, cache.make_key(cache.file_identity(filepath), 'nearest'))
+        self.assertNotEqual(
+            key, cache.make_key(cache.file_identity(filepath), 'bilinear'))
+
+        with open(filepath, 'w') as file:
+            file.write('ab')
+        self.assertNotEqual(
+            key, cache.make_key(cache.file_identity(filepath), 'nearest'))
+
+    def test_get_and_put(self):
+        """Entries can be retrieved after they are added."""
+        file_cache = cache.FileCache('test', '.bin', max_bytes=100)
+        self.assertIsNone(file_cache.get('a'))
+
+        file_cache.put('a', lambda file: file.write(b'contents'))
+        cached_path = file_cache.get('a')
+        with open(cached_path, 'rb') as file:
+            self.assertEqual(file.read(), b'contents')
+        self.assertTrue(cached_path.startswith(self.workspace_dir))
+
+    def test_evict_least_recently_used(self):
+        """Entries are evicted least-recently-used first."""
+        file_cache = cache.FileCache('test', '.bin', max_bytes=20)
+        file_cache.put('a', lambda file: file.write(b'0' * 10))
+        file_cache.put('b', lambda file: file.write(b'0' * 10))
+        # Make sure 'a' is more recently used than 'b'.
+        past = time.time() - 10
+        os.utime(file_cache._entry_path('b'), (past, past))
+        file_cache.put('c', lambda file: file.write(b'0' * 10))
+
+        self.assertIsNotNone(file_cache.get('a'))
+        self.assertIsNone(file_cache.get('b'))
+        self.assertIsNotNone(file_cache.get('c'))
+
+        file_cache.clear()
+        self.assertIsNone(file_cache.get('a'))
+        self.assertIsNone(file_cache.get('c'))
+
+    def test_file_identity_hash_contents(self):
+        """Copies of a file share an identity when contents are hashed."""
+        filepath = os.path.join(self.workspace_dir, 'file.txt')
+        with open(filepath, 'w') as file:
+            file.write('contents')
+        copy_path = os.path.join(self.workspace_dir, 'copy.txt')
+        shutil.copyfile(filepath, copy_path)
+
+        self.assertNotEqual(
+            cache.file_identity(filepath), cache.file_identity(copy_path))
+        self.assertEqual(
+            cache.file_identity(filepath, hash_contents=True),
+            cache.file_identity(copy_path, hash_contents=True))
+
+    def test_template_bytecode_cache(self):
+        """Compiled templates are written to the cache directory."""
+        import jinja2
+        env = jinja2.Environment(
+            loader=jinja2.DictLoader({'a.html': '{{ x }}'}),
+            bytecode_cache=cache.TemplateBytecodeCache())
+        self.assertEqual(env.get_template('a.html').render(x=1), '1')
+        bytecode_dir = os.path.join(self.workspace_dir, 'jinja-bytecode')
+        self.assertEqual(len(os.listdir(bytecode_dir)), 1)
+
+        # A fresh environment loads the compiled template from the cache.
+        env = jinja2.Environment(
+            loader=jinja2.DictLoader({'a.html': '{{ x }}'}),
+            bytecode_cache=cache.TemplateBytecodeCache())
+        self.assertEqual(env.get_template('a.html').render(x=2), '2')
@@ -0,0 +1,129 @@
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from invest_reports import cli
+
+
+# A module that crashes the worker that imports it, if its marker file can
+# be created; so only the first worker to import it crashes, unless the
+# marker is in a directory that does not exist.
+CRASHING_MODULE = """
+import os
+try:
+    os.close(os.open({marker!r}, os.O_CREAT | os.O_EXCL))
+except FileExistsError:
+    pass
+except FileNotFoundError:
+    os._exit(2)
+else:
+    os._exit(1)
+"""
+
+
+# Module level, so that spawned workers can import it.
+def _fake_run_job(path, model_id=None, report_options=None):
+    if path == 'fail':
+        raise ValueError('bad workspace')
+    if path == 'crash':
+        os._exit(3)
+    if path == 'hang':
+        time.sleep(60)
+    if path.startswith('slow:'):
+        # Let the 'exit-idle:' job know that it is running.
+        os.close(os.open(path[5:], os.O_CREAT))
+        time.sleep(1)
+    if path.startswith('exit-idle:'):
+        # Exit soon after returning, once every job has been handed out.
+        deadline = time.monotonic() + 10
+        while (not os.path.exists(path[10:])
+                and time.monotonic() < deadline):
+            time.sleep(0.05)
+        threading.Timer(0.2, os._exit, (4,)).start()
+    return f'{path}.html'
+
+
+class BatchTests(unittest.TestCase):
+    """Unit tests for the batch report CLI."""
+
+    def setUp(self):
+        """Initialize BatchTests tests."""
+        self.workspace_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up remaining files."""
+        shutil.rmtree(self.workspace_dir)
+
+    def _write_crashing_module(self, marker):
+        with open(os.path.join(self.workspace_dir, 'crashing_warm_up.py'),
+                  'w', encoding='utf-8') as module_file:
+            module_file.write(CRASHING_MODULE.format(marker=marker))
+
+    def test_report_filename(self):
+        """Reports are named after the model, with the results suffix."""
+        self.assertEqual(cli._report_filename('sdr', {}), 'sdr.html')
+        self.assertEqual(
+            cli._report_filename('ndr', {'results_suffix': 'a'}),
+            'ndr_a.html')
+        self.assertEqual(
+            cli._report_filename('ndr', {'results_suffix': '_a'}),
+            'ndr_a.html')
+
+    def test_run_batch_isolates_failures(self):
+        """Failed, crashed and timed out jobs do not affect other jobs."""
+        paths = ['a', 'fail', 'b', 'crash', 'hang', 'c', 'd']
+        with mock.patch.object(cli, 'WARM_UP_MODULES', []):
+            results = cli.run_batch(
+                paths, n_workers=2, timeout=1, job_func=_fake_run_job)
+
+        statuses = {result.path: result.status for result in results}
+        self.assertEqual(statuses, {
+            'a': 'ok', 'b': 'ok', 'c': 'ok', 'd': 'ok', 'fail': 'failed',
+            'crash': 'crashed', 'hang': 'timeout'})
+        results_by_path = {result.path: result for result in results}
+        self.assertEqual(results_by_path['a'].report_path, 'a.html')
+        self.assertIn('bad workspace', results_by_path['fail'].error)
+
+        summary = cli.summarize(results, 2)
+        self.assertIn('4 of 7 reports generated', summary)
+        self.assertIn('1 timeout:\n  hang', summary)
+
+    def test_run_batch_replaces_idle_worker_that_exits(self):
+        """A worker that exits between jobs is replaced."""
+        marker = os.path.join(self.workspace_dir, 'marker')
+        with mock.patch.object(cli, 'WARM_UP_MODULES', []):
+            results = cli.run_batch(
+                [f'exit-idle:{marker}', f'slow:{marker}'], n_workers=2,
+                job_func=_fake_run_job)
+
+        self.assertEqual(
+            sorted(result.status for result in results), ['ok', 'ok'])
+
+    def test_run_batch_replaces_worker_that_fails_to_start(self):
+        """A worker that exits while starting is replaced."""
+        self._write_crashing_module(
+            os.path.join(self.workspace_dir, 'marker'))
+        with mock.patch.object(sys, 'path', [self.workspace_dir, *sys.path]), \
+                mock.patch.object(cli, 'WARM_UP_MODULES',
+                                  ['crashing_warm_up']):
+            results = cli.run_batch(
+                ['a', 'b', 'c'], n_workers=2, job_func=_fake_run_job)
+
+        self.assertEqual(
+            sorted((result.path, result.status) for result in results),
+            [('a', 'ok'), ('b', 'ok'), ('c', 'ok')])
+
+    def test_run_batch_stops_after_repeated_start_failures(self):
+        """A batch is abandoned if no worker can start."""
+        self._write_crashing_module(
+            os.path.join(self.workspace_dir, 'missing', 'marker'))
+        with mock.patch.object(sys, 'path', [self.workspace_dir, *sys.path]), \
+                mock.patch.object(cli, 'WARM_UP_MODULES',
+                                  ['crashing_warm_up']):
+            with self.assertRaises(RuntimeError):
+                cli.run_batch(['a', 'b'], n_workers=2, job_func=_fake_run_job)
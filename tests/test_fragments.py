@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import types
+import unittest
+
+from invest_reports import cache
+from invest_reports import fragments
+from invest_reports import jinja_env
+
+
+def _make_model_spec(model_id, outputs):
+    return types.SimpleNamespace(
+        model_id=model_id,
+        outputs=[types.SimpleNamespace(path=path, about=about)
+                 for (path, about) in outputs])
+
+
+class FragmentTests(unittest.TestCase):
+    """Unit tests for cached HTML fragments."""
+
+    def setUp(self):
+        """Initialize FragmentTests tests."""
+        self.workspace_dir = tempfile.mkdtemp()
+        cache.set_cache_dir(self.workspace_dir)
+        fragments._fragments.clear()
+
+    def tearDown(self):
+        """Clean up remaining files."""
+        fragments._fragments.clear()
+        cache.set_cache_dir(None)
+        shutil.rmtree(self.workspace_dir)
+
+    def test_list_metadata(self):
+        """A cached fragment matches the macro it was rendered from."""
+        model_spec = _make_model_spec('sdr', [('a.tif', 'About <a>.')])
+        expected = jinja_env.get_template(
+            'metadata.html').module.list_metadata(model_spec.outputs)
+
+        self.assertEqual(
+            fragments.list_metadata(model_spec, invest_version='1.0'),
+            expected)
+        self.assertIn('About &lt;a&gt;.', expected)
+        self.assertEqual(
+            len(os.listdir(fragments.FRAGMENT_CACHE.cache_dir)), 1)
+
+        # Later processes load the fragment from disk.
+        fragments._fragments.clear()
+        model_spec.outputs = []
+        self.assertEqual(
+            fragments.list_metadata(model_spec, invest_version='1.0'),
+            expected)
+
+    def test_list_metadata_keyed_by_model_and_version(self):
+        """Each model and version of InVEST gets its own fragment."""
+        sdr_spec = _make_model_spec('sdr', [('a.tif', 'A.')])
+        ndr_spec = _make_model_spec('ndr', [('b.tif', 'B.')])
+
+        self.assertIn(
+            'a.tif', fragments.list_metadata(sdr_spec, invest_version='1.0'))
+        self.assertIn(
+            'b.tif', fragments.list_metadata(ndr_spec, invest_version='1.0'))
+        sdr_spec.outputs = []
+        self.assertNotIn(
+            'a.tif', fragments.list_metadata(sdr_spec, invest_version='2.0'))
@@ -0,0 +1,138 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from invest_reports import instrumentation
+from invest_reports import jinja_env
+
+
+class InstrumentationTests(unittest.TestCase):
+    """Unit tests for the timing of report stages."""
+
+    def setUp(self):
+        """Initialize InstrumentationTests tests."""
+        self.workspace_dir = tempfile.mkdtemp()
+        self.target_filepath = os.path.join(self.workspace_dir, 'report.html')
+
+    def tearDown(self):
+        """Clean up remaining files."""
+        shutil.rmtree(self.workspace_dir)
+
+    def test_report_timing_writes_json(self):
+        """Nested spans are recorded and written next to the report."""
+        with instrumentation.report_timing(self.target_filepath) as recorder:
+            with instrumentation.span('plotting'):
+                for path in ('a.tif', 'b.tif'):
+                    with instrumentation.span('raster read', path=path):
+                        pass
+
+        self.assertEqual(
+            [span['stage'] for span in recorder.spans],
+            ['raster read', 'raster read', 'plotting', 'report'])
+        self.assertEqual(recorder.spans[0]['parent'], 'plotting')
+        self.assertEqual(recorder.spans[1]['attrs'], {'path': 'b.tif'})
+        self.assertIsNone(recorder.spans[-1]['parent'])
+        for span in recorder.spans:
+            if span['peak_rss_bytes'] is not None:
+                self.assertGreater(span['peak_rss_bytes'], 0)
+
+        with open(os.path.join(self.workspace_dir, 'report.timings.json'),
+                  encoding='utf-8') as timings_file:
+            timings = json.load(timings_file)
+        self.assertEqual(timings['report'], self.target_filepath)
+        self.assertEqual(len(timings['spans']), 4)
+        summary = {stage['stage']: stage for stage in timings['summary']}
+        self.assertEqual(summary['raster read']['calls'], 2)
+        self.assertEqual(list(summary), ['raster read', 'plotting', 'report'])
+
+    @unittest.skipIf(sys.platform == 'win32', 'requires resource')
+    def test_peak_memory_not_reset_by_default(self):
+        """The peak memory of the process is left alone, unless asked."""
+        import resource
+        # Linux reports kilobytes; macOS, bytes.
+        units = 1 if sys.platform == 'darwin' else 1024
+        block = bytearray(64 * 2**20)
+        block[::4096] = b'x' * len(block[::4096])
+        del block
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        with instrumentation.report_timing(self.target_filepath) as recorder:
+            with instrumentation.span('plotting'):
+                pass
+        self.assertGreaterEqual(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, max_rss)
+        for span in recorder.spans:
+            if sys.platform.startswith('linux'):
+                self.assertIsNotNone(span['rss_end_bytes'])
+            if span['rss_end_bytes'] is not None:
+                self.assertGreaterEqual(
+                    span['peak_rss_bytes'], span['rss_end_bytes'])
+
+        with instrumentation.report_timing(
+                self.target_filepath, reset_peak_memory=True) as recorder:
+            with instrumentation.span('plotting'):
+                pass
+        # Whether or not the peak could be reset, the lifetime peak is kept.
+        self.assertGreaterEqual(recorder.max_rss_bytes, max_rss * units)
+        self.assertGreaterEqual(
+            instrumentation.max_rss_bytes(), max_rss * units)
+
+    def test_hooks_receive_spans(self):
+        """Hooks get each span, including those that raise."""
+        received = []
+        instrumentation.add_hook(received.append)
+        try:
+            with instrumentation.span('vector table'):
+                pass
+            with self.assertRaises(ValueError):
+                with instrumentation.span('template render'):
+                    raise ValueError('broken template')
+        finally:
+            instrumentation.remove_hook(received.append)
+
+        self.assertEqual([span['stage'] for span in received],
+                         ['vector table', 'template render'])
+        self.assertIsNone(received[0]['start'])
+        self.assertIsNone(received[0]['error'])
+        self.assertEqual(received[1]['error'], 'ValueError')
+
+    def test_traced_decorator(self):
+        """A traced function is measured on each call."""
+        @instrumentation.traced('stats table', table='inputs')
+        def make_table(n):
+            return list(range(n))
+
+        with instrumentation.report_timing(self.target_filepath) as recorder:
+            self.assertEqual(make_table(3), [0, 1, 2])
+        self.assertEqual(recorder.spans[0]['stage'], 'stats table')
+        self.assertEqual(recorder.spans[0]['attrs'], {'table': 'inputs'})
+
+    def test_profile(self):
+        """Profiling a report writes cProfile stats next to it."""
+        instrumentation.remove_sink(instrumentation.write_json)
+        try:
+            with instrumentation.report_timing(
+                    self.target_filepath, profile=True):
+                sum(range(1000))
+        finally:
+            instrumentation.add_sink(instrumentation.write_json)
+        self.assertEqual(os.listdir(self.workspace_dir), ['report.prof'])
+
+    def test_timing_summary_footer(self):
+        """The footer summarizes the stages only if given a recorder."""
+        with instrumentation.report_timing(self.target_filepath) as recorder:
+            with instrumentation.span('image encoding'):
+                pass
+        template = jinja_env.get_template('base.html')
+        context = {
+            'model_id': 'model', 'model_name': 'Model',
+            'userguide_page': 'model.html',
+            'report_script': 'model_report.py', 'timestamp': 'now'}
+
+        html = template.render(timing_summary=recorder, **context)
+        self.assertIn('<td>image encoding</td>', html)
+        html = template.render(**context)
+        self.assertNotIn('timing-summary', html)
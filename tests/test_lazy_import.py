@@ -0,0 +1,35 @@
+import subprocess
+import sys
+import unittest
+
+from invest_reports.lazy_import import lazy_import
+
+
+class LazyImportTests(unittest.TestCase):
+    """Unit tests for lazy imports."""
+
+    def test_lazy_import(self):
+        """A module is imported on first attribute access."""
+        sys.modules.pop('colorsys', None)
+        colorsys = lazy_import('colorsys')
+        self.assertNotIn('colorsys', sys.modules)
+
+        self.assertEqual(colorsys.rgb_to_hsv(1, 0, 0), (0, 1, 1))
+        self.assertIn('colorsys', sys.modules)
+
+    def test_report_modules_import_no_heavy_dependencies(self):
+        """Importing report modules defers their heavy dependencies."""
+        heavy_modules = [
+            'altair', 'geometamaker', 'geopandas', 'matplotlib',
+            'natcap.invest', 'numpy', 'osgeo', 'pandas', 'pygeoprocessing']
+        script = (
+            'import sys\n'
+            'import invest_reports.utils\n'
+            'import invest_reports.sdr_ndr_utils\n'
+            'import invest_reports.tile_pyramid\n'
+            'import invest_reports.jinja_report_generators.cv_report_generator\n'
+            f'print([m for m in {heavy_modules!r} if m in sys.modules])\n')
+        result = subprocess.run(
+            [sys.executable, '-c', script], capture_output=True, text=True,
+            check=True)
+        self.assertEqual(result.stdout.strip(), '[]')
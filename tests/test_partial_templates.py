@@ -132,6 +132,47 @@ class JinjaTemplateUnitTests(unittest.TestCase):
         self.assertIn((f'<img src="data:image/png;base64,{img_src}" '
                        f'alt="Raster plots: {img_name}" />'), html)
 
+    def test_raster_plot_img_mime_type(self):
+        """Test raster_plot_img macro with an image type other than PNG."""
+
+        template_str = (
+            """
+            <html>
+                {% from 'raster-plot-img.html' import raster_plot_img %}
+                {{ raster_plot_img(img_src, img_name, 'image/webp') }}
+            </html>
+            """
+        )
+        img_src = 'PiNeAPpLeUNdeRtHeSEa'
+        img_name = 'Bathymetry Maps'
+
+        template = jinja_env.from_string(template_str)
+        html = template.render(img_src=img_src, img_name=img_name)
+        html = ' '.join(html.split())
+
+        self.assertIn(f'<img src="data:image/webp;base64,{img_src}"', html)
+
+    def test_raster_plot_img_external(self):
+        """Test raster_plot_img macro with an image file."""
+
+        template_str = (
+            """
+            <html>
+                {% from 'raster-plot-img.html' import raster_plot_img %}
+                {{ raster_plot_img(img_src, img_name, external=True) }}
+            </html>
+            """
+        )
+        img_src = '_images/report_inputs.png'
+        img_name = 'Bathymetry Maps'
+
+        template = jinja_env.from_string(template_str)
+        html = template.render(img_src=img_src, img_name=img_name)
+        html = ' '.join(html.split())
+
+        self.assertIn((f'<img src="{img_src}" '
+                       f'alt="Raster plots: {img_name}" />'), html)
+
     def test_args_table(self):
         """Test args_table macro."""
 
@@ -0,0 +1,79 @@
+import base64
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import jinja2
+
+from invest_reports import jinja_env
+from invest_reports import report_writer
+
+
+class ReportWriterTests(unittest.TestCase):
+    """Unit tests for the streaming report writer."""
+
+    def setUp(self):
+        """Initialize ReportWriterTests tests."""
+        self.workspace_dir = tempfile.mkdtemp()
+        self.target_filepath = os.path.join(self.workspace_dir, 'report.html')
+
+    def tearDown(self):
+        """Clean up remaining files."""
+        shutil.rmtree(self.workspace_dir)
+
+    def _read_report(self):
+        with open(self.target_filepath, encoding='utf-8') as file:
+            return file.read()
+
+    def test_write_report_matches_render(self):
+        """Writing a template gives the same HTML as rendering it."""
+        template = jinja_env.from_string('<p>{{ a }}</p>{{ b | safe }}')
+        context = {'a': '<b>', 'b': '<i>'}
+        report_writer.write_report(
+            template, self.target_filepath, **context)
+        self.assertEqual(self._read_report(), template.render(**context))
+
+    def test_base64_file_payload(self):
+        """A file is base64-encoded into the report, even within macros."""
+        data = os.urandom(2 * report_writer._BASE64_CHUNK_SIZE + 1)
+        image_path = os.path.join(self.workspace_dir, 'image.png')
+        with open(image_path, 'wb') as file:
+            file.write(data)
+        template = jinja_env.from_string(
+            "{% from 'raster-plot-img.html' import raster_plot_img %}"
+            "{{ raster_plot_img(img_src, 'Outputs') }}"
+            "{{ raster_plot_img(img_src, 'Outputs again') }}")
+
+        report_writer.write_report(
+            template, self.target_filepath,
+            img_src=report_writer.Payload.base64_file(image_path))
+
+        expected = template.render(
+            img_src=base64.b64encode(data).decode('ascii'))
+        self.assertEqual(self._read_report(), expected)
+
+    def test_json_payload(self):
+        """A JSON payload is written unescaped."""
+        spec = {'data': {'values': [{'name': '<a> & "b"'}]}, 'mark': 'bar'}
+        template = jinja_env.from_string(
+            "{% from 'vegalite-plot.html' import embed_vega %}"
+            "{{ embed_vega([(chart_spec, 'chart')]) }}")
+
+        report_writer.write_report(
+            template, self.target_filepath,
+            chart_spec=report_writer.Payload.json(spec))
+
+        expected = template.render(chart_spec=json.dumps(spec, sort_keys=True))
+        self.assertEqual(self._read_report(), expected)
+
+    def test_generator_payload(self):
+        """A payload's chunks are produced each time it is written."""
+        payload = report_writer.Payload(lambda: (str(i) for i in range(3)))
+        template = jinja2.Environment(autoescape=False).from_string(
+            '{{ x }}-{{ x }}')
+
+        report_writer.write_report(template, self.target_filepath, x=payload)
+
+        self.assertEqual(self._read_report(), '012-012')
@@ -1,3 +1,4 @@
+import json
 import os
 import shutil
 import tempfile
@@ -224,6 +225,66 @@ class SDRNDRUtilsTests(unittest.TestCase):
             totals_cell = totals_row.xpath(f'./td[{i}]')
             self.assertEqual(str(val), totals_cell[0].text)
 
+    def test_generate_results_table_selected_columns(self):
+        """Show only the selected columns, but total all cols_to_sum."""
+
+        num_features = 3
+
+        (vector_data, dataframe) = _generate_mock_watershed_data(num_features)
+        filepath = os.path.join(self.workspace_dir, 'vector.fgb')
+        dataframe.to_file(filepath, driver='FlatGeobuf')
+        cols_to_sum = ['calculated_value_1', 'calculated_value_2']
+        columns = ['ws_name', 'calculated_value_2']
+
+        (main_table, totals_table) = (
+            sdr_ndr_utils.generate_results_table_from_vector(
+                filepath, cols_to_sum, columns=columns))
+
+        main_table_root = lxml.html.document_fromstring(main_table)
+        col_headers = main_table_root.xpath('.//table/thead/tr/th')
+        self.assertEqual([th.text for th in col_headers], columns)
+        ws_names = sorted(cell.text for cell in main_table_root.xpath(
+            './/table/tbody/tr/td[1]'))
+        self.assertEqual(ws_names, sorted(row[1] for row in vector_data))
+
+        totals_table_root = lxml.html.document_fromstring(totals_table)
+        totals_cells = totals_table_root.xpath('.//table/tbody/tr/td')
+        self.assertEqual([cell.text for cell in totals_cells],
+                         [str(101 + 102 + 103), str(201 + 202 + 203)])
+
+    def test_generate_results_table_virtual(self):
+        """Embed rows as JSON when there are very many features."""
+
+        num_features = sdr_ndr_utils.TABLE_VIRTUALIZATION_THRESHOLD + 1
+
+        (vector_data, dataframe) = _generate_mock_watershed_data(num_features)
+        filepath = os.path.join(self.workspace_dir, 'vector.gpkg')
+        dataframe.to_file(filepath, driver='GPKG')
+        cols_to_sum = ['calculated_value_1', 'calculated_value_2']
+
+        (main_table, totals_table) = (
+            sdr_ndr_utils.generate_results_table_from_vector(
+                filepath, cols_to_sum))
+
+        main_table_root = lxml.html.fragment_fromstring(
+            main_table, create_parent='div')
+        [table] = main_table_root.find_class('datatable')
+        self.assertEqual(
+            set(table.classes), {'dataframe', 'datatable', 'paginate',
+                                 'virtual'})
+        # The table has a header, but its rows are in the JSON.
+        col_headers = table.xpath('./thead/tr/th')
+        self.assertEqual([th.text for th in col_headers], MAIN_TABLE_COLS)
+        self.assertEqual(table.xpath('./tbody/tr'), [])
+
+        [data_script] = main_table_root.find_class('datatable-data')
+        self.assertEqual(data_script.getprevious(), table)
+        columns = json.loads(data_script.text)['columns']
+        rows = [list(row) for row in zip(*columns)]
+        self.assertEqual(
+            rows, [[str(val) for val in row] for row in vector_data])
+        self.assertIsNotNone(totals_table)
+
     def test_generate_caption_from_raster_list(self):
         raster_list = [('raster_1', 'input'), ('raster_2', 'output')]
         args_dict = {'raster_1': 'path/to/raster_1.tif'}
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from invest_reports import cache
+from invest_reports import sections
+
+
+class SectionCacheTests(unittest.TestCase):
+    """Unit tests for the report section cache."""
+
+    def setUp(self):
+        """Initialize SectionCacheTests tests."""
+        self.workspace_dir = tempfile.mkdtemp()
+        cache.set_cache_dir(os.path.join(self.workspace_dir, 'cache'))
+        self.input_path = os.path.join(self.workspace_dir, 'input.csv')
+        with open(self.input_path, 'w') as file:
+            file.write('a,b\n')
+
+    def tearDown(self):
+        """Clean up remaining files."""
+        cache.set_cache_dir(None)
+        shutil.rmtree(self.workspace_dir)
+
+    def test_cached_json(self):
+        """Sections are computed again only when their inputs change."""
+        calls = []
+
+        def compute():
+            calls.append(None)
+            return ('<table></table>', None)
+
+        for _ in range(2):
+            self.assertEqual(
+                list(sections.cached_json(
+                    'table', [self.input_path], ['a'], compute)),
+                ['<table></table>', None])
+        self.assertEqual(len(calls), 1)
+
+        # A different parameter is a different section.
+        sections.cached_json('table', [self.input_path], ['b'], compute)
+        self.assertEqual(len(calls), 2)
+
+        with open(self.input_path, 'a') as file:
+            file.write('1,2\n')
+        sections.cached_json('table', [self.input_path], ['a'], compute)
+        self.assertEqual(len(calls), 3)
+
+    def test_cached_json_missing_input(self):
+        """Creating a missing input invalidates a section."""
+        missing_path = os.path.join(self.workspace_dir, 'missing.tif')
+        self.assertEqual(
+            sections.cached_json('table', [missing_path], None, lambda: 1), 1)
+        self.assertEqual(
+            sections.cached_json('table', [missing_path], None, lambda: 2), 1)
+        with open(missing_path, 'w') as file:
+            file.write('now it exists')
+        self.assertEqual(
+            sections.cached_json('table', [missing_path], None, lambda: 3), 3)
+
+    def test_cached_file(self):
+        """Cached files are copied to the target path on a hit."""
+        calls = []
+
+        def write(path):
+            calls.append(path)
+            with open(path, 'wb') as file:
+                file.write(b'image')
+
+        for name in ('a.png', 'b.png'):
+            target_path = os.path.join(self.workspace_dir, name)
+            sections.cached_file(
+                'figure', [self.input_path], None, target_path, write)
+            with open(target_path, 'rb') as file:
+                self.assertEqual(file.read(), b'image')
+        self.assertEqual(
+            calls, [os.path.join(self.workspace_dir, 'a.png')])
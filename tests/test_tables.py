@@ -0,0 +1,70 @@
+import unittest
+
+import numpy
+import pandas
+
+from invest_reports import tables
+from invest_reports import utils
+
+
+class TablesTests(unittest.TestCase):
+    """Unit tests for the HTML tables of DataFrames."""
+
+    def setUp(self):
+        """Initialize TablesTests tests."""
+        self.float_format = pandas.get_option('display.float_format')
+        utils.set_table_float_format()
+
+    def tearDown(self):
+        """Restore the float format."""
+        pandas.set_option('display.float_format', self.float_format)
+
+    def assertSameAsPandas(self, dataframe, **kwargs):
+        self.assertEqual(tables.to_html(dataframe, **kwargs),
+                         dataframe.to_html(**kwargs))
+
+    def test_same_as_to_html(self):
+        """Tables of each type of column are identical to to_html's."""
+        dataframe = pandas.DataFrame({
+            'ws_id': [0, 1, 2, 3],
+            'usle_tot': [1.5, numpy.nan, 123456789.0, 1e-7],
+            'flag': [True, False, True, False],
+            'name': ['a & b', '<c>', '  padded  ', None],
+            'mixed': [1, 2.5, 'x\ty', None],
+        }, index=pandas.Index(['w', 'x', 'y', 'z'], name='id'))
+
+        self.assertSameAsPandas(dataframe)
+        self.assertSameAsPandas(dataframe, index_names=False)
+        self.assertSameAsPandas(dataframe, index=False, na_rep='',
+                                classes=['datatable', 'paginate'])
+        self.assertSameAsPandas(dataframe.iloc[:0], index=False,
+                                classes='full-width')
+
+    def test_blocks(self):
+        """Tables longer than a block are generated in several pieces."""
+        dataframe = pandas.DataFrame({
+            'ws_id': numpy.arange(tables.BLOCK_ROWS + 10),
+            'value': numpy.linspace(0, 1, tables.BLOCK_ROWS + 10)})
+
+        chunks = list(tables.iter_html(dataframe, index=False))
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(''.join(chunks), dataframe.to_html(index=False))
+
+    def test_unsupported_falls_back(self):
+        """Tables with a MultiIndex are made by to_html."""
+        dataframe = pandas.DataFrame(
+            {'value': [1.0, 2.0]},
+            index=pandas.MultiIndex.from_tuples([('a', 1), ('b', 2)]))
+
+        self.assertEqual(len(list(tables.iter_html(dataframe))), 1)
+        self.assertSameAsPandas(dataframe)
+
+    def test_format_values(self):
+        """Values are formatted as in tables, with missing values as
+        given."""
+        self.assertEqual(
+            tables.format_values(pandas.Series([0.1, numpy.nan]), ''),
+            ['0.1', ''])
+        self.assertEqual(
+            tables.format_values(pandas.Series(['a', None])),
+            ['a', 'NaN'])
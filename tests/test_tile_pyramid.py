@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy
+import pygeoprocessing
+from osgeo import osr
+from PIL import Image
+
+from invest_reports import cache
+from invest_reports import tile_pyramid
+from invest_reports import utils
+
+
+def _make_raster(target_path, array, nodata):
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(32731)  # WGS84/UTM zone 31S
+    pygeoprocessing.numpy_array_to_raster(
+        array, nodata, (1, -1), (0, 0), srs.ExportToWkt(), target_path)
+
+
+class TilePyramidTests(unittest.TestCase):
+    """Unit tests for tile pyramids."""
+
+    def setUp(self):
+        """Initialize TilePyramidTests tests."""
+        self.workspace_dir = tempfile.mkdtemp()
+        cache.set_cache_dir(os.path.join(self.workspace_dir, 'cache'))
+
+    def tearDown(self):
+        """Clean up remaining files."""
+        cache.set_cache_dir(None)
+        shutil.rmtree(self.workspace_dir)
+
+    def test_get_levels(self):
+        """Levels halve in resolution, down to one tile."""
+        self.assertEqual(
+            tile_pyramid.get_levels((1000, 300), tile_size=256),
+            [{'factor': 4, 'n_cols': 1, 'n_rows': 1},
+             {'factor': 2, 'n_cols': 2, 'n_rows': 1},
+             {'factor': 1, 'n_cols': 4, 'n_rows': 2}])
+        self.assertEqual(
+            tile_pyramid.get_levels((100, 50), tile_size=256),
+            [{'factor': 1, 'n_cols': 1, 'n_rows': 1}])
+
+    def test_get_levels_large_raster(self):
+        """The default tile budget bounds the pyramid of a large raster."""
+        levels = tile_pyramid.get_levels((50000, 50000), tile_size=256)
+        self.assertEqual(levels[0], {'factor': 256, 'n_cols': 1, 'n_rows': 1})
+        self.assertEqual(
+            levels[-1], {'factor': 4, 'n_cols': 49, 'n_rows': 49})
+        self.assertLessEqual(
+            sum(level['n_cols'] * level['n_rows'] for level in levels),
+            tile_pyramid.MAX_TILES)
+        self.assertEqual(
+            tile_pyramid.get_levels(
+                (50000, 50000), tile_size=256, max_tiles=None)[-1],
+            {'factor': 1, 'n_cols': 196, 'n_rows': 196})
+
+    def test_get_levels_tile_budget(self):
+        """Levels finer than the tile budget are left out."""
+        levels = tile_pyramid.get_levels(
+            (1000, 300), tile_size=256, max_tiles=3)
+        self.assertEqual([level['factor'] for level in levels], [4, 2])
+
+    def test_build_tile_pyramid(self):
+        """Write every tile of every level, and a manifest."""
+        array = numpy.zeros((30, 50), dtype=numpy.uint8)
+        array[:, 25:] = 1
+        array[0, 0] = 255
+        raster_path = os.path.join(self.workspace_dir, 'streams.tif')
+        _make_raster(raster_path, array, 255)
+        target_dir = os.path.join(self.workspace_dir, 'tiles')
+
+        manifest = tile_pyramid.build_tile_pyramid(
+            raster_path, 'binary', target_dir, tile_size=16)
+
+        self.assertEqual((manifest['width'], manifest['height']), (50, 30))
+        self.assertEqual(
+            [level['factor'] for level in manifest['levels']], [4, 2, 1])
+        with open(os.path.join(target_dir, 'manifest.json')) as file:
+            self.assertEqual(json.load(file), manifest)
+        for (i, level) in enumerate(manifest['levels']):
+            for row in range(level['n_rows']):
+                for col in range(level['n_cols']):
+                    self.assertTrue(os.path.exists(
+                        os.path.join(target_dir, str(i), f'{col}_{row}.png')))
+
+        # The last tile of the finest level is the raster's bottom right
+        # corner, at full resolution.
+        tile = numpy.asarray(Image.open(
+            os.path.join(target_dir, '2', '3_1.png')))
+        self.assertEqual(tile.shape, (14, 2, 4))
+        # Nodata is transparent.
+        tile = numpy.asarray(Image.open(
+            os.path.join(target_dir, '2', '0_0.png')))
+        self.assertEqual(tile[0, 0, 3], 0)
+        self.assertEqual(tile[0, 1, 3], 255)
+
+    def test_build_tile_pyramid_reads_once(self):
+        """Coarser levels are made from the finest, read once in strips."""
+        array = numpy.arange(40 * 40, dtype=numpy.float32).reshape(40, 40)
+        array[0, 0] = -1
+        raster_path = os.path.join(self.workspace_dir, 'surface.tif')
+        _make_raster(raster_path, array, -1)
+        target_dir = os.path.join(self.workspace_dir, 'tiles')
+
+        with mock.patch.object(
+                utils, '_read_band_array',
+                wraps=utils._read_band_array) as read_band_array:
+            manifest = tile_pyramid.build_tile_pyramid(
+                raster_path, 'continuous', target_dir, tile_size=16)
+
+        self.assertEqual(
+            [level['factor'] for level in manifest['levels']], [4, 2, 1])
+        # One full width strip per row of tiles of the finest level.
+        self.assertEqual(read_band_array.call_count, 3)
+        for (i, level) in enumerate(manifest['levels']):
+            for row in range(level['n_rows']):
+                for col in range(level['n_cols']):
+                    tile = Image.open(
+                        os.path.join(target_dir, str(i), f'{col}_{row}.png'))
+                    self.assertEqual(
+                        tile.size,
+                        (min(16, 40 // level['factor'] - col * 16),
+                         min(16, 40 // level['factor'] - row * 16)))
+        # Nodata is left out of the average of the pixels around it.
+        tile = numpy.asarray(Image.open(
+            os.path.join(target_dir, '0', '0_0.png')))
+        self.assertEqual(tile[0, 0, 3], 255)
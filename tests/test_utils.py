@@ -0,0 +1,452 @@
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy
+import pygeoprocessing
+from osgeo import gdal
+from osgeo import osr
+from PIL import Image
+
+from invest_reports import artifacts
+from invest_reports import cache
+from invest_reports import utils
+
+
+def _make_raster(target_path, array, nodata):
+    srs = osr.SpatialReference()
+    srs.ImportFromEPSG(32731)  # WGS84/UTM zone 31S
+    pygeoprocessing.numpy_array_to_raster(
+        array, nodata, (1, -1), (0, 0), srs.ExportToWkt(), target_path)
+
+
+class UtilsTests(unittest.TestCase):
+    """Unit tests for report utils."""
+
+    def setUp(self):
+        """Initialize UtilsTests tests."""
+        self.workspace_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.workspace_dir, 'cache')
+        cache.set_cache_dir(self.cache_dir)
+
+    def tearDown(self):
+        """Clean up remaining files."""
+        cache.set_cache_dir(None)
+        shutil.rmtree(self.workspace_dir)
+
+    def test_read_masked_array_full_resolution(self):
+        """Read a raster at full resolution, masking nodata."""
+        array = numpy.arange(100, dtype=numpy.float32).reshape((10, 10))
+        array[0, 0] = -1
+        raster_path = os.path.join(self.workspace_dir, 'raster.tif')
+        _make_raster(raster_path, array, -1)
+
+        (masked_array, resampled) = utils.read_masked_array(
+            raster_path, 'bilinear')
+
+        self.assertFalse(resampled)
+        self.assertEqual(masked_array.shape, (10, 10))
+        self.assertTrue(masked_array.mask[0, 0])
+        self.assertEqual(masked_array.count(), 99)
+        numpy.testing.assert_array_equal(
+            masked_array.compressed(), array.flatten()[1:])
+
+    def test_read_masked_array_preserves_dtype(self):
+        """Integer rasters keep their dtype; float64 narrows to float32."""
+        array = numpy.array([[0, 1], [1, 255]], dtype=numpy.uint8)
+        raster_path = os.path.join(self.workspace_dir, 'uint8.tif')
+        _make_raster(raster_path, array, 255)
+
+        (masked_array, _) = utils.read_masked_array(raster_path, 'nearest')
+        self.assertEqual(masked_array.dtype, numpy.uint8)
+        numpy.testing.assert_array_equal(
+            masked_array.mask, [[False, False], [False, True]])
+
+        array = numpy.array([[0, 1], [numpy.nan, -1]], dtype=numpy.float64)
+        raster_path = os.path.join(self.workspace_dir, 'float64.tif')
+        _make_raster(raster_path, array, -1)
+
+        (masked_array, _) = utils.read_masked_array(raster_path, 'bilinear')
+        self.assertEqual(masked_array.dtype, numpy.float32)
+        numpy.testing.assert_array_equal(
+            masked_array.mask, [[False, False], [True, True]])
+
+    def test_read_masked_array_decimated(self):
+        """Decimate a raster on read to fit the requested size."""
+        array = numpy.ones((100, 200), dtype=numpy.uint8)
+        raster_path = os.path.join(self.workspace_dir, 'raster.tif')
+        _make_raster(raster_path, array, 255)
+
+        (masked_array, resampled) = utils.read_masked_array(
+            raster_path, 'nearest', max_size=(50, 50))
+
+        self.assertTrue(resampled)
+        self.assertEqual(masked_array.shape, (25, 50))
+        # No overviews should have been written alongside the raster.
+        self.assertFalse(os.path.exists(f'{raster_path}.ovr'))
+
+    def test_read_masked_array_in_report_scope(self):
+        """Within a report scope, an array in use is not read again."""
+        array = numpy.ones((10, 10), dtype=numpy.uint8)
+        raster_path = os.path.join(self.workspace_dir, 'raster.tif')
+        _make_raster(raster_path, array, 255)
+
+        with artifacts.report_scope():
+            (masked_array, _) = utils.read_masked_array(raster_path, 'nearest')
+            with mock.patch('osgeo.gdal.OpenEx') as open_ex:
+                (shared_array, _) = utils.read_masked_array(
+                    raster_path, 'nearest')
+                open_ex.assert_not_called()
+        self.assertIs(shared_array, masked_array)
+
+    def test_get_decimated_size(self):
+        """Fit a size within a budget, preserving aspect ratio."""
+        self.assertEqual(
+            utils._get_decimated_size((1000, 500), (100, 100)), (100, 50))
+        self.assertEqual(
+            utils._get_decimated_size((10, 5), (100, 100)), (10, 5))
+        self.assertEqual(
+            utils._get_decimated_size((10, 5), None), (10, 5))
+
+    def test_read_masked_array_uses_preview_cache(self):
+        """Decimated reads are cached outside of the workspace."""
+        array = numpy.ones((100, 200), dtype=numpy.uint8)
+        raster_path = os.path.join(self.workspace_dir, 'raster.tif')
+        _make_raster(raster_path, array, 255)
+
+        utils.read_masked_array(raster_path, 'nearest', max_size=(50, 50))
+        cached_files = os.listdir(utils.PREVIEW_CACHE.cache_dir)
+        self.assertEqual(len(cached_files), 1)
+
+        # Make the cached entry distinguishable from the raster itself.
+        cached_path = os.path.join(
+            utils.PREVIEW_CACHE.cache_dir, cached_files[0])
+        numpy.save(cached_path, numpy.zeros((25, 50), dtype=numpy.uint8))
+        (masked_array, _) = utils.read_masked_array(
+            raster_path, 'nearest', max_size=(50, 50))
+        numpy.testing.assert_array_equal(masked_array, 0)
+
+        # A different resampling method is a different cache entry.
+        utils.read_masked_array(raster_path, 'bilinear', max_size=(50, 50))
+        self.assertEqual(len(os.listdir(utils.PREVIEW_CACHE.cache_dir)), 2)
+
+    def test_apply_memory_budget(self):
+        """Shrink the read size to fit a memory budget."""
+        figsize = (1, 1)  # 100 x 100 px canvas
+        canvas_bytes = 100 * 100 * utils.CANVAS_BYTES_PER_PIXEL
+        self.assertEqual(
+            utils._apply_memory_budget((400, 200), 2, figsize, None),
+            (400, 200))
+        # Budget for exactly 100 x 50 pixels per raster.
+        bytes_per_pixel = (2 * utils.RESIDENT_BYTES_PER_PIXEL
+                           + utils.DRAW_BYTES_PER_PIXEL)
+        max_memory = canvas_bytes + 100 * 50 * bytes_per_pixel
+        self.assertEqual(
+            utils._apply_memory_budget((400, 200), 2, figsize, max_memory),
+            (100, 50))
+        with self.assertRaises(ValueError):
+            utils._apply_memory_budget((400, 200), 2, figsize, 1000)
+
+    def test_gdal_cache_budget(self):
+        """GDAL's cache is limited to its share of the budget, then
+        restored."""
+        previous_cache_max = gdal.GetCacheMax()
+        max_memory = 64 * 2**20
+        with utils.gdal_cache_budget(max_memory) as plot_memory:
+            cache_max = gdal.GetCacheMax()
+            self.assertLessEqual(
+                cache_max, max_memory * utils.GDAL_CACHE_FRACTION)
+            self.assertEqual(plot_memory, max_memory - cache_max)
+        self.assertEqual(gdal.GetCacheMax(), previous_cache_max)
+
+        with utils.gdal_cache_budget(None) as plot_memory:
+            self.assertIsNone(plot_memory)
+            self.assertEqual(gdal.GetCacheMax(), previous_cache_max)
+
+    def test_assemble_tiles(self):
+        """Tiles are arranged in a grid with top-left alignment."""
+        tiles = [numpy.full((h, w, 4), i, dtype=numpy.uint8)
+                 for i, (h, w) in enumerate([(2, 3), (4, 1), (1, 1)])]
+
+        image = utils._assemble_tiles(tiles, n_cols=2)
+
+        self.assertEqual(image.shape, (5, 4, 4))
+        numpy.testing.assert_array_equal(image[0:2, 0:3], 0)
+        numpy.testing.assert_array_equal(image[0:4, 3:4], 1)
+        numpy.testing.assert_array_equal(image[4:5, 0:1], 2)
+        # Empty space is white.
+        numpy.testing.assert_array_equal(image[4:5, 1:4], 255)
+
+    def test_render_raster_list_tiles(self):
+        """Subplots drawn by workers match those drawn in this process."""
+        raster_path_list = []
+        for i in range(2):
+            raster_path = os.path.join(self.workspace_dir, f'raster_{i}.tif')
+            array = numpy.arange(100, dtype=numpy.float32).reshape((10, 10))
+            array *= i + 1
+            array[i, i] = -1
+            _make_raster(raster_path, array, -1)
+            raster_path_list.append(raster_path)
+        datatype_list = ['continuous', 'continuous']
+
+        image = utils.render_raster_list_tiles(
+            raster_path_list, datatype_list, max_render_workers=2)
+        self.assertIn((2, self.cache_dir), utils._render_pools)
+        with mock.patch.object(
+                utils, '_get_n_render_workers', return_value=0):
+            expected_image = utils.render_raster_list_tiles(
+                raster_path_list, datatype_list, max_render_workers=2)
+
+        self.assertEqual(image.shape[2], 4)
+        numpy.testing.assert_array_equal(image, expected_image)
+
+    def test_render_raster_list_tiles_broken_pool(self):
+        """Subplots are drawn in this process if a worker has died."""
+        raster_path = os.path.join(self.workspace_dir, 'raster.tif')
+        _make_raster(raster_path, numpy.arange(
+            100, dtype=numpy.float32).reshape((10, 10)), -1)
+        with mock.patch.object(
+                utils, '_get_n_render_workers', return_value=0):
+            expected_image = utils.render_raster_list_tiles(
+                [raster_path], ['continuous'])
+
+        broken_future = concurrent.futures.Future()
+        broken_future.set_exception(BrokenProcessPool('worker died'))
+        broken_pool = mock.Mock()
+        broken_pool.submit.return_value = broken_future
+        with mock.patch.dict(
+                utils._render_pools, {(1, self.cache_dir): broken_pool}):
+            image = utils.render_raster_list_tiles(
+                [raster_path], ['continuous'], max_render_workers=1)
+            # The broken pool is not used again.
+            self.assertNotIn((1, self.cache_dir), utils._render_pools)
+
+        broken_pool.shutdown.assert_called_once()
+        numpy.testing.assert_array_equal(image, expected_image)
+
+    def test_render_workers_use_cache_dir(self):
+        """Plotting workers use this process's cache directory."""
+        raster_path = os.path.join(self.workspace_dir, 'lulc.tif')
+        _make_raster(
+            raster_path, numpy.array([[1, 2], [2, 255]], dtype=numpy.uint8),
+            255)
+
+        utils.render_raster_list_tiles(
+            [raster_path], ['nominal'], max_render_workers=1)
+
+        # Categories are only counted by the worker.
+        self.assertEqual(
+            len(os.listdir(utils.CATEGORY_COUNTS_CACHE.cache_dir)), 1)
+
+    def test_get_n_render_workers(self):
+        """Subplots are drawn in this process if the budget is too small
+        for a worker."""
+        self.assertEqual(utils._get_n_render_workers(4, 2, None), 2)
+        self.assertEqual(utils._get_n_render_workers(
+            4, 3, 4 * utils.RENDER_WORKER_BYTES), 2)
+        self.assertEqual(utils._get_n_render_workers(
+            4, 3, utils.RENDER_WORKER_BYTES), 0)
+
+    def test_encode_image(self):
+        """Encode images as RGBA PNG, palette PNG, or WebP."""
+        array = numpy.zeros((20, 30, 4), dtype=numpy.uint8)
+        array[..., 3] = 255
+        array[:10, :, 0] = 200
+        image = Image.fromarray(array)
+
+        png = Image.open(BytesIO(utils.encode_image(image)))
+        self.assertEqual((png.format, png.mode), ('PNG', 'RGBA'))
+
+        palette_png = Image.open(BytesIO(utils.encode_image(
+            image, utils.ImageEncoding(quantize=True))))
+        self.assertEqual((palette_png.format, palette_png.mode), ('PNG', 'P'))
+        numpy.testing.assert_array_equal(
+            numpy.asarray(palette_png.convert('RGBA')), array)
+
+        webp = Image.open(BytesIO(utils.encode_image(
+            image, utils.ImageEncoding(format='webp'))))
+        self.assertEqual(webp.format, 'WEBP')
+        numpy.testing.assert_array_equal(
+            numpy.asarray(webp.convert('RGBA')), array)
+
+        with self.assertRaises(ValueError):
+            utils.ImageEncoding(format='gif')
+
+    def test_plot_and_save_rasters(self):
+        """Write a figure of rasters to an image file."""
+        raster_path = os.path.join(self.workspace_dir, 'raster.tif')
+        _make_raster(
+            raster_path, numpy.ones((10, 10), dtype=numpy.float32), -1)
+        image_path = os.path.join(self.workspace_dir, 'figure.webp')
+
+        utils.plot_and_save_rasters(
+            [utils.RasterPlotConfig(raster_path, 'continuous')], image_path,
+            image_encoding=utils.ImageEncoding(format='webp'))
+
+        self.assertEqual(Image.open(image_path).format, 'WEBP')
+
+    def test_apply_colormap_lut(self):
+        """Colormap lookups match matplotlib's own colormapping."""
+        array = numpy.ma.MaskedArray(
+            numpy.array([[-1, 0, 0.5], [2, 7, 100]], dtype=numpy.float32),
+            mask=[[False, False, False], [False, True, False]])
+        for (cmap, norm) in [
+                ('viridis', matplotlib.colors.Normalize(0, 10)),
+                ('BrBG', matplotlib.colors.CenteredNorm(halfrange=5)),
+                ('viridis', matplotlib.colors.LogNorm(0.5, 10)),
+                (utils._get_colormap('binary'),
+                 matplotlib.colors.Normalize(-0.5, 1.5))]:
+            if isinstance(cmap, str):
+                cmap = matplotlib.colormaps[cmap]
+            norm.autoscale_None(array)
+            numpy.testing.assert_array_equal(
+                utils._apply_colormap_lut(array, cmap, norm),
+                cmap(norm(array), bytes=True))
+
+    def test_iter_masked_arrays_with_workers(self):
+        """Prefetched rasters are yielded in the order they were listed."""
+        raster_path_list = []
+        for i in range(5):
+            raster_path = os.path.join(self.workspace_dir, f'raster_{i}.tif')
+            _make_raster(
+                raster_path, numpy.full((10, 10), i, dtype=numpy.int16), -1)
+            raster_path_list.append(raster_path)
+
+        results = list(utils.iter_masked_arrays(
+            raster_path_list, ['nearest'] * 5, max_workers=2))
+
+        self.assertEqual(len(results), 5)
+        for i, (masked_array, resampled) in enumerate(results):
+            self.assertFalse(resampled)
+            numpy.testing.assert_array_equal(masked_array, i)
+
+    def test_get_raster_range(self):
+        """Get a raster's range from stored statistics or by scanning it."""
+        array = numpy.array([[-1, 2], [7, 3]], dtype=numpy.float32)
+        raster_path = os.path.join(self.workspace_dir, 'raster.tif')
+        _make_raster(raster_path, array, -1)
+
+        self.assertEqual(utils._get_raster_range(raster_path), (2, 7))
+
+        # Stored statistics take precedence over scanning the raster.
+        raster = gdal.OpenEx(raster_path, gdal.OF_RASTER | gdal.OF_UPDATE)
+        band = raster.GetRasterBand(1)
+        band.SetMetadataItem('STATISTICS_MINIMUM', '0')
+        band.SetMetadataItem('STATISTICS_MAXIMUM', '100')
+        raster = band = None
+        self.assertEqual(utils._get_raster_range(raster_path), (0, 100))
+
+    def test_get_raster_range_all_nodata(self):
+        """A raster with no valid pixels has no range."""
+        array = numpy.full((2, 2), -1, dtype=numpy.float32)
+        raster_path = os.path.join(self.workspace_dir, 'raster.tif')
+        _make_raster(raster_path, array, -1)
+
+        self.assertIsNone(utils._get_raster_range(raster_path))
+
+    def test_plot_raster_facets_all_nodata(self):
+        """Facets of rasters with no valid pixels are plotted empty."""
+        raster_path_list = []
+        for i in range(2):
+            raster_path = os.path.join(self.workspace_dir, f'raster_{i}.tif')
+            _make_raster(
+                raster_path, numpy.full((10, 10), -1, dtype=numpy.float32),
+                -1)
+            raster_path_list.append(raster_path)
+
+        for transform in ('linear', 'log'):
+            fig = utils.plot_raster_facets(
+                raster_path_list, 'continuous', transform=transform)
+            mappable = fig.axes[0].images[0]
+            self.assertEqual(
+                (mappable.norm.vmin, mappable.norm.vmax),
+                (0, 1) if transform == 'linear' else (1e-6, 1))
+            plt.close(fig)
+
+    def test_count_categories(self):
+        """Count each class of a nominal raster at full resolution."""
+        array = numpy.array(
+            [[1, 2, 2], [255, 7, 7], [7, 7, 255]], dtype=numpy.uint8)
+        raster_path = os.path.join(self.workspace_dir, 'lulc.tif')
+        _make_raster(raster_path, array, 255)
+
+        (values, counts) = utils.count_categories(raster_path)
+
+        numpy.testing.assert_array_equal(values, [1, 2, 7])
+        numpy.testing.assert_array_equal(counts, [1, 2, 4])
+
+        # The second call is served from the cache.
+        self.assertEqual(
+            len(os.listdir(utils.CATEGORY_COUNTS_CACHE.cache_dir)), 1)
+        (values, counts) = utils.count_categories(raster_path)
+        numpy.testing.assert_array_equal(values, [1, 2, 7])
+        numpy.testing.assert_array_equal(counts, [1, 2, 4])
+
+    def test_count_categories_from_histogram(self):
+        """A stored histogram is only used if the band's statistics show
+        that it covers every valid value."""
+        array = numpy.array([[1, 1], [300, 0]], dtype=numpy.uint16)
+        raster_path = os.path.join(self.workspace_dir, 'lulc.tif')
+        _make_raster(raster_path, array, 0)
+        raster = gdal.OpenEx(raster_path, gdal.OF_RASTER | gdal.OF_UPDATE)
+        band = raster.GetRasterBand(1)
+        # The default 8-bit histogram, which misses the class 300.
+        band.SetDefaultHistogram(-0.5, 255.5, [0, 2] + [0] * 254)
+        band.SetMetadataItem('STATISTICS_MINIMUM', '1')
+        band.SetMetadataItem('STATISTICS_MAXIMUM', '300')
+        raster = band = None
+
+        (values, counts) = utils.count_categories(raster_path)
+        numpy.testing.assert_array_equal(values, [1, 300])
+        numpy.testing.assert_array_equal(counts, [2, 1])
+
+        # A histogram that covers the statistics is used, without a scan.
+        raster_path = os.path.join(self.workspace_dir, 'lulc_8bit.tif')
+        _make_raster(raster_path, array.clip(0, 7).astype(numpy.uint8), 0)
+        raster = gdal.OpenEx(raster_path, gdal.OF_RASTER | gdal.OF_UPDATE)
+        band = raster.GetRasterBand(1)
+        band.SetDefaultHistogram(-0.5, 7.5, [0, 2, 0, 0, 0, 0, 0, 1])
+        band.SetMetadataItem('STATISTICS_MINIMUM', '1')
+        band.SetMetadataItem('STATISTICS_MAXIMUM', '7')
+        raster = band = None
+
+        with mock.patch.object(
+                utils, '_count_categories_from_blocks') as from_blocks:
+            (values, counts) = utils.count_categories(raster_path)
+            from_blocks.assert_not_called()
+        numpy.testing.assert_array_equal(values, [1, 7])
+        numpy.testing.assert_array_equal(counts, [2, 1])
+
+    def test_raster_inputs_summary_uses_stats_cache(self):
+        """Input raster stats are computed once and then reused."""
+        array = numpy.array([[1, 2], [3, 4]], dtype=numpy.float32)
+        raster_path = os.path.join(self.workspace_dir, 'dem.tif')
+        _make_raster(raster_path, array, -1)
+        args_dict = {'dem_path': raster_path, 'suffix': 'test'}
+
+        summary = utils.raster_inputs_summary(args_dict)
+        self.assertEqual(list(summary.index), ['dem.tif'])
+        self.assertEqual(summary.loc['dem.tif', 'Maximum'], 4)
+
+        with mock.patch('geometamaker.describe') as describe:
+            cached_summary = utils.raster_inputs_summary(args_dict)
+            describe.assert_not_called()
+        self.assertTrue(summary.equals(cached_summary))
+
+    def test_walk_file_registry(self):
+        """Yield the paths of nested file registries in order."""
+        file_registry = {
+            'a': 'a.tif',
+            'b': {'b1': 'b1.tif', 'b2': {'b2i': 'b2i.tif'}},
+            'c': 'c.tif',
+        }
+        self.assertEqual(
+            list(utils._walk_file_registry(file_registry)),
+            ['a.tif', 'b1.tif', 'b2i.tif', 'c.tif'])